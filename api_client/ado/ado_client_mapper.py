@@ -1,20 +1,20 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-from api_client.ado.ado_pr_api_client import AdoPullRequestClient
-from api_client.ado.ado_repository_api_client import AdoRepositoryClient
-from api_client.ado.ado_work_item_api_client import AdoWorkItemClient
 from core.api.api_config_constants import APIConfigConstants
 from core.api.interfaces.api_client_mapper import ClientMapper
+from core.utils.registry import LazyRegistry
 
 
 class ADOClientMapper(ClientMapper):
 
-    client_mapper = {
-        APIConfigConstants.REPO_API_CLIENT: AdoRepositoryClient(),
-        APIConfigConstants.WORK_ITEM_API_CLIENT: AdoWorkItemClient(),
-        APIConfigConstants.PULL_REQUEST_API_CLIENT: AdoPullRequestClient()
-    }
+    # clients are imported and instantiated on their first use
+    client_mapper = LazyRegistry({
+        APIConfigConstants.REPO_API_CLIENT: 'api_client.ado.ado_repository_api_client:AdoRepositoryClient',
+        APIConfigConstants.WORK_ITEM_API_CLIENT: 'api_client.ado.ado_work_item_api_client:AdoWorkItemClient',
+        APIConfigConstants.PULL_REQUEST_API_CLIENT: 'api_client.ado.ado_pr_api_client:AdoPullRequestClient',
+        APIConfigConstants.IDENTITY_API_CLIENT: 'api_client.ado.ado_identity_api_client:AdoIdentityClient'
+    })
 
     def config(self):
         return ADOClientMapper.client_mapper
@@ -0,0 +1,64 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from concurrent import futures
+
+from api_client.ado.endpoints import endpoint_map
+from core.api.caller import get
+from core.api.interfaces.identity_api_client import IdentityApiClient
+from core.exceptions import APICallFailedError
+from core.utils.helper import get_value
+from core.utils.map import resources
+
+
+class AdoIdentityClient(IdentityApiClient):
+    __logger = resources.get('LOGGER')
+    __name = 'IdentityClient'
+
+    # max number of identity searches in flight
+    max_workers = 8
+
+    # marks the aliases which couldn't be searched, so that they aren't reported as not found
+    __failed = object()
+
+    def __init__(self):
+        super().__init__()
+
+    def resolve(self, entity, aliases: list):
+        aliases = list(dict.fromkeys(aliases))
+        if not aliases:
+            return {}
+
+        self.__logger.info(self.__name, 'Resolving identities of {}...'.format(aliases))
+        with futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(aliases))) as ex:
+            identities = ex.map(lambda alias: self.__search(entity, alias), aliases)
+            return {alias: identity for alias, identity in zip(aliases, identities) if identity is not self.__failed}
+
+    def __search(self, entity, alias):
+        endpoint = endpoint_map['identities'].format(entity.org)
+        params = {
+            'searchFilter': 'General',
+            'filterValue': alias,
+            'queryMembership': 'None',
+            'api-version': entity.ado_version
+        }
+        try:
+            matches = get_value(get(endpoint, entity.pat, params), ['value'], [])
+        except APICallFailedError as e:
+            self.__logger.warn(self.__name, 'Failed to resolve the identity of {}: {}'.format(alias, e.message))
+            return self.__failed
+
+        if len(matches) != 1:
+            self.__logger.warn(self.__name, '{} identities found for {}'.format(len(matches), alias))
+            return None
+        return self.to_identity(matches[0])
+
+    @staticmethod
+    def to_identity(ado_identity):
+        mail = get_value(ado_identity, ['properties', 'Mail', '$value'])
+        return {
+            'id': get_value(ado_identity, ['id']),
+            'uniqueName': get_value(ado_identity, ['properties', 'Account', '$value'], mail),
+            'displayName': get_value(ado_identity, ['providerDisplayName']),
+            'mail': mail
+        }
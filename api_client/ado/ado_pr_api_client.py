@@ -2,9 +2,10 @@
 # Licensed under the MIT License.
 
 import json
+from concurrent import futures
 
 from api_client.exceptions import FailedToAddReviewerError
-from core.api.caller import get, put
+from core.api.caller import get, get_stream, patch, post, put
 from api_client.ado.endpoints import endpoint_map
 from core.api.interfaces.pr_api_client import PullRequestApiClientInterface
 from core.utils.map import resources
@@ -14,12 +15,17 @@ class AdoPullRequestClient(PullRequestApiClientInterface):
     __logger = resources.get('LOGGER')
     __name = 'PullRequestClient'
 
+    # max number of reviewer PUTs in flight when the reviewers can't be added in a single call
+    reviewer_workers = 8
+
     def __init__(self):
         super().__init__()
+        self.reset()
+
+    def reset(self):
         self.__data = None
         self.__comment_threads = None
         self.parent_ids = None
-        self.changed_lines = []
         self.__changed_files_info = []
 
     def data(self, entity):
@@ -48,6 +54,22 @@ class AdoPullRequestClient(PullRequestApiClientInterface):
             self.__comment_threads = get(endpoint, entity.pat)
         return self.__comment_threads
 
+    def create_thread(self, entity, thread):
+        endpoint = endpoint_map['pr_comments'].format(entity.org, entity.project, entity.repo(), entity.pr_num)
+        return post(endpoint, entity.pat, {"api-version": entity.ado_version}, payload=json.dumps(thread)).json()
+
+    def update_comment(self, entity, thread_id, comment_id, content):
+        endpoint = endpoint_map['pr_thread_comment'].format(entity.org, entity.project, entity.repo(), entity.pr_num,
+                                                            thread_id, comment_id)
+        return patch(endpoint, entity.pat, {"api-version": entity.ado_version}, json.dumps({"content": content}),
+                     content_type="application/json").json()
+
+    def update_thread_status(self, entity, thread_id, status):
+        endpoint = endpoint_map['pr_thread'].format(entity.org, entity.project, entity.repo(), entity.pr_num,
+                                                    thread_id)
+        return patch(endpoint, entity.pat, {"api-version": entity.ado_version}, json.dumps({"status": status}),
+                     content_type="application/json").json()
+
     def get_commits(self, entity):
         endpoint = endpoint_map['pr_commits'].format(entity.org,
                                                      entity.project,
@@ -62,15 +84,25 @@ class AdoPullRequestClient(PullRequestApiClientInterface):
         Returns the files modified in the given entity
         """
         endpoint = endpoint_map['ado_diff_by_commit'].format(entity.org, entity.project, entity.repo())
-        params = {
+        resp = get(endpoint, entity.pat, self.__diff_params(entity))
+        return resp
+
+    def iter_diff_changes(self, entity):
+        """
+        Yields the changes of the diff one by one as they are streamed, without holding the whole diff in memory
+        """
+        endpoint = endpoint_map['ado_diff_by_commit'].format(entity.org, entity.project, entity.repo())
+        return get_stream(endpoint, entity.pat, ['changes'], self.__diff_params(entity))
+
+    @staticmethod
+    def __diff_params(entity):
+        return {
             "baseVersion": entity.target_branch().replace('refs/heads/', ''),  # develop branch
             "baseVersionType": "branch",
             "targetVersion": entity.source_branch().replace('refs/heads/', ''),  # dev's private branch
             "targetVersionType": "branch",
             "api-version": entity.ado_version
         }
-        resp = get(endpoint, entity.pat, params)
-        return resp
 
     def changes(self, entity, repo_id, commit_id):
         if self.parent_ids is None:
@@ -81,41 +113,86 @@ class AdoPullRequestClient(PullRequestApiClientInterface):
         self.__logger.debug(self.__name, self.parent_ids)
         return self.parent_ids
 
+    def get_file_diff_blocks(self, entity, diff_parameters, repo_id):
+        """
+        Returns the blocks of the file diff identified by the diff_parameters. Diffs are not cached by the client,
+        which is shared by the PRs of the process. The entity keeps the indexes built from them
+        """
+        endpoint = endpoint_map['get_file_diff'].format(entity.org, entity.project, diff_parameters, repo_id)
+        # diffs are read with the approver key when it is configured, with the token of the run otherwise
+        return get(endpoint, entity.pr_approver_key or entity.pat)['blocks']
+
     def get_file_add_diff(self, entity, diff_parameters, repo_id):
-        if not self.changed_lines:
-            entity = entity
-            endpoint = endpoint_map['get_file_diff'].format(entity.org, entity.project, diff_parameters, repo_id)
-            json_obj = get(endpoint, entity.pr_approver_key)
-            blocks = json_obj['blocks']
-            visited_lines = []
-            for block in blocks:
-                if block['changeType'] == 1 and block['mLine'] not in visited_lines:
-                    self.changed_lines.append(block['mLines'])
-                    visited_lines.append(block['mLine'])
-        return self.changed_lines
+        changed_lines = []
+        visited_lines = set()
+        for block in self.get_file_diff_blocks(entity, diff_parameters, repo_id):
+            if block['changeType'] == 1 and block['mLine'] not in visited_lines:
+                changed_lines.append(block['mLines'])
+                visited_lines.add(block['mLine'])
+        return changed_lines
 
     def changed_files_info(self, entity):
         if not self.__changed_files_info:
             endpoint = endpoint_map['pr_commits'].format(entity.org, entity.project, entity.repo(), entity.pr_num,
                                                          entity.ado_version)
-            commits_obj = get(endpoint, entity.pat)
-            commits = []
-            visited_files = []
-            for commit in commits_obj['value']:
-                commits.append(commit['commitId'])
+            # commit ids are collected before the changes are streamed: a streamed response holds its slot of the
+            # scheduler until it is closed, so nesting the streams could take all the slots of the org
+            commit_ids = [commit['commitId'] for commit in get_stream(endpoint, entity.pat, ['value'])]
+            visited_files = set()
+            for commit_id in commit_ids:
                 changes_endpoint = endpoint_map['commit_changes'].format(entity.org, entity.project, entity.repo(),
-                                                                         commit['commitId'], entity.ado_version)
-                changes = get(changes_endpoint, entity.pat)
-                for change in changes['changes']:
+                                                                         commit_id, entity.ado_version)
+                for change in get_stream(changes_endpoint, entity.pat, ['changes']):
                     if change['item']['gitObjectType'] == 'blob' and change['item']['path'] not in visited_files:
                         self.__changed_files_info.append(change)
-                        visited_files.append(change['item']['path'])
+                        visited_files.add(change['item']['path'])
         return self.__changed_files_info
 
     def add_reviewer(self, entity, reviewer, vote=0, is_required=True):
+        self.__put_reviewer(entity, entity.repo(), reviewer, vote, is_required)
+
+    def add_reviewers(self, entity, reviewers: list, vote=0, is_required=True):
+        """
+        Adds all the given reviewers with a single POST. If that fails, reviewers are added with parallel PUTs.
+        Returns the map of each reviewer to None if it is added or to the FailedToAddReviewerError otherwise
+        """
+        reviewers = list(dict.fromkeys(reviewers))
+        if not reviewers:
+            return {}
+
+        repo = entity.repo()
+        response = None
+        try:
+            url = endpoint_map['pr_reviewers'].format(entity.org, entity.project, repo, entity.pr_num)
+            querystring = {"api-version": entity.ado_version}
+            body = [{"id": reviewer, "vote": vote, "isRequired": is_required} for reviewer in reviewers]
+
+            response = post(url, entity.pat, querystring, payload=json.dumps(body))
+            self.__logger.info(self.__name, "Added {}-reviewers {} successfully with vote {}!"
+                               .format('required' if is_required else 'optional', reviewers, vote))
+            return {reviewer: None for reviewer in reviewers}
+        except Exception:
+            self.__logger.warn(self.__name, 'Failed to add reviewers {} in bulk - API response: {}. Adding them one '
+                                            'by one...'.format(reviewers, response))
+
+        def add(reviewer):
+            try:
+                self.__put_reviewer(entity, repo, reviewer, vote, is_required)
+            except FailedToAddReviewerError as e:
+                return e
+            return None
+
+        with futures.ThreadPoolExecutor(max_workers=min(self.reviewer_workers, len(reviewers))) as ex:
+            return dict(zip(reviewers, ex.map(add, reviewers)))
+
+    def get_reviewers(self, entity):
+        endpoint = endpoint_map['pr_reviewers'].format(entity.org, entity.project, entity.repo(), entity.pr_num)
+        return get(endpoint, entity.pat, {"api-version": entity.ado_version})['value']
+
+    def __put_reviewer(self, entity, repo, reviewer, vote, is_required):
         response = None
         try:
-            url = endpoint_map['approve_pr_by_id'].format(entity.org, entity.project, entity.repo(),
+            url = endpoint_map['approve_pr_by_id'].format(entity.org, entity.project, repo,
                                                           entity.pr_num, reviewer)
             querystring = {"api-version": entity.ado_version}
             body = {"vote": vote, "isRequired": is_required}
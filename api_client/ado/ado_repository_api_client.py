@@ -1,12 +1,14 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-from core.api.caller import get
+from core.api.caller import get, get_content
 from api_client.ado.endpoints import endpoint_map
 from core.api.interfaces.repository_api_client import RepositoryApiClientInterface
+from core.utils.map import resources
 
 
 class AdoRepositoryClient(RepositoryApiClientInterface):
+    __logger = resources.get('LOGGER')
 
     def __init__(self):
         super().__init__()
@@ -31,6 +33,17 @@ class AdoRepositoryClient(RepositoryApiClientInterface):
         resp = get(endpoint, entity.pat)
         return resp
 
+    def get_file_content(self, entity, file_path, commit_id, spill_threshold=None):
+        """
+        Returns the raw content of the file version on the given commit id.
+        Files larger than spill_threshold bytes are returned as a memory-mapped temp file
+        """
+        self.__logger.debug(self.__name, 'Attempt to fetch content of {} of commit version: {}'
+                            .format(file_path, commit_id))
+        endpoint = endpoint_map['file_from_commit'].format(
+            entity.org, entity.project, entity.repo(), file_path, commit_id)
+        return get_content(endpoint, entity.pat, spill_threshold=spill_threshold)
+
     def get_commit_metadata(self, entity, commit_id):
         """
         Returns the metadata on the given commit id
@@ -1,13 +1,19 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
 
 from api_client.ado.constants import ADOConstants
 from api_client.exceptions import FailedToAttachWorkItemError, FailedToUpdateFieldsError
 from core.api.caller import get, patch, post
 from api_client.ado.endpoints import endpoint_map
 from core.api.interfaces.work_item_api_client import FieldValueObject, WorkItemApiClient
+from core.api.work_item_graph import WorkItemGraph
 from core.exceptions import APICallFailedError
 from core.utils.map import resources
 
@@ -35,28 +41,159 @@ class AdoFieldValueObject(FieldValueObject):
         }
         self.payload.append(remove_field)
 
+    def add_relation(self, relation, url, attributes=None):
+        add_relation = {
+            "op": "add",
+            "path": "/relations/-",
+            "value": {
+                "rel": relation,
+                "url": url,
+                "attributes": attributes or {}
+            }
+        }
+        self.payload.append(add_relation)
+
+    def merge(self, field_value_obj):
+        self.payload.extend(field_value_obj.payload)
+
     def payload_str(self):
         return json.dumps(self.payload)
 
+    def load_payload_str(self, payload_str):
+        self.payload = json.loads(payload_str)
+        return self
+
 
 class AdoWorkItemClient(WorkItemApiClient):
     __logger = resources.get('LOGGER')
     __name = 'WorkItemApiClient'
 
+    # max number of ids ADO accepts in a single work items batch read and max requests in a $batch call
+    batch_size = 200
+    # max number of $batch calls in flight
+    batch_workers = 4
+    # seconds for which the results of a query are reused by the PRs of a batch run
+    query_result_ttl = 60
+    # max number of work items whose relations are memoized, the least recently used ones are dropped beyond it
+    max_relations = 10000
+
     def __init__(self):
         super().__init__()
+        self.__cache_lock = threading.Lock()
+        self.reset()
 
-    def get_work_items(self, entity, items: list):
-        items = []
-        for wi in items:
-            items.append(self.get_work_item_by_id(entity, wi))
-        return items
+    def reset(self):
+        with self.__cache_lock:
+            # (org, work item id) -> token hash -> (projected fields or None if all the fields were fetched,
+            # work item json). Work items are cached per token, since tokens may not see the same fields
+            self.__work_item_cache = {}
+            # (org, project, query id) -> query definition
+            self.__query_definitions = {}
+            # (org, project, query id) -> (time of the fetch, work item references)
+            self.__query_results = {}
+            # (org, work item id) -> (parent ids, child ids), shared by all the PRs of the run until written to
+            self.__relations = OrderedDict()
 
-    def get_work_item_by_id(self, entity, item_id):
-        endpoint = endpoint_map['work_item_by_id'].format(entity.org, item_id)
-        wi_data = get(endpoint, entity.pat)
+    def new_field_value_object(self):
+        return AdoFieldValueObject()
+
+    def get_work_items(self, entity, items: list, fields=None, cache=True):
+        """
+        Returns the metadata of the given work item ids in the same order.
+        Only the items which are not cached for the requested fields are fetched, batch_size items per call.
+        With cache False, the fetched items are returned without being cached, for the reads of many work items
+        that are consumed once
+        """
+        fields = frozenset(fields) if fields else None
+        found = {}
+        missing = []
+        for wi in dict.fromkeys(items):
+            cached = self.__cached(entity, wi, fields)
+            if cached is None:
+                missing.append(wi)
+            else:
+                found[str(wi)] = cached
+
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            self.__logger.info(self.__name, 'Fetching metadata of work-items {}...'.format(chunk))
+            endpoint = endpoint_map['work_items_by_ids'].format(entity.org)
+            params = {'ids': ','.join(str(wi) for wi in chunk),
+                      'errorPolicy': 'omit',
+                      'api-version': entity.ado_version}
+            projection = self.__widen(entity, chunk, fields) if cache else fields
+            if projection is not None:
+                params['fields'] = ','.join(sorted(projection))
+            for wi_data in get(endpoint, entity.pat, params)['value']:
+                if wi_data is not None:
+                    found[str(wi_data['id'])] = wi_data
+                    if cache:
+                        self.__cache(entity, wi_data['id'], projection, wi_data)
+
+        return [found.get(str(wi)) for wi in items]
+
+    def get_work_item_by_id(self, entity, item_id, fields=None):
+        fields = frozenset(fields) if fields else None
+        wi_data = self.__cached(entity, item_id, fields)
+        if wi_data is None:
+            endpoint = endpoint_map['work_item_by_id'].format(entity.org, item_id)
+            projection = self.__widen(entity, [item_id], fields)
+            params = {'fields': ','.join(sorted(projection))} if projection is not None else None
+            wi_data = get(endpoint, entity.pat, params)
+            self.__cache(entity, item_id, projection, wi_data)
         return wi_data
 
+    def __cached(self, entity, item_id, fields):
+        """
+        Returns the cached work item if it was fetched with all the fields or with a superset of the given fields
+        """
+        with self.__cache_lock:
+            cached = self.__work_item_cache.get((entity.org, str(item_id)), {}).get(self.__token(entity))
+        if cached is None:
+            return None
+
+        cached_fields, wi_data = cached
+        if cached_fields is None or (fields is not None and fields <= cached_fields):
+            return wi_data
+        return None
+
+    def __widen(self, entity, items, fields):
+        """
+        Returns the projection to fetch the items with. Fields already cached for the items are added to it
+        so that the fetched json can replace the cached one
+        """
+        if fields is None:
+            return None
+
+        projection = set(fields)
+        token = self.__token(entity)
+        with self.__cache_lock:
+            for wi in items:
+                cached = self.__work_item_cache.get((entity.org, str(wi)), {}).get(token)
+                if cached is not None and cached[0] is not None:
+                    projection.update(cached[0])
+        return frozenset(projection)
+
+    def __cache(self, entity, item_id, fields, wi_data):
+        with self.__cache_lock:
+            tokens = self.__work_item_cache.setdefault((entity.org, str(item_id)), {})
+            tokens[self.__token(entity)] = (fields, wi_data)
+
+    def evict(self, entity, work_item_ids):
+        """
+        Drops the cached work items, for all the tokens, once they are written to. The memoized relations of the org
+        are dropped too, since a write to a work item also changes the relations of the work items it links to
+        """
+        with self.__cache_lock:
+            for work_item_id in work_item_ids:
+                self.__work_item_cache.pop((entity.org, str(work_item_id)), None)
+            for key in [key for key in self.__relations if key[0] == entity.org]:
+                del self.__relations[key]
+
+    @staticmethod
+    def __token(entity):
+        return hashlib.sha256((entity.pat or '').encode('utf-8')).hexdigest()[:16]
+
     def get_work_item_by_id_with_relations(self, entity, work_item_id):
         endpoint = endpoint_map['work_item_by_id_with_relations'].format(entity.org, work_item_id)
         wi_data = get(endpoint, entity.pat)
@@ -66,25 +203,71 @@ class AdoWorkItemClient(WorkItemApiClient):
         """
         retrieves query metadata from the query_id and returns the list of workitems
         """
-        endpoint = endpoint_map['ado_query_by_id'] \
-            .format(entity.org, entity.project, query_id, entity.ado_version)
+        query_md = self.__query_definition(entity, query_id)
+        work_items = self.__query_result(entity, query_id, query_md)
+
+        if len(work_items) == 0:
+            self.__logger.info(self.__name, 'no WorkItems found for query {}: {}'.format(query_id, query_md['name']))
+            return []
 
-        # retrieve query metadata
-        query_md = get(endpoint, entity.pat)
+        self.__logger.info(self.__name, 'Found {} WorkItem(s) for query filter "{}"...\n'
+                           .format(len(work_items), query_md['name']))
+        return work_items
+
+    def iter_work_items_by_query_id(self, entity, query_id, fields=None, chunk_size=None):
+        """
+        Yields the work items of the query hydrated with the given fields (all the fields by default).
+        Work items are fetched chunk_size (batch_size by default) at a time and the next chunk is fetched while
+        the current one is being consumed. Fetched work items are not cached, so at most two chunks are held in
+        memory however large the query is
+        Ex:
+            for work_item in wi_client.iter_work_items_by_query_id(entity, query_id, ['System.State']): ...
+        """
+        chunk_size = chunk_size or self.batch_size
+        work_item_ids = [wi['id'] for wi in self.get_work_items_by_query_id(entity, query_id)]
+        chunks = [work_item_ids[start:start + chunk_size] for start in range(0, len(work_item_ids), chunk_size)]
+        if not chunks:
+            return
+
+        with futures.ThreadPoolExecutor(max_workers=1) as ex:
+            next_chunk = ex.submit(self.get_work_items, entity, chunks[0], fields, False)
+            for index in range(len(chunks)):
+                work_items = next_chunk.result()
+                if index + 1 < len(chunks):
+                    next_chunk = ex.submit(self.get_work_items, entity, chunks[index + 1], fields, False)
+                for work_item in work_items:
+                    if work_item is not None:
+                        yield work_item
+
+    def __query_definition(self, entity, query_id):
+        key = (entity.org, entity.project, query_id)
+        with self.__cache_lock:
+            query_md = self.__query_definitions.get(key)
         if query_md is None:
-            raise ValueError("Couldn't retrieve query metadata for query_id : {}".format(query_id))
+            endpoint = endpoint_map['ado_query_by_id'] \
+                .format(entity.org, entity.project, query_id, entity.ado_version)
+            query_md = get(endpoint, entity.pat)
+            if query_md is None:
+                raise ValueError("Couldn't retrieve query metadata for query_id : {}".format(query_id))
+            with self.__cache_lock:
+                self.__query_definitions[key] = query_md
+        return query_md
+
+    def __query_result(self, entity, query_id, query_md):
+        """ Returns the work item references resulting from the query. Results are reused for query_result_ttl """
+        key = (entity.org, entity.project, query_id)
+        with self.__cache_lock:
+            cached = self.__query_results.get(key)
+        if cached is not None and time.time() - cached[0] < self.query_result_ttl:
+            return cached[1]
 
         # retrieve list of workitems which is the result of the query
         self.__logger.info(self.__name, "Query Filter Title: '{}'".format(query_md['name']))
         wi_results = get(query_md['_links']['wiql']['href'], entity.pat)
-
-        if 'workItems' not in wi_results or wi_results['workItems'] is None or len(wi_results['workItems']) == 0:
-            self.__logger.info(self.__name, 'no WorkItems found for query {}: {}'.format(query_id, query_md['name']))
-            return []
-
-        self.__logger.info(self.__name, 'Found {} WorkItem(s) for query filter "{}"...\n'
-                           .format(len(wi_results['workItems']), query_md['name']))
-        return wi_results['workItems']
+        work_items = wi_results.get('workItems') or []
+        with self.__cache_lock:
+            self.__query_results[key] = (time.time(), work_items)
+        return work_items
 
     def attach_work_item(self, item_id, pr_entity, artifact_id):
         """
@@ -92,23 +275,22 @@ class AdoWorkItemClient(WorkItemApiClient):
         """
         url = endpoint_map['work_item_update_by_id'].format(pr_entity.org, "MSTeams", item_id)
         querystring = {"api-version": pr_entity.ado_version}
-        payload = [{
-            "op": "add",
-            "path": "/relations/-",
-            "value": {
-                "rel": "ArtifactLink",
-                "url": artifact_id,
-                "attributes": {
-                    "name": "Pull request"
-                }
-            }
-        }]
+        payload = self.attach_work_item_payload(artifact_id).payload
         try:
             response = patch(url, pr_entity.pat, querystring, json.dumps(payload))
         except APICallFailedError:
             raise FailedToAttachWorkItemError(item_id)
+        finally:
+            self.evict(pr_entity, [item_id])
         self.__logger.info(self.__name, "Attached work item successfully!" + response.text)
 
+    @staticmethod
+    def attach_work_item_payload(artifact_id):
+        """ Returns the AdoFieldValueObject that links the artifact (ex: PR) to a work item """
+        field_value_obj = AdoFieldValueObject()
+        field_value_obj.add_relation("ArtifactLink", artifact_id, {"name": "Pull request"})
+        return field_value_obj
+
     def create(self, entity, work_item_type, payload,
                query_string='{}',
                content_type='application/json-patch+json'):
@@ -133,6 +315,85 @@ class AdoWorkItemClient(WorkItemApiClient):
                 parent.append(relation['url'])
         return parent
 
+    def work_item_graph(self, entity, work_item_ids: list, ancestors=True, descendants=False, max_depth=None):
+        """
+        Returns the WorkItemGraph of the given work items expanded to their ancestors and/or descendants up to
+        max_depth levels (all the levels by default).
+        Hierarchy is expanded breadth first and each level is fetched with a single batch call. Work items fetched
+        once are reused by the later calls, including the ones for the other PRs of the run, until a work item of
+        the org is written to
+        """
+        graph = WorkItemGraph()
+        up = set(int(wi) for wi in work_item_ids) if ancestors else set()
+        down = set(int(wi) for wi in work_item_ids) if descendants else set()
+        level = set(int(wi) for wi in work_item_ids)
+        depth = 0
+        while level:
+            relations = self.__fetch_relations(entity, level)
+            expand = max_depth is None or depth < max_depth
+            next_up, next_down = set(), set()
+            for work_item_id in level:
+                parents, children = relations[work_item_id]
+                graph.add(work_item_id, self.__cached(entity, work_item_id, None), parents, children)
+                if expand and work_item_id in up:
+                    next_up.update(parents)
+                if expand and work_item_id in down:
+                    next_down.update(children)
+
+            up = next_up - set(graph.nodes)
+            down = next_down - set(graph.nodes)
+            level = up | down
+            depth += 1
+        return graph
+
+    def __fetch_relations(self, entity, work_item_ids):
+        """
+        Returns the map of the given work items to their (parent ids, child ids). Work items which are not memoized
+        are fetched along with their relations, batch_size per call
+        """
+        fetched_relations = {}
+        missing = []
+        with self.__cache_lock:
+            for wi in work_item_ids:
+                if (entity.org, wi) in self.__relations:
+                    self.__relations.move_to_end((entity.org, wi))
+                    fetched_relations[wi] = self.__relations[(entity.org, wi)]
+                else:
+                    missing.append(wi)
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            self.__logger.debug(self.__name, 'Fetching work-items {} with relations...'.format(chunk))
+            endpoint = endpoint_map['work_items_by_ids'].format(entity.org)
+            params = {'ids': ','.join(str(wi) for wi in chunk),
+                      '$expand': 'relations',
+                      'errorPolicy': 'omit',
+                      'api-version': entity.ado_version}
+            fetched = {}
+            for wi_data in get(endpoint, entity.pat, params)['value']:
+                if wi_data is not None:
+                    fetched[wi_data['id']] = wi_data
+
+            for work_item_id in chunk:
+                wi_data = fetched.get(work_item_id)
+                relations = (wi_data or {}).get('relations') or []
+                parents = [self.__relation_id(r) for r in relations
+                           if r['rel'] == ADOConstants.work_item_relations['parent']]
+                children = [self.__relation_id(r) for r in relations
+                            if r['rel'] == ADOConstants.work_item_relations['child']]
+                if wi_data is not None:
+                    self.__cache(entity, work_item_id, None, wi_data)
+                fetched_relations[work_item_id] = (parents, children)
+                with self.__cache_lock:
+                    self.__relations[(entity.org, work_item_id)] = (parents, children)
+                    while len(self.__relations) > self.max_relations:
+                        self.__relations.popitem(last=False)
+        return fetched_relations
+
+    @staticmethod
+    def __relation_id(relation):
+        """ Returns the work item id from the relation url ending with /workItems/<id> """
+        return int(relation['url'].rstrip('/').rsplit('/', 1)[-1])
+
     def update_fields(self, pr_entity, work_item_id, field_value_obj: FieldValueObject):
         payload = field_value_obj.payload_str()
         response = None
@@ -146,3 +407,72 @@ class AdoWorkItemClient(WorkItemApiClient):
         except APICallFailedError:
             self.__logger.error(self.__name, "API response: {}".format(response.text if response else None))
             raise FailedToUpdateFieldsError(work_item_id, payload)
+        finally:
+            self.evict(pr_entity, [work_item_id])
+        return response
+
+    def update_fields_bulk(self, pr_entity, updates: list):
+        """
+        Updates many work items with the $batch api. updates is a list of (work_item_id, FieldValueObject) and the
+        updates of the same work item are merged. Work item attachments can take part in the same batch through
+        attach_work_item_payload().
+        Work items are sent batch_size per call and the calls are made concurrently.
+
+        Returns the map of each work item id to None if it is updated or to the FailedToUpdateFieldsError otherwise
+        """
+        merged = {}
+        for work_item_id, field_value_obj in updates:
+            if work_item_id not in merged:
+                merged[work_item_id] = self.new_field_value_object()
+            merged[work_item_id].merge(field_value_obj)
+
+        work_item_ids = list(merged.keys())
+        chunks = [work_item_ids[start:start + self.batch_size]
+                  for start in range(0, len(work_item_ids), self.batch_size)]
+        if not chunks:
+            return {}
+
+        results = {}
+        try:
+            with futures.ThreadPoolExecutor(max_workers=min(self.batch_workers, len(chunks))) as ex:
+                for chunk_results in ex.map(lambda chunk: self.__update_batch(pr_entity, chunk, merged), chunks):
+                    results.update(chunk_results)
+        finally:
+            # even the failed items may have been updated, so none of them is served from the cache anymore
+            self.evict(pr_entity, work_item_ids)
+        return results
+
+    def __update_batch(self, pr_entity, work_item_ids, merged):
+        batch = [{
+            "method": "PATCH",
+            "uri": "/_apis/wit/workitems/{}?api-version={}".format(work_item_id, pr_entity.ado_version),
+            "headers": {"Content-Type": "application/json-patch+json"},
+            "body": json.loads(merged[work_item_id].payload_str())
+        } for work_item_id in work_item_ids]
+
+        endpoint = endpoint_map['work_items_batch'].format(pr_entity.org)
+        querystring = {"api-version": pr_entity.ado_version}
+        try:
+            responses = post(endpoint, pr_entity.pat, querystring, json.dumps(batch)).json()['value']
+        except Exception as e:
+            self.__logger.error(self.__name, 'Failed to update the work items {} in batch: {}'.format(work_item_ids, e))
+            return {work_item_id: FailedToUpdateFieldsError(work_item_id, merged[work_item_id].payload_str())
+                    for work_item_id in work_item_ids}
+
+        results = {}
+        for work_item_id, response in zip(work_item_ids, responses):
+            if 200 <= response.get('code', 0) < 300:
+                results[work_item_id] = None
+            else:
+                self.__logger.error(self.__name, 'Failed to update the work item {}: {}'
+                                    .format(work_item_id, response.get('body')))
+                results[work_item_id] = FailedToUpdateFieldsError(work_item_id, merged[work_item_id].payload_str())
+
+        # work items without a response in the batch are not known to be updated
+        for work_item_id in work_item_ids[len(responses):]:
+            self.__logger.error(self.__name, 'No response for the update of the work item {} in batch'
+                                .format(work_item_id))
+            results[work_item_id] = FailedToUpdateFieldsError(work_item_id, merged[work_item_id].payload_str())
+        self.__logger.info(self.__name, 'Updated {} of {} work items in batch'
+                           .format(sum(1 for e in results.values() if e is None), len(work_item_ids)))
+        return results
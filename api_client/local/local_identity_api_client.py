@@ -0,0 +1,37 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+from core.api.interfaces.identity_api_client import IdentityApiClient
+from core.utils.map import resources
+
+
+class LocalIdentityClient(IdentityApiClient):
+    """
+    Identity client that resolves the aliases from a local list of identities without making any API calls.
+    Meant for tests and offline runs
+    """
+    __logger = resources.get('LOGGER')
+    __name = 'LocalIdentityClient'
+
+    def __init__(self, identities=None):
+        super().__init__()
+        self.__index = {}
+        for identity in identities or []:
+            self.add(identity)
+
+    @classmethod
+    def from_file(cls, path):
+        """ Loads the identities from a json file holding a list of identities """
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def add(self, identity):
+        for key in ['id', 'uniqueName', 'displayName', 'mail']:
+            if identity.get(key):
+                self.__index[identity[key].lower()] = identity
+
+    def resolve(self, entity, aliases: list):
+        self.__logger.debug(self.__name, 'Resolving identities of {} locally'.format(aliases))
+        return {alias: self.__index.get(alias.lower()) for alias in aliases}
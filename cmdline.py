@@ -0,0 +1,62 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Command line input of Guardinel. Kept free of the heavy imports, so that the thin client of the worker pool
+starts quickly
+"""
+
+import getopt
+import os
+import tempfile
+
+from core.utils.map import resources
+
+__logger = resources.get('LOGGER')
+__tag = 'Guardinel'
+
+
+class CmdlineInput:
+    def __init__(self):
+        self.config_path = None
+        self.access_token = None
+
+
+def help_info():
+    __logger.info(__tag,
+                  "Please follow the below format for arguments:\n"
+                  "arguments: -f/--config : path to config file\n"
+                  "           -h/--help : print help\n"
+                  "Refer this wiki for the config file format")
+
+
+def parse_args(args_list, default):
+    cmdline_in = CmdlineInput()
+    cmdline_in.config_path = default
+    cmdline_in.access_token = None
+
+    # Options
+    options = "hc:t:"
+
+    # Long options
+    long_options = ["help", "config=", "token="]
+
+    # Parsing argument
+    arguments, values = getopt.getopt(args_list, options, long_options)
+    # checking each argument
+    for currentArgument, currentValue in arguments:
+        if currentArgument in ("-h", "--help"):
+            help_info()
+
+        elif currentArgument in ("-c", "--config"):
+            cmdline_in.config_path = currentValue
+
+        elif currentArgument in ("-t", "--token"):
+            cmdline_in.access_token = currentValue
+
+    return cmdline_in
+
+
+def default_socket_path():
+    """ Unix socket of the Guardinel worker pool. Can be changed with the GUARDINEL_SOCKET environment variable """
+    return os.environ.get('GUARDINEL_SOCKET', os.path.join(tempfile.gettempdir(), 'guardinel.sock'))
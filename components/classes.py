@@ -1,17 +1,19 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
-from components.samples.notifier_sample_sysout_notifier import CommandLineNotifier
-from components.samples.override_sample_approver_override import ApprovalOverride
-from components.samples.policy_sample_hello_world import HelloWorldPolicy
+from core.utils.registry import LazyRegistry
 
-instances_map = {
+# components are imported and instantiated only when the config references them
+instances_map = LazyRegistry({
     # policies
-    'hello_world_policy': HelloWorldPolicy(),
+    'hello_world_policy': 'components.samples.policy_sample_hello_world:HelloWorldPolicy',
 
     # overrides
-    'approval_override': ApprovalOverride(),
+    'approval_override': 'components.samples.override_sample_approver_override:ApprovalOverride',
 
     # notifiers
-    'cmdline_notifier': CommandLineNotifier()
+    'cmdline_notifier': 'components.samples.notifier_sample_sysout_notifier:CommandLineNotifier'
 
-}
+})
+
+# components published by the installed packages under the 'guardinel.components' entry point group
+instances_map.discover('guardinel.components')
@@ -59,6 +59,7 @@ class PoliciesConfigBuilder(ConfigBuilder):
         self.__telemetry = self.default_telemetry()
         self.__policy_overrides = []
         self.__global_overrides = []
+        self.__task_overrides = None
         self.telemetry_enabled = True
 
     def add_task(self, task):
@@ -88,6 +89,21 @@ class PoliciesConfigBuilder(ConfigBuilder):
         self.__notifiers = notifiers
         return self
 
+    def with_task_overrides(self, overrides):
+        """ Overrides of the tasks resolved already. If not set, they are collected from the tasks on build """
+        self.__task_overrides = overrides
+        return self
+
+    def with_compiled(self, compiled):
+        """ Loads the tasks, overrides, notifiers and telemetry from a config compiled by ConfigCompiler """
+        self.__policies = [task['name'] for task in compiled['tasks']]
+        self.__task_overrides = compiled['task_overrides']
+        self.__notifiers = list(compiled['notifiers'])
+        self.__global_overrides = list(compiled['global_overrides'])
+        self.__telemetry = self.default_telemetry() + compiled['telemetry']
+        self.telemetry_enabled = compiled['telemetry_enabled']
+        return self
+
     @staticmethod
     def default_telemetry():
         return []
@@ -101,7 +117,10 @@ class PoliciesConfigBuilder(ConfigBuilder):
         self.__validate()
         __config = PoliciesConfig(self.instances_map)
         __config.policies = get_values(self.instances_map, self.__policies)
-        __config.update_policy_overrides()
+        if self.__task_overrides is None:
+            __config.update_policy_overrides()
+        else:
+            __config.policy_overrides = get_values(self.instances_map, self.__task_overrides)
         __config.notifiers = get_values(self.instances_map, self.__notifiers)
         __config.shield_overrides = get_values(self.instances_map, self.__global_overrides)
         __config.telemetry = get_values(self.instances_map, self.__telemetry)
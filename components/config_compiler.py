@@ -0,0 +1,295 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import hashlib
+import importlib.util
+import json
+import os
+
+from components.utils.content_scanner import validate_rules
+from core.exceptions import ConfigValidationError
+from core.interfaces.action import Action
+from core.interfaces.notifier import Notifier
+from core.interfaces.override import Override
+from core.interfaces.task import Task
+from core.interfaces.telemetry import Telemetry
+from core.utils.map import resources
+
+_names_schema = {'type': list, 'items': {'type': str}}
+
+# schema of guardinel.json
+CONFIG_SCHEMA = {
+    'type': dict,
+    'required': ['input', 'tasks'],
+    'properties': {
+        'input': {
+            'type': dict,
+            'required': ['org', 'project', 'entity', 'api'],
+            'properties': {
+                'org': {'type': str},
+                'project': {'type': str},
+                'entity': {'type': dict, 'required': ['id'], 'properties': {'id': {'type': (str, int)}}},
+                'api': {'type': dict, 'required': ['version'],
+                        'properties': {'identifier': {'type': str}, 'version': {'type': str}}},
+                'write_spill_dir': {'type': str}
+            }
+        },
+        'tasks': {'type': list, 'items': {'type': str}, 'min_items': 1},
+        'notifiers': _names_schema,
+        'global_overrides': _names_schema,
+        'telemetry': _names_schema,
+        'telemetry_enabled': {'type': bool},
+        'work_item_fields': _names_schema,
+        'log_level': {'type': str},
+        'identity': {
+            'type': dict,
+            'properties': {
+                'cache_path': {'type': str},
+                'ttl_seconds': {'type': (int, float)},
+                'negative_ttl_seconds': {'type': (int, float)},
+                'source': {'type': str},
+                'client': {'type': str}
+            }
+        },
+        'executor': {
+            'type': dict,
+            'properties': {
+                'thread_count': {'type': (int, str, type(None)), 'enum': ['auto']},
+                'adaptive': {'type': bool},
+                'min_thread_count': {'type': int},
+                'max_thread_count': {'type': int},
+                'process_count': {'type': int},
+                'results_path': {'type': str},
+                'stats_path': {'type': str}
+            }
+        },
+        'circuit_breaker': {
+            'type': dict,
+            'properties': {
+                'window_seconds': {'type': (int, float)},
+                'min_requests': {'type': int},
+                'error_rate': {'type': (int, float)},
+                'latency_seconds': {'type': (int, float)},
+                'slow_rate': {'type': (int, float)},
+                'open_seconds': {'type': (int, float)},
+                'half_open_requests': {'type': int},
+                'failure_statuses': {'type': list, 'items': {'type': int}},
+                'families': {'type': dict}
+            }
+        },
+        'hedging': {
+            'type': dict,
+            'properties': {
+                'enabled': {'type': bool},
+                'percentile': {'type': (int, float)},
+                'budget': {'type': (int, float)},
+                'min_samples': {'type': int},
+                'families': _names_schema
+            }
+        },
+        'scheduler': {
+            'type': dict,
+            'properties': {
+                'max_concurrency': {'type': int},
+                'tenant_concurrency': {'type': int},
+                'rate_per_second': {'type': (int, float)},
+                'max_rate_per_second': {'type': (int, float)},
+                'tenants': {'type': dict}
+            }
+        }
+    }
+}
+
+
+class ConfigCompiler:
+    """
+    Compiles guardinel.json into a snapshot that the config builder consumes.
+
+    Compilation validates the whole config against the schema, resolves every referenced component in the
+    instances map and collects the overrides, callbacks and work item fields of each task. All the errors found
+    are raised together in a ConfigValidationError.
+
+    The compiled snapshot is written to the snapshot directory keyed by the hash of the config file, of the
+    registered components and of the modification time and size of their modules, so the later runs with the
+    same config and components load the snapshot directly, and a change to the code of a component compiles the
+    config again
+    Ex:
+        compiled = ConfigCompiler(instances_map).load('guardinel.json')
+        compiled['tasks'] -> [{'name': 'hello_world_policy', 'overrides': [...], 'callbacks': [...], ...}]
+    """
+    __logger = resources.get('LOGGER')
+    __name = 'ConfigCompiler'
+
+    version = 1
+    default_snapshot_dir = os.path.join(os.path.expanduser('~'), '.guardinel', 'compiled_configs')
+
+    def __init__(self, instances_map, snapshot_dir=None, schema=None):
+        self.instances_map = instances_map
+        self.snapshot_dir = snapshot_dir or self.default_snapshot_dir
+        self.schema = schema or CONFIG_SCHEMA
+
+    def load(self, config_path):
+        """ Returns the compiled snapshot of the given config file, compiling it only if it has changed """
+        with open(config_path, 'rb') as f:
+            raw = f.read()
+
+        config_hash = self.hash(raw)
+        snapshot_path = os.path.join(self.snapshot_dir, 'config-{}.json'.format(config_hash))
+        compiled = self.__read_snapshot(snapshot_path, config_hash)
+        if compiled is not None:
+            self.__logger.debug(self.__name, 'Loaded the compiled config from {}'.format(snapshot_path))
+            return compiled
+
+        compiled = self.compile(json.loads(raw.decode('utf-8')), config_hash)
+        self.__write_snapshot(snapshot_path, compiled)
+        return compiled
+
+    def compile(self, config, config_hash=None):
+        """ Validates the config and returns its compiled snapshot. Raises ConfigValidationError if invalid """
+        errors = self.validate(config, self.schema)
+        if not isinstance(config, dict):
+            raise ConfigValidationError(errors)
+
+        # references are resolved even if the schema is violated, so that all the errors are reported together
+        tasks = [self.__compile_task(name, errors) for name in self.__names(config, 'tasks')]
+        overrides = list(dict.fromkeys(override for task in tasks for override in task['overrides']))
+        self.__resolve('task override', overrides, Override, errors)
+        self.__resolve('callback', [callback for task in tasks for callback in task['callbacks']], Action, errors)
+
+        notifiers = self.__names(config, 'notifiers')
+        global_overrides = self.__names(config, 'global_overrides')
+        telemetry = self.__names(config, 'telemetry')
+        self.__resolve('notifier', notifiers, Notifier, errors)
+        self.__resolve('global override', global_overrides, Override, errors)
+        self.__resolve('telemetry', telemetry, Telemetry, errors)
+        if errors:
+            raise ConfigValidationError(errors)
+
+        work_item_fields = self.__names(config, 'work_item_fields')
+        for task in tasks:
+            work_item_fields.extend(task['work_item_fields'])
+
+        return {
+            'version': self.version,
+            'hash': config_hash or self.hash(json.dumps(config, sort_keys=True).encode('utf-8')),
+            'config': config,
+            'tasks': tasks,
+            'task_overrides': overrides,
+            'notifiers': notifiers,
+            'global_overrides': global_overrides,
+            'telemetry': telemetry,
+            'telemetry_enabled': bool(config.get('telemetry_enabled')),
+            'work_item_fields': list(dict.fromkeys(work_item_fields))
+        }
+
+    def hash(self, raw):
+        digest = hashlib.sha256(raw)
+        digest.update(json.dumps([self.version, self.component_signatures()]).encode('utf-8'))
+        return digest.hexdigest()
+
+    def component_signatures(self):
+        """
+        Returns [name, module, mtime, size] of each registered component. Modules are located without being
+        imported, so the components that are not loaded by the run stay unloaded
+        """
+        if hasattr(self.instances_map, 'specs'):
+            modules = {name: spec.partition(':')[0] if isinstance(spec, str) else getattr(spec, '__module__', None)
+                       for name, spec in self.instances_map.specs().items()}
+        else:
+            modules = {name: type(instance).__module__ for name, instance in self.instances_map.items()}
+        return [[name, modules[name]] + self.__module_signature(modules[name]) for name in sorted(modules)]
+
+    @staticmethod
+    def __module_signature(module_name):
+        try:
+            stat = os.stat(importlib.util.find_spec(module_name).origin)
+            return [stat.st_mtime_ns, stat.st_size]
+        except (ImportError, AttributeError, TypeError, ValueError, OSError):
+            return [None, None]
+
+    @staticmethod
+    def validate(value, schema, path='config'):
+        """ Returns the list of all the errors of the value against the schema """
+        if not isinstance(value, schema['type']) or \
+                (isinstance(value, bool) and schema['type'] in [int, (int, float)]):
+            expected = schema['type'] if isinstance(schema['type'], tuple) else (schema['type'],)
+            return ['{}: expected {} but found {}'.format(path, ' or '.join(t.__name__ for t in expected),
+                                                          type(value).__name__)]
+
+        errors = []
+        if isinstance(value, str) and 'enum' in schema and value not in schema['enum']:
+            errors.append('{}: expected one of {} but found "{}"'.format(path, schema['enum'], value))
+        if isinstance(value, dict):
+            for key in schema.get('required', []):
+                if key not in value:
+                    errors.append('{}: missing required key "{}"'.format(path, key))
+            properties = schema.get('properties', {})
+            for key, item in value.items():
+                if key in properties:
+                    errors.extend(ConfigCompiler.validate(item, properties[key], '{}.{}'.format(path, key)))
+        elif isinstance(value, list):
+            if len(value) < schema.get('min_items', 0):
+                errors.append('{}: expected at least {} item(s)'.format(path, schema['min_items']))
+            if 'items' in schema:
+                for index, item in enumerate(value):
+                    errors.extend(ConfigCompiler.validate(item, schema['items'], '{}[{}]'.format(path, index)))
+        return errors
+
+    @staticmethod
+    def __names(config, key):
+        names = config.get(key)
+        return [name for name in names if isinstance(name, str)] if isinstance(names, list) else []
+
+    def __compile_task(self, name, errors):
+        task = self.__resolve('task', [name], Task, errors)
+        if not task:
+            return {'name': name, 'overrides': [], 'callbacks': [], 'work_item_fields': []}
+
+        task = task[0]
+        errors.extend('task "{}" scan rules: {}'.format(name, error)
+                      for error in validate_rules(task.scan_rules() or {}))
+        return {'name': name, 'overrides': list(task.overrides() or []), 'callbacks': list(task.callbacks() or []),
+                'work_item_fields': list(task.work_item_fields() or [])}
+
+    def __resolve(self, kind, names, interface, errors):
+        """ Returns the instances of the given names. Errors of the unresolved names are added to the errors """
+        instances = []
+        for name in names:
+            if name not in self.instances_map:
+                errors.append('{} "{}" is not registered in the instances map'.format(kind, name))
+                continue
+            try:
+                instance = self.instances_map.get(name)
+            except Exception as e:
+                errors.append('{} "{}" could not be loaded: {}'.format(kind, name, e))
+                continue
+            if not isinstance(instance, interface):
+                errors.append('{} "{}" is a {}, expected a {}'.format(kind, name, instance.__class__.__name__,
+                                                                    interface.__name__))
+                continue
+            instances.append(instance)
+        return instances
+
+    def __read_snapshot(self, snapshot_path, config_hash):
+        if not os.path.exists(snapshot_path):
+            return None
+        try:
+            with open(snapshot_path, encoding='utf-8') as f:
+                compiled = json.load(f)
+        except (OSError, ValueError) as e:
+            self.__logger.warn(self.__name, 'Ignoring the unreadable compiled config {}: {}'.format(snapshot_path, e))
+            return None
+        if compiled.get('version') != self.version or compiled.get('hash') != config_hash:
+            return None
+        return compiled
+
+    def __write_snapshot(self, snapshot_path, compiled):
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            temp_path = '{}.{}.tmp'.format(snapshot_path, os.getpid())
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(compiled, f)
+            os.replace(temp_path, snapshot_path)
+        except OSError as e:
+            # the snapshot only saves the compilation of the later runs
+            self.__logger.warn(self.__name, 'Could not write the compiled config {}: {}'.format(snapshot_path, e))
@@ -1,9 +1,15 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import re
+
+
 class Constants:
     FIELD_NOT_FOUND = 'FIELD_NOT_FOUND'
 
+    # marker added to the description of the cherry picked PRs
+    CHERRY_PICK_PATTERN = re.compile('Cherry-picked from commit')
+
     user_id_mapping = {
         "Ramraj S": {
             "displayName": "Ramraj S",
@@ -2,14 +2,28 @@
 # Licensed under the MIT License.
 
 import json
-import re
+import mmap
+import os
+import tempfile
+from concurrent import futures
 
+from api_client.exceptions import FailedToAddReviewerError
 from components.constants import Constants
+from components.pr_snapshot import PullRequestSnapshot
+from components.utils.changed_lines import FileChangedLines
+from components.utils.comment_threads import CommentThreadIndex
+from components.utils.content_scanner import compile_scanner, scan_pull_request, scoped, validate_rules
+from components.utils.path_matcher import compile_rules
+from components.utils.reviewer_index import ReviewerIndex
 from core.api.api_config_constants import APIConfigConstants
 from core.api.caller import get
+from core.api.write_queue import WriteBehindQueue
+from core.exceptions import ConfigValidationError
 from core.interfaces.input import InputEntity
 
 from core.utils.helper import get_value, is_empty
+from core.utils.lru_cache import SizedLRUCache
+from core.utils.shared_content import SharedContentStore
 from dependency_injector import DependencyInjector
 
 
@@ -20,6 +34,13 @@ class PullRequestEntity(InputEntity):
     """
     __name = 'PullRequestEntity'
 
+    # limits on fetching the files from the PR
+    file_fetch_workers = 8
+    file_cache_size = 64 * 1024 * 1024
+    file_spill_size = 1024 * 1024
+    # file contents larger than this are shared with the worker processes through shared memory
+    snapshot_share_size = 64 * 1024
+
     def __init__(self):
         self.pr_num = None
         self.pat = None
@@ -30,22 +51,41 @@ class PullRequestEntity(InputEntity):
         self.ado_version = None
 
         self.__metadata = None
+        self.__reviewer_index = None
         self.__work_items = None
-        self.__work_items_md_map = None
+        self.__work_items_metadata = None
         self.__area_paths = None
         self.__commits = None
         self.__commits_md_map = {}
         self.__changedFiles = None
+        self.__deletedFiles = None
         self.pr_approver_key = None
         self.pr_approver_user_id = None
         self.pr_diff = None
         self.api_client_mapper = DependencyInjector.get(DependencyInjector.Constants.API_CLIENT_MAPPER)
 
+        # fields of the linked work items that are fetched. Tasks and guardinel.json can register more of them
+        self.work_item_fields = {'System.AreaPath'}
+
+        # content scan rules registered by the tasks and the matches of each source scanned so far
+        self.scan_rules = {}
+        self.__scanned = {}
+
+        # directory of the spill files of the write queue. Writes left by a failed run are retried by the next one
+        self.write_spill_dir = os.path.join(tempfile.gettempdir(), 'guardinel')
+        self.__write_queue = None
+
         self.__comment_threads = None
+        self.__comment_thread_index = None
         self.__changed_files = []
         self.__changes = None
-        self.__fileDiff = None
-        self.__files_from_pr = {}
+        self.__file_diffs = {}
+        self.__changed_lines = {}
+        self.__path_matches = {}
+        # file path -> [raw content, parsed json or None], charged once with the size of the raw content.
+        # Memory-mapped contents are closed as soon as they are evicted
+        self.__files_from_pr = SizedLRUCache(self.file_cache_size, on_evict=self.__close_content)
+        self.__shared_contents = SharedContentStore()
 
     def name(self):
         return self.__name
@@ -102,16 +142,56 @@ class PullRequestEntity(InputEntity):
 
         return work_items
 
-    def linked_work_items_metadata_map(self):
-        if self.__work_items_md_map is None:
-            wi_client = self.api_client_mapper.get(APIConfigConstants.WORK_ITEM_API_CLIENT)
-            self.__work_items_md_map = dict()
-            self.logger().info(self.__name, 'Fetching metadata of work-items linked to the PR {}...\n'
-                               .format(self.pr_num))
-            for wi in self.linked_work_items():
-                self.__work_items_md_map[wi['id']] = wi_client.get_work_item_by_id(self, wi['id'])
+    def register_work_item_fields(self, fields):
+        """ Adds the given fields to the projection used while fetching the linked work items """
+        self.work_item_fields.update(fields or [])
+
+    def register_scan_rules(self, rules: dict, scope: str):
+        """
+        Adds the given rules to the rules that the contents of the PR are scanned for, under the given scope
+        (the task name), so that the rules of different tasks don't clash. Raises ConfigValidationError if a rule
+        is invalid
+        """
+        errors = validate_rules(rules or {})
+        if errors:
+            raise ConfigValidationError(['{} scan rules: {}'.format(scope, error) for error in errors])
+
+        for name, patterns in scoped(scope, rules or {}).items():
+            registered = self.scan_rules.setdefault(name, [])
+            registered.extend(pattern for pattern in patterns if pattern not in registered)
+        self.__scanned = {}
 
-        return self.__work_items_md_map
+    def content_matches(self, file_paths: list = None, scope: str = None):
+        """
+        Returns the ContentMatches of the registered scan rules in the description, the commit messages and the
+        given files of the PR. With a scope, only the rules registered under it are returned, named without the
+        scope. Files deleted by the PR are skipped. Every source is scanned once for all the rules and its
+        matches are cached
+        Ex:
+            entity.content_matches(entity.changed_files(), self.name()).matches('todo_markers')
+        """
+        matches = scan_pull_request(self, compile_scanner(self.scan_rules), self.__scanned, file_paths)
+        return matches.scoped(scope) if scope is not None else matches
+
+    def linked_work_items_metadata_map(self, fields=None):
+        """
+        Returns the map of linked work item ids to their metadata. Only the registered work_item_fields and the
+        given fields are fetched. Work items are cached by the client, so the repeated calls are not refetched
+        """
+        wi_client = self.api_client_mapper.get(APIConfigConstants.WORK_ITEM_API_CLIENT)
+        work_item_ids = self.linked_work_items_ids()
+        work_items = wi_client.get_work_items(self, work_item_ids, fields=self.work_item_fields.union(fields or []))
+        metadata_map = dict(zip(work_item_ids, work_items))
+
+        # fields fetched so far are kept for the snapshot, which must not call the apis
+        fetched = dict(self.__work_items_metadata or {})
+        for work_item_id, metadata in metadata_map.items():
+            known = fetched.get(work_item_id) or {}
+            fetched[work_item_id] = {**known, **(metadata or {}),
+                                     'fields': {**(get_value(known, ['fields']) or {}),
+                                                **(get_value(metadata, ['fields']) or {})}}
+        self.__work_items_metadata = fetched
+        return metadata_map
 
     def work_items_field_values(self, field_name):
         """
@@ -126,15 +206,25 @@ class PullRequestEntity(InputEntity):
         Note: If field doesn't exist in the work item, returns a map where work item is mapped to FIELD_NOT_FOUND
         """
         field_value_map = {}
-        for key, metadata in self.linked_work_items_metadata_map().items():
+        for key, metadata in self.linked_work_items_metadata_map([field_name]).items():
             field_value_map[key] = get_value(metadata, ['fields', field_name], default=Constants.FIELD_NOT_FOUND)
         return field_value_map
 
+    def linked_work_items_hierarchy(self, ancestors=True, descendants=False, max_depth=None):
+        """
+        Returns the WorkItemGraph of the linked work items expanded to their ancestors and/or descendants
+        Ex:
+            graph = entity.linked_work_items_hierarchy()
+            epics = [graph.ancestor_of_type(wi, 'Epic') for wi in entity.linked_work_items_ids()]
+        """
+        return self.api_client_mapper.get(APIConfigConstants.WORK_ITEM_API_CLIENT).work_item_graph(
+            self, self.linked_work_items_ids(), ancestors=ancestors, descendants=descendants, max_depth=max_depth)
+
     def linked_area_paths(self):
         if self.__area_paths is None:
             self.__area_paths = set()
-            for wi in self.linked_work_items_metadata_map().values():
-                self.__area_paths.add(wi['fields']['System.AreaPath'])
+            for wi in self.linked_work_items_metadata_map(['System.AreaPath']).values():
+                self.__area_paths.add(get_value(wi, ['fields', 'System.AreaPath']))
         return self.__area_paths
 
     def get_commits(self):
@@ -161,55 +251,142 @@ class PullRequestEntity(InputEntity):
 
     def is_cherry_pick(self):
         """ Returns True if the current PR is a cherry picked one """
-        desc = get_value(self.metadata(), ['description'])
-        pattern = re.compile('Cherry-picked from commit')
-        if len(pattern.findall(desc)) > 0:
-            return True
-
-        return False
+        desc = get_value(self.metadata(), ['description']) or ''
+        return Constants.CHERRY_PICK_PATTERN.search(desc) is not None
 
     def get_reviewers(self):
         return get_value(self.metadata(), ['reviewers'])
 
+    def reviewer_index(self):
+        """ Returns the ReviewerIndex of the reviewers, built once per metadata fetch """
+        if self.__reviewer_index is None:
+            self.__reviewer_index = ReviewerIndex(self.get_reviewers())
+        return self.__reviewer_index
+
     def get_approvers(self):
-        approvers = []
-        for reviewer in self.get_reviewers():
-            vote = get_value(reviewer, ['vote'])
-            if vote == 10 or vote == 5:
-                approvers.append(reviewer)
-        return approvers
+        return self.reviewer_index().approvers()
 
     def is_approved_by(self, reviewers: list):
-        """ Returns True if any of the reviewers in the input list has approved the PR """
+        """
+        Returns True if any of the reviewers in the input list has approved the PR
+        Reviewers can be given by their id, uniqueName or displayName
+        """
         if is_empty(reviewers):
             return True
 
-        pr_approvers = json.dumps(self.get_approvers())
-        for reviewer in reviewers:
-            if reviewer in pr_approvers:
-                self.logger().info(self.name(), '{} has approved the PR!'.format(reviewer))
-                return True
+        approvers = self.reviewer_index().voted(reviewers, ReviewerIndex.APPROVED_VOTES)
+        if approvers:
+            self.logger().info(self.name(), '{} has approved the PR!'.format(approvers[0]))
+            return True
         return False
 
     def add_reviewers(self, reviewers: list, vote=0, is_required=False):
         """
         Takes a list of email aliases as input and adds them as reviewer to the PR
-        Note: You should make an entry in the ado_data for the new email aliases.
+        Aliases are resolved to their identities in bulk through the identity resolver and all the reviewers are
+        added together. Cached reviewers are refreshed once all of them are added
+
+        Returns the map of each alias to None if it is a reviewer of the PR now or to the error otherwise
         """
         if reviewers is None or len(reviewers) == 0:
-            return
+            return {}
 
+        outcomes = {}
+        reviewer_ids = {}
+        identities = self.resolve_identities(reviewers)
         for reviewer in reviewers:
-            reviewer_id = get_value(Constants.user_id_mapping, [reviewer, 'id'])
+            reviewer_id = get_value(identities, [reviewer, 'id'])
             if reviewer_id is None:
-                self.logger().warn(self.name(), 'reviewer_id is not configured in ado_data for {}'.format(reviewer))
+                self.logger().warn(self.name(), 'Could not resolve the identity of the reviewer {}'.format(reviewer))
+                outcomes[reviewer] = FailedToAddReviewerError(reviewer)
+            elif self.reviewer_index().contains(reviewer_id):
+                outcomes[reviewer] = None
             else:
-                self.__add_reviewer(reviewer_id, vote, is_required)
+                reviewer_ids[reviewer] = reviewer_id
+
+        if reviewer_ids:
+            added = self.api_client_mapper.get(APIConfigConstants.PULL_REQUEST_API_CLIENT)\
+                .add_reviewers(entity=self, reviewers=list(reviewer_ids.values()), vote=vote, is_required=is_required)
+            for reviewer, reviewer_id in reviewer_ids.items():
+                outcomes[reviewer] = added.get(reviewer_id)
+            self.refresh_reviewers()
+
+        return outcomes
 
-    def __add_reviewer(self, reviewer_id, vote, is_required):
-        if reviewer_id not in json.dumps(self.get_reviewers()):
-            self.api_client_mapper.get(APIConfigConstants.PULL_REQUEST_API_CLIENT)\
-                .add_reviewer(entity=self, reviewer=reviewer_id, vote=vote, is_required=is_required)
+    def refresh_reviewers(self):
+        """
+        Re-fetches the reviewers of the PR into a copy of the cached metadata, since the metadata is shared with
+        the api client. Invoked after the reviewers are added, so a failure is logged and the stale reviewers are
+        kept instead of failing the writes that succeeded
+        """
+        try:
+            reviewers = self.api_client_mapper.get(APIConfigConstants.PULL_REQUEST_API_CLIENT).get_reviewers(self)
+        except Exception as e:
+            self.logger().warn(self.__name, 'Failed to refresh the reviewers of PR {}: {}'.format(self.pr_num, e))
+            return
+
+        self.__metadata = dict(self.metadata(), reviewers=reviewers)
+        self.__reviewer_index = None
+
+    def resolve_identities(self, aliases: list):
+        """ Returns the map of the given aliases to their identities, None for the ones that couldn't be resolved """
+        resolver = DependencyInjector.get(DependencyInjector.Constants.IDENTITY_RESOLVER)
+        # identities mapped manually in the constants are resolved without any lookups
+        resolver.add_identities(Constants.user_id_mapping.values())
+        return resolver.resolve(self, aliases)
+
+    def write_queue(self):
+        """
+        Returns the WriteBehindQueue of this PR. Updates to work items and reviewers queued in it are merged and
+        sent together once all the tasks of the run are executed
+        Ex:
+            entity.write_queue().update_fields(work_item_id, field_value_obj)
+            entity.write_queue().attach_work_item(work_item_id, artifact_id)
+        """
+        if self.__write_queue is None:
+            os.makedirs(self.write_spill_dir, exist_ok=True)
+            spill_path = os.path.join(self.write_spill_dir, 'writes-{}-{}-{}.jsonl'
+                                      .format(self.org, self.project, self.pr_num))
+            self.__write_queue = WriteBehindQueue(self, self.api_client_mapper, spill_path)
+        return self.__write_queue
+
+    def flush_writes(self):
+        if self.__write_queue is None:
+            return []
+
+        results = self.__write_queue.flush()
+        for result in results:
+            if not result.succeeded():
+                self.logger().error(self.__name, 'Failed to {} {}: {}'
+                                    .format(result.operation, result.target, result.error))
+        if any(result.operation == WriteBehindQueue.ADD_REVIEWER for result in results):
+            self.refresh_reviewers()
+        return results
+
+    def snapshot(self):
+        """ Returns the PullRequestSnapshot of the data fetched so far. No api is called """
+        data = {
+            'metadata': self.__metadata,
+            'work_items': self.__work_items,
+            'work_items_metadata': self.__work_items_metadata,
+            'area_paths': self.__area_paths,
+            'commits': self.__commits,
+            'comment_threads': self.__comment_threads,
+            'scan_rules': self.scan_rules,
+            'changed_files': self.__changedFiles,
+            'deleted_files': self.__deletedFiles,
+            'changed_lines': dict(self.__changed_lines),
+            'files': {}
+        }
+        for file_path, (content, _) in self.__files_from_pr.items():
+            if not isinstance(content, bytes) or len(content) > self.snapshot_share_size:
+                content = self.__shared_contents.share(file_path, content)
+            data['files'][file_path] = content
+
+        return PullRequestSnapshot(self.pr_num, self.org, self.project, self.ado_version, data)
+
+    def release_snapshots(self):
+        self.__shared_contents.close()
 
     def is_work_item_linked(self, work_item_id):
         """ Returns Ture if the given work item id is linked to the given PR """
@@ -225,16 +402,52 @@ class PullRequestEntity(InputEntity):
                 APIConfigConstants.PULL_REQUEST_API_CLIENT).get_comment_threads(self)
         return self.__comment_threads
 
+    def comment_thread_index(self):
+        """
+        Returns the CommentThreadIndex of the comment threads of the PR, built once from get_comment_threads().
+        Threads created or updated during the run should be upserted into it from the api responses
+        """
+        if self.__comment_thread_index is None:
+            self.__comment_thread_index = CommentThreadIndex(self.get_comment_threads())
+        return self.__comment_thread_index
+
     def changed_files(self):
         """
         Returns list of files changed in the PR
+        Changes are streamed from the diff and only their paths are retained
         """
-        files = []
-        for change in get_value(self.get_diff(), ['changes']):
-            if get_value(change, ['item', 'gitObjectType']) == 'blob':
-                files.append(get_value(change, ['item', 'path']))
-
-        return files
+        if self.__changedFiles is None:
+            files, deleted = [], []
+            for change in self.api_client_mapper.get(APIConfigConstants.PULL_REQUEST_API_CLIENT)\
+                    .iter_diff_changes(self):
+                if get_value(change, ['item', 'gitObjectType']) == 'blob':
+                    files.append(get_value(change, ['item', 'path']))
+                    if 'delete' in (get_value(change, ['changeType']) or ''):
+                        deleted.append(get_value(change, ['item', 'path']))
+            self.__deletedFiles = deleted
+            self.__changedFiles = files
+
+        return list(self.__changedFiles)
+
+    def deleted_files(self):
+        """ Returns the list of the changed files that are deleted by the PR """
+        self.changed_files()
+        return list(self.__deletedFiles)
+
+    def match_changed_files(self, rules: dict):
+        """
+        Matches the changed files against the given map of rule names to path patterns (globs or prefixes) and
+        returns the PathMatches with rule -> files and file -> rules maps.
+        Rule sets are compiled once and the matches are shared by all the policies using the same rules
+        Ex:
+            entity.match_changed_files({'ui_owners': ['/src/ui', '**/*.css']}).files('ui_owners')
+        """
+        compiled = compile_rules(rules)
+        matches = self.__path_matches.get(compiled.key)
+        if matches is None:
+            matches = compiled.match(self.changed_files())
+            self.__path_matches[compiled.key] = matches
+        return matches
 
     def get_diff(self):
         if self.pr_diff is None:
@@ -254,16 +467,92 @@ class PullRequestEntity(InputEntity):
         return self.__changes
 
     def get_file_add_diff(self, diff_parameters, repo_id):
-        if self.__fileDiff is None:
-            self.__fileDiff = self.api_client_mapper.get(APIConfigConstants.PULL_REQUEST_API_CLIENT)\
-                .get_file_add_diff(self, diff_parameters, repo_id)
-        return self.__fileDiff
+        if (diff_parameters, repo_id) not in self.__file_diffs:
+            self.__file_diffs[(diff_parameters, repo_id)] = self.api_client_mapper.get(
+                APIConfigConstants.PULL_REQUEST_API_CLIENT).get_file_add_diff(self, diff_parameters, repo_id)
+        return self.__file_diffs[(diff_parameters, repo_id)]
+
+    def changed_lines(self, file_paths: list = None):
+        """
+        Returns the map of the given file paths (all the changed files by default) to the FileChangedLines index
+        of their added, modified and deleted lines. Diffs of the files are fetched concurrently
+        Ex:
+            entity.changed_lines(['/src/app.py'])['/src/app.py'].is_changed(42)
+        """
+        if file_paths is None:
+            file_paths = self.changed_files()
+
+        missing = [path for path in dict.fromkeys(file_paths) if path not in self.__changed_lines]
+        if missing:
+            pr_client = self.api_client_mapper.get(APIConfigConstants.PULL_REQUEST_API_CLIENT)
+            repo_id = self.repo_id()
+
+            def fetch(file_path):
+                blocks = pr_client.get_file_diff_blocks(self, self.file_diff_parameters(file_path), repo_id)
+                return FileChangedLines.from_diff_blocks(file_path, blocks)
+
+            with futures.ThreadPoolExecutor(max_workers=min(self.file_fetch_workers, len(missing))) as ex:
+                for file_path, index in zip(missing, ex.map(fetch, missing)):
+                    self.__changed_lines[file_path] = index
+
+        return {path: self.__changed_lines[path] for path in file_paths}
+
+    def file_diff_parameters(self, file_path):
+        """ Returns the diff parameters to diff the given file between the target and the source of the PR """
+        return json.dumps({
+            'originalPath': file_path,
+            'originalVersion': 'GC{}'.format(get_value(self.metadata(), ['lastMergeTargetCommit', 'commitId'])),
+            'modifiedPath': file_path,
+            'modifiedVersion': 'GC{}'.format(get_value(self.metadata(), ['lastMergeSourceCommit', 'commitId'])),
+            'partialDiff': True,
+            'includeCharDiffs': False
+        })
 
     def fetch_file_from_pr(self, file_path):
-        if get_value(self.__files_from_pr, [file_path]) is None:
+        """ Returns the json content of the given file from the latest commit of the PR """
+        entry = self.__files_from_pr.get(file_path)
+        if entry is not None and entry[1] is not None:
+            return entry[1]
+
+        content = self.fetch_files_from_pr([file_path])[file_path]
+        file = json.loads(content[:].decode('utf-8-sig'))
+        # the parsed json is kept in the entry of its content, so the file is charged once
+        entry = self.__files_from_pr.get(file_path)
+        if entry is not None and entry[0] is content:
+            entry[1] = file
+        return file
+
+    @staticmethod
+    def __close_content(file_path, entry):
+        if isinstance(entry[0], mmap.mmap):
+            entry[0].close()
+
+    def fetch_files_from_pr(self, file_paths: list):
+        """
+        Returns the map of the given file paths to their raw content from the latest commit of the PR.
+        Files missing in the cache are fetched concurrently with at most file_fetch_workers calls at a time.
+        Files larger than file_spill_size are held as memory-mapped temp files instead of bytes. A mapping is closed
+        once its file is evicted from the cache, so the contents should be read before fetching other files
+        """
+        files = {}
+        missing = []
+        for file_path in dict.fromkeys(file_paths):
+            entry = self.__files_from_pr.get(file_path)
+            if entry is None:
+                missing.append(file_path)
+            else:
+                files[file_path] = entry[0]
+
+        if missing:
             latest_commit = self.get_latest_commit()['commitId']
-            file = self.api_client_mapper.get(APIConfigConstants.REPO_API_CLIENT)\
-                .get_file(self, file_path, latest_commit)
-            self.__files_from_pr[file_path] = file
+            repo_client = self.api_client_mapper.get(APIConfigConstants.REPO_API_CLIENT)
 
-        return get_value(self.__files_from_pr, [file_path])
+            def fetch(file_path):
+                return repo_client.get_file_content(self, file_path, latest_commit, self.file_spill_size)
+
+            with futures.ThreadPoolExecutor(max_workers=min(self.file_fetch_workers, len(missing))) as ex:
+                for file_path, content in zip(missing, ex.map(fetch, missing)):
+                    self.__files_from_pr.put(file_path, [content, None], len(content))
+                    files[file_path] = content
+
+        return files
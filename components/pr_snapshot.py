@@ -0,0 +1,167 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+
+from components.constants import Constants
+from components.utils.comment_threads import CommentThreadIndex
+from components.utils.content_scanner import compile_scanner, scan_pull_request
+from components.utils.path_matcher import compile_rules
+from components.utils.reviewer_index import ReviewerIndex
+from core.exceptions import SnapshotDataMissingError
+from core.interfaces.input import InputEntity
+from core.utils.helper import get_value, is_empty
+from core.utils.shared_content import SharedContent
+
+
+class PullRequestSnapshot(InputEntity):
+    """
+    Read-only, serializable snapshot of the data of a PullRequestEntity fetched so far.
+    Sent to the tasks that run in the worker processes instead of the entity and its API clients.
+
+    Reading data that was not fetched before the snapshot was taken raises SnapshotDataMissingError. Tasks can
+    fetch the data they need on the entity in their prefetch method. Large file contents are shared through
+    shared memory instead of being copied to every worker
+    """
+    __name = 'PullRequestSnapshot'
+
+    def __init__(self, pr_num, org, project, ado_version, data: dict):
+        self.pr_num = pr_num
+        self.org = org
+        self.project = project
+        self.ado_version = ado_version
+        self.__data = data
+        self.__reviewer_index = None
+        self.__comment_thread_index = None
+        self.__scanned = {}
+
+    def name(self):
+        return self.__name
+
+    def key(self):
+        return self.pr_num
+
+    def pr_link(self):
+        return 'https://{}.visualstudio.com/{}/_git/{}/pullrequest/{}' \
+            .format(self.org, self.project, self.repo(), self.pr_num)
+
+    def metadata(self):
+        return self.__get('metadata')
+
+    def title(self):
+        return get_value(self.metadata(), ['title'])
+
+    def author(self):
+        return get_value(self.metadata(), ['createdBy', 'displayName'])
+
+    def author_alias(self):
+        return get_value(self.metadata(), ['createdBy', 'uniqueName'])
+
+    def repo(self):
+        return get_value(self.metadata(), ['repository', 'name'])
+
+    def repo_id(self):
+        return get_value(self.metadata(), ['repository', 'id'])
+
+    def source_branch(self):
+        return get_value(self.metadata(), ['sourceRefName'])
+
+    def target_branch(self):
+        return get_value(self.metadata(), ['targetRefName'])
+
+    def linked_work_items(self):
+        return self.__get('work_items')
+
+    def linked_work_items_ids(self):
+        return [get_value(work_item, ['id']) for work_item in self.linked_work_items()]
+
+    def linked_work_items_metadata_map(self, fields=None):
+        return self.__get('work_items_metadata')
+
+    def work_items_field_values(self, field_name):
+        return {key: get_value(metadata, ['fields', field_name], default=Constants.FIELD_NOT_FOUND)
+                for key, metadata in self.linked_work_items_metadata_map().items()}
+
+    def linked_area_paths(self):
+        return set(self.__get('area_paths'))
+
+    def is_work_item_linked(self, work_item_id):
+        return any(work_item['id'] == work_item_id for work_item in self.linked_work_items())
+
+    def get_commits(self):
+        return self.__get('commits')
+
+    def get_latest_commit(self):
+        return self.get_commits()[0]
+
+    def is_cherry_pick(self):
+        return Constants.CHERRY_PICK_PATTERN.search(get_value(self.metadata(), ['description']) or '') is not None
+
+    def content_matches(self, file_paths: list = None, scope: str = None):
+        matches = scan_pull_request(self, compile_scanner(self.__get('scan_rules')), self.__scanned, file_paths)
+        return matches.scoped(scope) if scope is not None else matches
+
+    def get_reviewers(self):
+        return get_value(self.metadata(), ['reviewers'])
+
+    def reviewer_index(self):
+        if self.__reviewer_index is None:
+            self.__reviewer_index = ReviewerIndex(self.get_reviewers())
+        return self.__reviewer_index
+
+    def get_approvers(self):
+        return self.reviewer_index().approvers()
+
+    def is_approved_by(self, reviewers: list):
+        if is_empty(reviewers):
+            return True
+        return len(self.reviewer_index().voted(reviewers, ReviewerIndex.APPROVED_VOTES)) > 0
+
+    def get_comment_threads(self):
+        return self.__get('comment_threads')
+
+    def comment_thread_index(self):
+        if self.__comment_thread_index is None:
+            self.__comment_thread_index = CommentThreadIndex(self.get_comment_threads())
+        return self.__comment_thread_index
+
+    def changed_files(self):
+        return list(self.__get('changed_files'))
+
+    def deleted_files(self):
+        return list(self.__get('deleted_files'))
+
+    def match_changed_files(self, rules: dict):
+        return compile_rules(rules).match(self.changed_files())
+
+    def changed_lines(self, file_paths: list = None):
+        changed_lines = self.__get('changed_lines')
+        if file_paths is None:
+            file_paths = self.changed_files()
+        missing = [path for path in file_paths if path not in changed_lines]
+        if missing:
+            raise SnapshotDataMissingError('Changed lines of {}'.format(missing))
+        return {path: changed_lines[path] for path in file_paths}
+
+    def fetch_file_from_pr(self, file_path):
+        content = self.fetch_files_from_pr([file_path])[file_path]
+        return json.loads(content[:].decode('utf-8-sig'))
+
+    def fetch_files_from_pr(self, file_paths: list):
+        files = self.__get('files')
+        missing = [path for path in file_paths if path not in files]
+        if missing:
+            raise SnapshotDataMissingError('Content of {}'.format(missing))
+        return {path: files[path] for path in file_paths}
+
+    def close(self):
+        """ Closes the shared memory blocks of the file contents attached by this process """
+        for content in (self.__data.get('files') or {}).values():
+            if isinstance(content, SharedContent):
+                content.close()
+
+    def __get(self, key):
+        value = self.__data.get(key)
+        if value is None:
+            raise SnapshotDataMissingError(key.replace('_', ' ').capitalize())
+        return value
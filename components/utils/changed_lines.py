@@ -0,0 +1,104 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from bisect import bisect_right
+
+from core.utils.helper import get_value
+
+
+class LineRanges:
+    """
+    Sorted and merged ranges of line numbers which support O(log n) point and range queries
+    Ex:
+        LineRanges([(10, 12), (5, 6), (13, 20)]) holds the ranges [(5, 6), (10, 20)]
+    """
+
+    def __init__(self, ranges=None):
+        self.__starts = []
+        self.__ends = []
+        for start, end in sorted(ranges or []):
+            if self.__ends and start <= self.__ends[-1] + 1:
+                self.__ends[-1] = max(self.__ends[-1], end)
+            else:
+                self.__starts.append(start)
+                self.__ends.append(end)
+
+    def contains(self, line):
+        """ Returns True if the given line falls in any of the ranges """
+        return self.overlaps(line, line)
+
+    def overlaps(self, start, end):
+        """ Returns True if any line between start and end (both inclusive) falls in any of the ranges """
+        index = bisect_right(self.__starts, end) - 1
+        return index >= 0 and self.__ends[index] >= start
+
+    def ranges(self):
+        return list(zip(self.__starts, self.__ends))
+
+    def line_count(self):
+        return sum(end - start + 1 for start, end in self.ranges())
+
+    def __len__(self):
+        return len(self.__starts)
+
+    def __repr__(self):
+        return 'LineRanges({})'.format(self.ranges())
+
+
+class FileChangedLines:
+    """
+    Index of the lines changed in a file, built once from the blocks of the file diff.
+    Added and modified lines are numbered as in the modified version of the file, deleted lines as in the
+    original version
+    """
+
+    # changeType of the file diff blocks
+    ADD = 1
+    DELETE = 2
+    EDIT = 3
+
+    def __init__(self, file_path, added=None, modified=None, deleted=None):
+        self.file_path = file_path
+        self.added = LineRanges(added)
+        self.modified = LineRanges(modified)
+        self.deleted = LineRanges(deleted)
+
+    @classmethod
+    def from_diff_blocks(cls, file_path, blocks):
+        added, modified, deleted = [], [], []
+        for block in blocks or []:
+            change_type = get_value(block, ['changeType'])
+            if change_type == cls.ADD:
+                added.append(cls.__range(block, 'mLine', 'mLinesCount'))
+            elif change_type == cls.EDIT:
+                modified.append(cls.__range(block, 'mLine', 'mLinesCount'))
+                deleted.append(cls.__range(block, 'oLine', 'oLinesCount'))
+            elif change_type == cls.DELETE:
+                deleted.append(cls.__range(block, 'oLine', 'oLinesCount'))
+
+        return cls(file_path,
+                   added=[r for r in added if r],
+                   modified=[r for r in modified if r],
+                   deleted=[r for r in deleted if r])
+
+    @staticmethod
+    def __range(block, line_key, count_key):
+        start = get_value(block, [line_key], 0)
+        count = get_value(block, [count_key], 0)
+        return (start, start + count - 1) if count > 0 else None
+
+    def is_changed(self, line):
+        """ Returns True if the given line of the modified file is either added or modified """
+        return self.added.contains(line) or self.modified.contains(line)
+
+    def is_changed_between(self, start, end):
+        """ Returns True if any line of the modified file between start and end is either added or modified """
+        return self.added.overlaps(start, end) or self.modified.overlaps(start, end)
+
+    def is_deleted(self, original_line):
+        """ Returns True if the given line of the original file is deleted or replaced """
+        return self.deleted.contains(original_line)
+
+    def __repr__(self):
+        return 'FileChangedLines({}, added={}, modified={}, deleted={})'.format(
+            self.file_path, self.added.ranges(), self.modified.ranges(), self.deleted.ranges())
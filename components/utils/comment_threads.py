@@ -0,0 +1,179 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+
+from components.utils.reviewer_index import ReviewerIndex
+from core.utils.comment_marker import parse_marker
+from core.utils.helper import get_value
+
+
+class CommentThreadIndex:
+    """
+    Index of the PR comment threads built once from the threads json of the PR.
+    Threads are indexed by their id, file path, status, author and Guardinel marker, so the lookups don't scan
+    all the threads of the PR.
+
+    The index is kept up to date with the threads returned by the thread create/update apis through upsert()
+    and upsert_comment(), without re-fetching the threads of the PR. Deleted threads and comments are dropped
+    """
+
+    ACTIVE = 'active'
+    PENDING = 'pending'
+    FIXED = 'fixed'
+    WONT_FIX = 'wontFix'
+    CLOSED = 'closed'
+    BY_DESIGN = 'byDesign'
+
+    UNRESOLVED_STATUSES = (ACTIVE, PENDING)
+
+    def __init__(self, threads=None):
+        self.__threads = {}  # thread id -> thread json
+        self.__by_file = {}  # file path -> thread ids
+        self.__by_status = {}  # status -> thread ids
+        self.__by_author = {}  # author identity -> thread ids
+        self.__by_marker = {}  # marker key -> thread ids
+        self.__lock = threading.Lock()
+        for thread in get_value(threads, ['value'], []) if isinstance(threads, dict) else threads or []:
+            self.upsert(thread)
+
+    def upsert(self, thread):
+        """ Adds the given thread json or replaces the indexed thread with the same id """
+        with self.__lock:
+            self.__remove(thread['id'])
+            if not thread.get('isDeleted'):
+                self.__add(thread)
+
+    def upsert_comment(self, thread_id, comment):
+        """ Adds the given comment json to the thread or replaces the comment with the same id """
+        with self.__lock:
+            thread = self.__threads.get(thread_id)
+            if thread is None:
+                return
+            comments = [c for c in thread.get('comments', []) if c.get('id') != comment.get('id')]
+            if not comment.get('isDeleted'):
+                comments.append(comment)
+            thread = dict(thread, comments=sorted(comments, key=lambda c: c.get('id', 0)))
+            self.__remove(thread_id)
+            self.__add(thread)
+
+    def remove(self, thread_id):
+        with self.__lock:
+            self.__remove(thread_id)
+
+    def get(self, thread_id):
+        return self.__threads.get(thread_id)
+
+    def threads(self):
+        return list(self.__threads.values())
+
+    def by_status(self, *statuses):
+        """ Returns the threads with any of the given statuses """
+        return self.__lookup(self.__by_status, statuses)
+
+    def unresolved(self):
+        return self.by_status(*self.UNRESOLVED_STATUSES)
+
+    def by_author(self, identity):
+        """ Returns the threads started by the given id, uniqueName or displayName (case-insensitive) """
+        return self.__lookup(self.__by_author, [identity.lower()] if identity else [])
+
+    def by_file(self, file_path, line=None, statuses=None):
+        """
+        Returns the threads on the given file. If line is given, only the threads whose line range covers it.
+        If statuses are given, only the threads with any of them
+        """
+        threads = self.__lookup(self.__by_file, [self.normalize_path(file_path)])
+        if line is not None:
+            threads = [thread for thread in threads if self.covers(thread, line)]
+        if statuses is not None:
+            threads = [thread for thread in threads if self.status(thread) in statuses]
+        return threads
+
+    def by_marker(self, key):
+        """ Returns the latest thread having the Guardinel marker of the given key, None if there is none """
+        threads = self.marked(key)
+        return threads[-1] if threads else None
+
+    def marked(self, key):
+        """ Returns all the threads having the Guardinel marker of the given key, oldest first """
+        return self.__lookup(self.__by_marker, [key])
+
+    def markers(self):
+        return list(self.__by_marker)
+
+    @staticmethod
+    def status(thread):
+        return get_value(thread, ['status'])
+
+    @staticmethod
+    def author(thread):
+        """ Returns the author json of the first comment of the thread """
+        comments = get_value(thread, ['comments'], [])
+        return get_value(comments[0], ['author']) if comments else None
+
+    @staticmethod
+    def file_path(thread):
+        return get_value(thread, ['threadContext', 'filePath'])
+
+    @staticmethod
+    def line_range(thread):
+        """ Returns the (start, end) lines of the thread on the right file, or else the left file. None if unknown """
+        for side in ['right', 'left']:
+            start = get_value(thread, ['threadContext', side + 'FileStart', 'line'])
+            if start is not None:
+                return start, get_value(thread, ['threadContext', side + 'FileEnd', 'line'], start)
+        return None
+
+    @classmethod
+    def covers(cls, thread, line):
+        line_range = cls.line_range(thread)
+        return line_range is not None and line_range[0] <= line <= line_range[1]
+
+    @staticmethod
+    def marker(thread):
+        """ Returns (key, digest) of the first Guardinel marker in the comments of the thread, None if there is none """
+        for comment in get_value(thread, ['comments'], []):
+            parsed = parse_marker(get_value(comment, ['content']))
+            if parsed is not None:
+                return parsed
+        return None
+
+    @staticmethod
+    def normalize_path(file_path):
+        return '/' + file_path.lstrip('/') if file_path else file_path
+
+    def __add(self, thread):
+        thread_id = thread['id']
+        self.__threads[thread_id] = thread
+        for index, keys in self.__keys(thread):
+            for key in keys:
+                index.setdefault(key, []).append(thread_id)
+
+    def __remove(self, thread_id):
+        thread = self.__threads.pop(thread_id, None)
+        if thread is None:
+            return
+        for index, keys in self.__keys(thread):
+            for key in keys:
+                index[key].remove(thread_id)
+                if not index[key]:
+                    del index[key]
+
+    def __keys(self, thread):
+        """ Returns the keys the thread is indexed with, for each index """
+        file_path = self.file_path(thread)
+        marker = self.marker(thread)
+        author = self.author(thread)
+        return [(self.__by_file, [self.normalize_path(file_path)] if file_path else []),
+                (self.__by_status, [self.status(thread)]),
+                (self.__by_author, set(ReviewerIndex.identities(author)) if author else []),
+                (self.__by_marker, [marker[0]] if marker else [])]
+
+    def __lookup(self, index, keys):
+        with self.__lock:
+            ids = sorted({thread_id for key in keys for thread_id in index.get(key, [])})
+            return [self.__threads[thread_id] for thread_id in ids]
+
+    def __len__(self):
+        return len(self.__threads)
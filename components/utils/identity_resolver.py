@@ -0,0 +1,181 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import os
+import shelve
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the server does not pre-fork workers
+    fcntl = None
+
+from api_client.local.local_identity_api_client import LocalIdentityClient
+from core.api.api_config_constants import APIConfigConstants
+from core.utils.helper import get_value
+from core.utils.map import resources
+
+
+class IdentityResolver:
+    """
+    Resolves aliases (email, uniqueName or display name) to identities in bulk.
+
+    Identities are looked up in the in-memory index first, then in the persistent on-disk cache and only the
+    remaining aliases are passed to the identity api client, in a single resolve() call. The ADO client searches
+    them concurrently, one search per alias, since the identity search api takes a single filter value.
+    Resolved identities are cached, in memory and on disk, for ttl seconds and the aliases which were not found
+    for negative_ttl seconds.
+
+    A large local file of identities can be configured as the source. It is imported into the on-disk cache
+    once and it is not parsed again until the file changes.
+
+    The on-disk cache is shared by all the processes, like the pre-forked workers of the server. It is opened
+    only while it is accessed and under an exclusive lock on its lock file, so that concurrent writers never
+    corrupt it. Aliases not found by a local client are not cached on disk, since the other runs may resolve
+    them with the identity api
+    """
+    __logger = resources.get('LOGGER')
+    __name = 'IdentityResolver'
+
+    default_cache_path = os.path.join(os.path.expanduser('~'), '.guardinel', 'identity_cache')
+    __source_key = '__source__'
+
+    def __init__(self, cache_path=None, ttl=7 * 24 * 3600, negative_ttl=24 * 3600):
+        self.cache_path = cache_path or self.default_cache_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.client = None
+        self.__index = {}  # alias -> (identity, time it was resolved at or None if it never expires)
+        self.__lock = threading.RLock()
+
+    def configure(self, config: dict):
+        """
+        Configures the resolver from the 'identity' section of guardinel.json
+        Ex:
+            "identity": {
+                "cache_path": "/tmp/guardinel/identity_cache",
+                "ttl_seconds": 604800,
+                "negative_ttl_seconds": 86400,
+                "source": "identities.json",
+                "client": "local"
+            }
+        client 'local' resolves the identities only from the caches and the source file without any API calls
+        """
+        with self.__lock:
+            self.cache_path = get_value(config, ['cache_path'], self.cache_path)
+            self.ttl = get_value(config, ['ttl_seconds'], self.ttl)
+            self.negative_ttl = get_value(config, ['negative_ttl_seconds'], self.negative_ttl)
+
+            self.client = LocalIdentityClient() if get_value(config, ['client']) == 'local' else None
+            if get_value(config, ['source']):
+                self.load_source(get_value(config, ['source']))
+        return self
+
+    def add_identities(self, identities):
+        """ Adds the given identities to the in-memory index. They are never expired """
+        with self.__lock:
+            for identity in identities:
+                for key in self.keys(identity):
+                    self.__index[key] = (identity, None)
+
+    def load_source(self, path):
+        """ Imports the identities of the given json file into the on-disk cache, if the file has changed """
+        stat = os.stat(path)
+        signature = [os.path.abspath(path), stat.st_mtime, stat.st_size]
+        with self.__lock, self.__cache() as db:
+            if db.get(self.__source_key) == signature:
+                return
+
+            self.__logger.info(self.__name, 'Importing identities from {}...'.format(path))
+            with open(path, encoding='utf-8') as f:
+                for identity in json.load(f):
+                    for key in self.keys(identity):
+                        db[key] = {'identity': identity, 'at': None}
+            db[self.__source_key] = signature
+
+    def resolve(self, entity, aliases: list):
+        """ Returns the map of the given aliases to their identities, None for the aliases that are not found """
+        resolved = {}
+        pending = []
+        with self.__lock:
+            for alias in dict.fromkeys(aliases):
+                identity = self.__indexed(alias.lower())
+                if identity is not None:
+                    resolved[alias] = identity
+                else:
+                    pending.append(alias)
+
+            if pending:
+                with self.__cache() as db:
+                    cached = {alias: self.__lookup(db, alias.lower()) for alias in pending}
+                resolved.update({alias: identity for alias, (found, identity) in cached.items() if found})
+                pending = [alias for alias in pending if not cached[alias][0]]
+
+        if pending:
+            client = self.client or entity.api_client_mapper.get(APIConfigConstants.IDENTITY_API_CLIENT)
+            fetched = client.resolve(entity, pending)
+            # a local client only knows the identities of its source, so its misses are not cached
+            store_negatives = self.client is None
+            with self.__lock, self.__cache() as db:
+                for alias, identity in fetched.items():
+                    if identity is not None or store_negatives:
+                        self.__store(db, alias.lower(), identity)
+                    resolved[alias] = identity
+
+        return {alias: resolved.get(alias) for alias in aliases}
+
+    @staticmethod
+    def keys(identity):
+        keys = [get_value(identity, [key]) for key in ['id', 'uniqueName', 'displayName', 'mail']]
+        return list(dict.fromkeys(key.lower() for key in keys if key))
+
+    def __indexed(self, key):
+        """ Returns the identity of the key from the in-memory index, None if it is not indexed or expired """
+        entry = self.__index.get(key)
+        if entry is None:
+            return None
+
+        identity, resolved_at = entry
+        if resolved_at is not None and time.time() - resolved_at > self.ttl:
+            del self.__index[key]
+            return None
+        return identity
+
+    def __lookup(self, db, key):
+        """ Returns (True, identity) if the key is resolved already, identity being None for negative entries """
+        entry = db.get(key)
+        if entry is None:
+            return False, None
+
+        identity, resolved_at = entry['identity'], entry['at']
+        ttl = self.ttl if identity is not None else self.negative_ttl
+        if resolved_at is not None and time.time() - resolved_at > ttl:
+            return False, None
+
+        if identity is not None:
+            self.__index[key] = (identity, resolved_at)
+        return True, identity
+
+    def __store(self, db, key, identity):
+        now = time.time()
+        db[key] = {'identity': identity, 'at': now}
+        if identity is not None:
+            for identity_key in self.keys(identity):
+                self.__index[identity_key] = (identity, now)
+                db[identity_key] = {'identity': identity, 'at': now}
+
+    @contextmanager
+    def __cache(self):
+        """ Opens the on-disk cache under an exclusive lock shared by all the processes """
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        with open(self.cache_path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            db = shelve.open(self.cache_path)
+            try:
+                yield db
+            finally:
+                db.close()
@@ -0,0 +1,169 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import re
+import threading
+from collections import OrderedDict
+
+# compiled rule sets are shared by all the policies and reused across the runs of the process.
+# The least recently used ones are dropped beyond max_compiled_rules, since a worker process lives long
+__compiled_rules = OrderedDict()
+__compiled_rules_lock = threading.Lock()
+max_compiled_rules = 256
+
+GLOB_CHARS = '*?['
+
+
+def compile_rules(rules: dict):
+    """
+    Returns the CompiledRules for the given map of rule names to their path patterns.
+    Same rule set is compiled once and reused while it is among the max_compiled_rules latest used ones.
+
+    Patterns without any of the glob chars are prefix patterns and match the path and every path under it.
+    Ex:
+        compile_rules({
+            'ui_owners': ['/src/ui', '**/*.css'],
+            'build_owners': ['/build/*.yml', '/pipelines/']
+        })
+    """
+    key = rule_set_key(rules)
+    with __compiled_rules_lock:
+        compiled = __compiled_rules.get(key)
+        if compiled is None:
+            compiled = CompiledRules(rules)
+            __compiled_rules[key] = compiled
+            while len(__compiled_rules) > max_compiled_rules:
+                __compiled_rules.popitem(last=False)
+        else:
+            __compiled_rules.move_to_end(key)
+    return compiled
+
+
+def rule_set_key(rules: dict):
+    """ Returns the hashable key identifying the given rule set """
+    return frozenset((name, tuple(patterns)) for name, patterns in rules.items())
+
+
+def glob_to_regex(pattern):
+    """
+    Translates the glob pattern to a regex
+        ** matches any number of path segments, * matches within a segment, ? matches a single char
+        and [...] matches a char class ([!...] for a negated class)
+    """
+    regex = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**/', i):
+            regex.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            regex.append('.*')
+            i += 2
+            continue
+
+        if char == '*':
+            regex.append('[^/]*')
+        elif char == '?':
+            regex.append('[^/]')
+        elif char == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            body = pattern[i + 1:end].replace('\\', '\\\\')
+            regex.append('[^{}]'.format(body[1:]) if body.startswith('!') else '[{}]'.format(body))
+            i = end
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    return ''.join(regex)
+
+
+def normalise(path):
+    return path.strip('/')
+
+
+class _PrefixNode:
+    __slots__ = ['children', 'rules']
+
+    def __init__(self):
+        self.children = {}
+        self.rules = []
+
+
+class CompiledRules:
+    """
+    Rule set compiled into a prefix trie for the prefix patterns and a single combined regex for the glob
+    patterns. Matching a path walks the trie once, in the number of its segments whatever the number of prefix
+    patterns. The combined regex is run once per path, but it still tries the lookahead of every glob, so its
+    cost grows with the number of globs. It only saves the overhead of a regex call per glob
+    """
+
+    def __init__(self, rules: dict):
+        self.key = rule_set_key(rules)
+        self.rules = list(rules.keys())
+        self.__trie = _PrefixNode()
+        self.__glob_rules = []
+        globs = []
+        for name, patterns in rules.items():
+            for pattern in patterns:
+                if any(char in pattern for char in GLOB_CHARS):
+                    globs.append(glob_to_regex(normalise(pattern)))
+                    self.__glob_rules.append(name)
+                else:
+                    self.__add_prefix(name, normalise(pattern))
+
+        # each glob is an optional lookahead with its own group, so one match() reports every matching glob
+        self.__globs = re.compile(''.join('(?:(?=(?:{})\\Z)())?'.format(glob) for glob in globs)) if globs else None
+
+    def __add_prefix(self, name, prefix):
+        node = self.__trie
+        for segment in prefix.split('/') if prefix else []:
+            node = node.children.setdefault(segment, _PrefixNode())
+        if name not in node.rules:
+            node.rules.append(name)
+
+    def rules_of(self, path):
+        """ Returns the names of the rules matching the given path """
+        path = normalise(path)
+        matched = list(self.__trie.rules)
+        node = self.__trie
+        for segment in path.split('/'):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            matched.extend(node.rules)
+
+        if self.__globs is not None:
+            groups = self.__globs.match(path).groups()
+            matched.extend(self.__glob_rules[i] for i, group in enumerate(groups) if group is not None)
+
+        return list(dict.fromkeys(matched))
+
+    def match(self, paths):
+        """ Matches all the given paths in a single pass and returns the PathMatches """
+        matches = PathMatches(self.rules)
+        for path in paths:
+            for rule in self.rules_of(path):
+                matches.add(rule, path)
+        return matches
+
+
+class PathMatches:
+    """ Result of matching the paths against a rule set: rule -> files and file -> rules maps """
+
+    def __init__(self, rules):
+        self.rule_to_files = {rule: [] for rule in rules}
+        self.file_to_rules = {}
+
+    def add(self, rule, path):
+        self.rule_to_files[rule].append(path)
+        self.file_to_rules.setdefault(path, []).append(rule)
+
+    def files(self, rule):
+        return self.rule_to_files.get(rule, [])
+
+    def rules(self, path):
+        return self.file_to_rules.get(path, [])
+
+    def matched_rules(self):
+        return [rule for rule, files in self.rule_to_files.items() if files]
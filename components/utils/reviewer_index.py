@@ -0,0 +1,73 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from core.utils.helper import get_value
+
+
+class ReviewerIndex:
+    """
+    Index of the PR reviewers built once from the reviewers of the PR metadata.
+    Reviewers are keyed by their id, uniqueName and displayName (case-insensitive), so the lookups are O(1)
+    and only exact identities match.
+
+    Group reviewers are tracked with the reviewers who voted on behalf of them (votedFor)
+    """
+
+    APPROVED = 10
+    APPROVED_WITH_SUGGESTIONS = 5
+    NO_VOTE = 0
+    WAITING_FOR_AUTHOR = -5
+    REJECTED = -10
+
+    APPROVED_VOTES = (APPROVED, APPROVED_WITH_SUGGESTIONS)
+
+    def __init__(self, reviewers):
+        self.reviewers = list(reviewers or [])
+        self.__by_identity = {}
+        self.__voted_for = {}
+        for reviewer in self.reviewers:
+            for identity in self.identities(reviewer):
+                self.__by_identity.setdefault(identity, reviewer)
+            # votedFor is null for the reviewers who voted for no group
+            for group in get_value(reviewer, ['votedFor']) or []:
+                self.__voted_for.setdefault(get_value(group, ['id']), []).append(reviewer)
+
+    @staticmethod
+    def identities(reviewer):
+        """ Returns the normalised keys the reviewer is indexed with """
+        keys = [get_value(reviewer, [key]) for key in ['id', 'uniqueName', 'displayName']]
+        return [key.lower() for key in keys if key]
+
+    def get(self, identity):
+        """ Returns the reviewer json of the given id, uniqueName or displayName """
+        if not identity:
+            return None
+        return self.__by_identity.get(identity.lower())
+
+    def contains(self, identity):
+        return self.get(identity) is not None
+
+    def vote(self, identity):
+        return get_value(self.get(identity), ['vote'])
+
+    def has_voted(self, identity, votes=APPROVED_VOTES):
+        """ Returns True if the given reviewer has voted with any of the given votes """
+        return self.vote(identity) in votes
+
+    def voted(self, identities, votes=APPROVED_VOTES):
+        """ Returns the identities among the given ones which have voted with any of the given votes """
+        return [identity for identity in identities if self.has_voted(identity, votes)]
+
+    def is_group(self, identity):
+        return get_value(self.get(identity), ['isContainer'], False)
+
+    def voted_for(self, group_identity):
+        """ Returns the reviewers who voted on behalf of the given group """
+        group = self.get(group_identity)
+        return list(self.__voted_for.get(get_value(group, ['id']), [])) if group else []
+
+    def approvers(self):
+        return [reviewer for reviewer in self.reviewers if get_value(reviewer, ['vote']) in self.APPROVED_VOTES]
+
+    def __len__(self):
+        return len(self.reviewers)
@@ -0,0 +1,111 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+from collections import deque
+from concurrent import futures
+
+from core.api import caller
+from core.utils.map import resources
+
+
+class AIMDController:
+    """
+    Additive increase / multiplicative decrease controller of the number of concurrent tasks.
+
+    The API responses observed since the last decision are evaluated every interval seconds:
+    - if any request was throttled (429/503) or the p95 latency spiked over spike_factor times the baseline
+      latency, the limit is multiplied by decrease
+    - otherwise, if requests were made, the limit is increased by one
+    The limit always stays within [floor, ceiling]. Every change of the limit is recorded in the decisions
+    """
+    __logger = resources.get('LOGGER')
+    __name = 'AIMDController'
+
+    def __init__(self, floor=2, ceiling=16, initial=None, decrease=0.5, spike_factor=2.0, interval=0.5):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.limit = min(self.ceiling, max(self.floor, initial or self.floor))
+        self.decrease = decrease
+        self.spike_factor = spike_factor
+        self.interval = interval
+        self.decisions = []
+        self.__baseline = None
+        self.__window = []  # (status code, seconds) of the responses since the last decision
+        self.__started_at = time.perf_counter()
+        self.__decided_at = self.__started_at
+        self.__lock = threading.Lock()
+
+    def on_response(self, method, endpoint, status_code, seconds):
+        with self.__lock:
+            self.__window.append((status_code, seconds))
+
+    def evaluate(self):
+        """ Updates the limit if the interval has passed since the last decision. Returns the limit """
+        with self.__lock:
+            now = time.perf_counter()
+            if now - self.__decided_at < self.interval or not self.__window:
+                return self.limit
+
+            window, self.__window = self.__window, []
+            self.__decided_at = now
+            latencies = sorted(seconds for _, seconds in window)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            median = latencies[len(latencies) // 2]
+            throttled = sum(1 for status_code, _ in window if status_code in [429, 503])
+
+            if throttled:
+                reason = '{} throttled request(s)'.format(throttled)
+                limit = max(self.floor, int(self.limit * self.decrease))
+            elif self.__baseline is not None and p95 > self.__baseline * self.spike_factor:
+                reason = 'p95 latency {:.0f}ms over {:.0f}ms baseline'.format(p95 * 1000, self.__baseline * 1000)
+                limit = max(self.floor, int(self.limit * self.decrease))
+            else:
+                reason = 'healthy'
+                limit = min(self.ceiling, self.limit + 1)
+                # baseline follows the median latency of the healthy windows
+                self.__baseline = median if self.__baseline is None else 0.8 * self.__baseline + 0.2 * median
+
+            if limit != self.limit:
+                self.decisions.append({'at_ms': int((now - self.__started_at) * 1000), 'from': self.limit,
+                                       'to': limit, 'reason': reason, 'requests': len(window),
+                                       'p95_ms': int(p95 * 1000)})
+                self.__logger.debug(self.__name, 'Concurrency {} -> {}: {}'.format(self.limit, limit, reason))
+                self.limit = limit
+            return self.limit
+
+
+class AdaptivePool:
+    """
+    Runs the tasks on up to controller.ceiling threads, starting a new task only while the number of running
+    tasks is below the current limit of the controller. The controller observes all the API responses received
+    while the pool is running
+    """
+
+    def __init__(self, controller: AIMDController):
+        self.controller = controller
+
+    def map(self, fn, items):
+        """ Returns the results of fn on each of the items, in the order of the items """
+        items = list(items)
+        results = [None] * len(items)
+        pending = deque(enumerate(items))
+        running = {}
+
+        caller.add_response_listener(self.controller.on_response)
+        try:
+            with futures.ThreadPoolExecutor(max_workers=self.controller.ceiling) as ex:
+                while pending or running:
+                    limit = self.controller.evaluate()
+                    while pending and len(running) < limit:
+                        index, item = pending.popleft()
+                        running[ex.submit(fn, item)] = index
+
+                    done, _ = futures.wait(running, timeout=self.controller.interval,
+                                           return_when=futures.FIRST_COMPLETED)
+                    for future in done:
+                        results[running.pop(future)] = future.result()
+        finally:
+            caller.remove_response_listener(self.controller.on_response)
+        return results
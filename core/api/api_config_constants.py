@@ -9,3 +9,4 @@ class APIConfigConstants:
     REPO_API_CLIENT = 'REPO_API_CLIENT'
     WORK_ITEM_API_CLIENT = "WORK_ITEM_API_CLIENT"
     PULL_REQUEST_API_CLIENT = "PULL_REQUEST_API_CLIENT"
+    IDENTITY_API_CLIENT = "IDENTITY_API_CLIENT"
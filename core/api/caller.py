@@ -1,19 +1,99 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import mmap
+import tempfile
+import threading
+import time
 import traceback
 from json.decoder import JSONDecodeError
 
-import requests
-from requests.auth import HTTPBasicAuth
-from requests.utils import requote_uri
-
-from core.exceptions import APICallFailedError
+from core.api.circuit_breaker import breakers, endpoint_family
+from core.api.hedging import hedging
+from core.api.scheduler import scheduler
+from core.exceptions import APICallFailedError, CircuitOpenError
+from core.utils.json_stream import JsonArrayStream
 from core.utils.map import resources
 
 logger = resources.get('LOGGER')
 tag = 'api_caller'
 
+# size of the chunks read from the streamed responses
+stream_chunk_size = 64 * 1024
+
+# number of API calls sent by each thread, used to account the calls to the tasks running on it
+__calls = threading.local()
+
+# callables notified of every response as listener(method, endpoint, status_code, seconds)
+# status_code is None if the request failed without a response
+response_listeners = []
+
+
+def http():
+    """ requests is imported on the first API call to keep it out of the startup path """
+    import requests
+    return requests
+
+
+def auth(pat):
+    return http().auth.HTTPBasicAuth('', pat)
+
+
+def requote_uri(endpoint):
+    return http().utils.requote_uri(endpoint)
+
+
+def send(method, endpoint, **kwargs):
+    """
+    Sends the request through the connection pool and the rate limiter of the endpoint's org.
+    Raises CircuitOpenError without sending the request if the endpoint family is failing
+    """
+    family = endpoint_family(endpoint)
+    breaker = breakers().breaker(family)
+    if not breaker.allow():
+        raise CircuitOpenError(family)
+
+    __calls.count = api_call_count() + 1
+    start = time.perf_counter()
+    status_code = None
+    try:
+        resp = scheduler().request(method, endpoint, **kwargs)
+        status_code = resp.status_code
+        return resp
+    finally:
+        seconds = time.perf_counter() - start
+        breaker.record(not breaker.is_failure(status_code), seconds)
+        for listener in list(response_listeners):
+            listener(method, endpoint, status_code, seconds)
+
+
+def add_response_listener(listener):
+    response_listeners.append(listener)
+
+
+def remove_response_listener(listener):
+    if listener in response_listeners:
+        response_listeners.remove(listener)
+
+
+def send_hedged(endpoint, **kwargs):
+    """ Sends the GET request, hedged with a duplicate request if it is slow and hedging is enabled """
+    senders = []
+
+    def call():
+        senders.append(threading.current_thread())
+        return send('GET', endpoint, **kwargs)
+
+    resp = hedging().execute(endpoint_family(endpoint), call)
+    # requests sent by the hedging threads are accounted to the calling thread
+    __calls.count = api_call_count() + sum(1 for sender in senders if sender is not threading.current_thread())
+    return resp
+
+
+def api_call_count():
+    """ Returns the number of API calls sent so far by the current thread """
+    return getattr(__calls, 'count', 0)
+
 
 def validate_resp(endpoint, resp):
     if resp.status_code != 200:
@@ -42,7 +122,7 @@ def get(endpoint, pat, params=None):
 
     try:
         endpoint = requote_uri(endpoint)  # Added encoding for network calls
-        resp = requests.get(endpoint, auth=HTTPBasicAuth('', pat), params=params)
+        resp = send_hedged(endpoint, auth=auth(pat), params=params)
         logger.debug(tag, "GET request url: {}".format(resp.request.url))
         validate_resp(endpoint, resp)
 
@@ -57,6 +137,86 @@ def get(endpoint, pat, params=None):
         raise APICallFailedError('API call {} failed with error: \n"{}"'.format(truncate(endpoint), e))
 
 
+def get_stream(endpoint, pat, array_path: list, params=None):
+    """
+    Makes a get call to the given input and yields the elements of the json array found at array_path
+    as the response is received. Full response is never held in memory
+    Ex:
+        for change in get_stream(endpoint, pat, ['changes']): ...
+    """
+    if params is None:
+        params = {}
+
+    resp = None
+    try:
+        endpoint = requote_uri(endpoint)  # Added encoding for network calls
+        resp = send('GET', endpoint, auth=auth(pat), params=params, stream=True)
+        logger.debug(tag, "GET (streamed) request url: {}".format(resp.request.url))
+        validate_resp(endpoint, resp)
+
+        parser = JsonArrayStream(array_path)
+        for chunk in resp.iter_content(chunk_size=stream_chunk_size):
+            yield from parser.feed(chunk)
+            if parser.done:
+                break
+        parser.close()
+    except JSONDecodeError as e:
+        logger.debug(tag, 'Response retrieved from endpoint {} is not a json'.format(endpoint))
+        raise
+    except APICallFailedError as e:
+        raise e
+    except Exception as e:
+        raise APICallFailedError('API call {} failed with error: \n"{}"'.format(truncate(endpoint), e))
+    finally:
+        if resp is not None:
+            resp.close()
+
+
+def get_content(endpoint, pat, params=None, spill_threshold=None):
+    """
+    Makes a get call to the given input and returns the raw content of the response.
+    Content larger than spill_threshold bytes is streamed to a temp file and returned as a read-only mmap,
+    otherwise it is returned as bytes. Both support len(), slicing and find()
+    """
+    if params is None:
+        params = {}
+
+    resp = None
+    try:
+        endpoint = requote_uri(endpoint)  # Added encoding for network calls
+        resp = send('GET', endpoint, auth=auth(pat), params=params, stream=True)
+        logger.debug(tag, "GET (content) request url: {}".format(resp.request.url))
+        validate_resp(endpoint, resp)
+
+        content = bytearray()
+        spill_file = None
+        for chunk in resp.iter_content(chunk_size=stream_chunk_size):
+            if spill_file is not None:
+                spill_file.write(chunk)
+                continue
+
+            content += chunk
+            if spill_threshold is not None and len(content) > spill_threshold:
+                spill_file = tempfile.TemporaryFile()
+                spill_file.write(content)
+                content = None
+
+        if spill_file is None:
+            return bytes(content)
+
+        # mapping stays valid after the file is closed. Temp file is deleted once the mapping is released
+        spill_file.flush()
+        with spill_file:
+            return mmap.mmap(spill_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except APICallFailedError as e:
+        raise e
+    except Exception as e:
+        raise APICallFailedError('API call {} failed with error: \n"{}"'.format(truncate(endpoint), e))
+    finally:
+        if resp is not None:
+            resp.close()
+
+
 def post(endpoint, pat, query_str, payload, content_type="application/json"):
     """ Makes a post call to the given input """
     resp = None
@@ -67,7 +227,7 @@ def post(endpoint, pat, query_str, payload, content_type="application/json"):
     try:
         endpoint = requote_uri(endpoint)  # Added encoding for network calls
         logger.debug(tag, "POST call to {}".format(endpoint))
-        resp = requests.post(endpoint, auth=HTTPBasicAuth('', pat), headers=headers, data=payload, params=query_str)
+        resp = send('POST', endpoint, auth=auth(pat), headers=headers, data=payload, params=query_str)
         validate_resp(endpoint, resp)
 
         logger.debug(tag, resp.text)
@@ -83,17 +243,17 @@ def post(endpoint, pat, query_str, payload, content_type="application/json"):
         raise
 
 
-def patch(endpoint, pat, query_str, payload):
-    """ Makes a put call to the given input """
+def patch(endpoint, pat, query_str, payload, content_type="application/json-patch+json"):
+    """ Makes a patch call to the given input """
     resp = None
     headers = {
-        'Content-Type': "application/json-patch+json",
+        'Content-Type': content_type,
     }
 
     try:
         endpoint = requote_uri(endpoint)  # Added encoding for network calls
         logger.debug(tag, "PATCH call to {}".format(endpoint))
-        resp = requests.patch(endpoint, auth=HTTPBasicAuth('', pat), headers=headers, data=payload, params=query_str)
+        resp = send('PATCH', endpoint, auth=auth(pat), headers=headers, data=payload, params=query_str)
         validate_resp(endpoint, resp)
 
         logger.debug(tag, resp.text)
@@ -119,7 +279,7 @@ def put(endpoint, pat, query_str, payload):
     try:
         endpoint = requote_uri(endpoint)  # Added encoding for network calls
         logger.debug(tag, "PUT call to {}".format(endpoint))
-        resp = requests.put(endpoint, auth=HTTPBasicAuth('', pat), headers=headers, data=payload, params=query_str)
+        resp = send('PUT', endpoint, auth=auth(pat), headers=headers, data=payload, params=query_str)
         validate_resp(endpoint, resp)
 
         logger.debug(tag, resp.text)
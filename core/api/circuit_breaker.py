@@ -0,0 +1,181 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from core.utils.helper import get_value
+from core.utils.map import resources
+
+
+def endpoint_family(endpoint):
+    """
+    Returns the ADO service family of the endpoint, the path segment following _apis
+    Ex:
+        https://dev.azure.com/{org}/{project}/_apis/git/pullrequests/1 -> git
+        https://dev.azure.com/{org}/_apis/wit/workitems -> wit
+        https://vssps.dev.azure.com/{org}/_apis/identities -> identities
+    """
+    segments = [segment for segment in urlsplit(endpoint).path.split('/') if segment]
+    for index, segment in enumerate(segments[:-1]):
+        if segment in ['_apis', '_api']:
+            return segments[index + 1].lower()
+    return 'other'
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of an endpoint family.
+
+    Outcomes of the calls within the last window_seconds are tracked. Once at least min_requests calls are made in
+    the window, the circuit opens if the rate of the failed calls reaches error_rate or the rate of the calls
+    slower than latency_seconds reaches slow_rate. Calls without a response, 5xx responses and the responses with
+    one of the failure_statuses (429 by default, the family being throttled) are failed calls.
+    While open, the calls are rejected. After open_seconds the circuit is half-open and lets half_open_requests
+    probe calls through: it closes if they succeed, otherwise it opens again
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, window_seconds=60, min_requests=10, error_rate=0.5, latency_seconds=None,
+                 slow_rate=0.5, open_seconds=30, half_open_requests=1, failure_statuses=(429,)):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.latency_seconds = latency_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_requests = half_open_requests
+        self.failure_statuses = failure_statuses
+        self.state = self.CLOSED
+        self.opened = 0
+        self.rejected = 0
+        self.__calls = deque()  # (time, failed, slow)
+        self.__opened_at = None
+        self.__probes = 0
+        self.__lock = threading.Lock()
+
+    def allow(self):
+        """ Returns True if a call can be made now """
+        with self.__lock:
+            if self.state == self.OPEN and time.monotonic() - self.__opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self.__probes = 0
+
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and self.__probes < self.half_open_requests:
+                self.__probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def is_failure(self, status_code):
+        """ Returns True if a call completed with the status code (None if it got no response) is a failed call """
+        return status_code is None or status_code >= 500 or status_code in self.failure_statuses
+
+    def record(self, succeeded, seconds):
+        with self.__lock:
+            now = time.monotonic()
+            slow = self.latency_seconds is not None and seconds > self.latency_seconds
+            if self.state == self.HALF_OPEN:
+                if succeeded and not slow:
+                    self.state = self.CLOSED
+                    self.__calls.clear()
+                else:
+                    self.__open(now)
+                return
+            if self.state == self.OPEN:
+                return
+
+            self.__calls.append((now, not succeeded, slow))
+            while self.__calls and now - self.__calls[0][0] > self.window_seconds:
+                self.__calls.popleft()
+
+            count = len(self.__calls)
+            if count < self.min_requests:
+                return
+            failed = sum(1 for _, is_failed, _ in self.__calls if is_failed)
+            slow_calls = sum(1 for _, _, is_slow in self.__calls if is_slow)
+            if failed / count >= self.error_rate or slow_calls / count >= self.slow_rate:
+                self.__open(now)
+
+    def metrics(self):
+        with self.__lock:
+            return {'state': self.state, 'opened': self.opened, 'rejected': self.rejected,
+                    'window_requests': len(self.__calls),
+                    'window_failures': sum(1 for _, is_failed, _ in self.__calls if is_failed)}
+
+    def __open(self, now):
+        self.state = self.OPEN
+        self.opened += 1
+        self.__opened_at = now
+        self.__calls.clear()
+        resources.get('LOGGER').warn('CircuitBreaker', 'Circuit of the {} APIs is open for {}s'
+                                     .format(self.name, self.open_seconds))
+
+
+class CircuitBreakerRegistry:
+    """
+    Circuit breakers of all the endpoint families, shared by all the threads and the runs of the process
+    """
+    settings = ['window_seconds', 'min_requests', 'error_rate', 'latency_seconds', 'slow_rate', 'open_seconds',
+                'half_open_requests', 'failure_statuses']
+
+    def __init__(self):
+        self.config = {}
+        self.__breakers = {}
+        self.__lock = threading.Lock()
+
+    def configure(self, config: dict):
+        """
+        Configures the breakers from the 'circuit_breaker' section of guardinel.json
+        Ex:
+            "circuit_breaker": {
+                "window_seconds": 60,
+                "min_requests": 10,
+                "error_rate": 0.5,
+                "latency_seconds": 10,
+                "slow_rate": 0.5,
+                "open_seconds": 30,
+                "half_open_requests": 1,
+                "failure_statuses": [429],
+                "families": {"wit": {"latency_seconds": 5}}
+            }
+        """
+        with self.__lock:
+            self.config = config or {}
+            for name, breaker in self.__breakers.items():
+                for key, value in self.__settings(name).items():
+                    setattr(breaker, key, value)
+        return self
+
+    def breaker(self, family):
+        with self.__lock:
+            if family not in self.__breakers:
+                self.__breakers[family] = CircuitBreaker(family, **self.__settings(family))
+            return self.__breakers[family]
+
+    def metrics(self):
+        """ Returns the state and the counters of the breaker of each endpoint family """
+        with self.__lock:
+            breakers = list(self.__breakers.values())
+        return {breaker.name: breaker.metrics() for breaker in breakers}
+
+    def __settings(self, family):
+        settings = {key: self.config[key] for key in self.settings if key in self.config}
+        settings.update({key: value for key, value in get_value(self.config, ['families', family], {}).items()
+                         if key in self.settings})
+        return settings
+
+
+__registry = CircuitBreakerRegistry()
+
+
+def breakers():
+    """ Returns the circuit breakers shared by all the API calls of the process """
+    return __registry
@@ -0,0 +1,141 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+from collections import deque
+from concurrent import futures
+
+from core.utils.helper import get_value
+
+
+class HedgingPolicy:
+    """
+    Hedges the idempotent GET calls to cut their tail latency.
+
+    If a call has not completed within the given percentile of the recent latencies of its endpoint family, a
+    duplicate call is sent and the first successful response wins. The response of the losing call is discarded
+    and its connection is closed as soon as it completes, since an in-flight request can not be aborted.
+    Duplicate calls are limited to budget times the number of calls, so hedging never adds more than that share
+    of load to a throttling server
+    """
+
+    def __init__(self, enabled=False, percentile=0.95, budget=0.05, min_samples=20, window=200, families=None,
+                 max_workers=32):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.families = families
+        self.max_workers = max_workers
+        self.__window = window
+        self.__latencies = {}  # family -> recent latencies of the calls
+        self.__counts = {}  # family -> {'requests': ..., 'hedged': ..., 'hedge_wins': ...}
+        self.__requests = 0
+        self.__hedged = 0
+        self.__executor = None
+        self.__lock = threading.Lock()
+
+    def configure(self, config: dict):
+        """
+        Configures the policy from the 'hedging' section of guardinel.json
+        Ex:
+            "hedging": {"enabled": true, "percentile": 0.95, "budget": 0.05, "min_samples": 20,
+                        "families": ["git", "wit"]}
+        families restricts hedging to the given endpoint families, all of them are hedged by default
+        """
+        with self.__lock:
+            self.enabled = get_value(config, ['enabled'], self.enabled)
+            self.percentile = get_value(config, ['percentile'], self.percentile)
+            self.budget = get_value(config, ['budget'], self.budget)
+            self.min_samples = get_value(config, ['min_samples'], self.min_samples)
+            self.families = get_value(config, ['families'], self.families)
+        return self
+
+    def execute(self, family, call):
+        """ Returns the response of call(), hedged if the call is slow. call must be idempotent """
+        delay = self.delay(family) if self.enabled and (self.families is None or family in self.families) else None
+        with self.__lock:
+            self.__requests += 1
+            self.__count(family, 'requests')
+
+        if delay is None:
+            return self.__timed(family, call)
+
+        primary = self.__pool().submit(self.__timed, family, call)
+        done, _ = futures.wait([primary], timeout=delay)
+        if done or not self.__take_budget(family):
+            return primary.result()
+
+        hedge = self.__pool().submit(call)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                if future is hedge:
+                    with self.__lock:
+                        self.__count(family, 'hedge_wins')
+                for loser in pending:
+                    loser.add_done_callback(self.__discard)
+                return future.result()
+        raise error
+
+    def delay(self, family):
+        """ Returns the seconds after which the calls of the family are hedged, None until enough calls are seen """
+        with self.__lock:
+            latencies = sorted(self.__latencies.get(family, []))
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile))]
+
+    def metrics(self):
+        """ Returns the hedge rate and the win rate of the hedges of each endpoint family """
+        with self.__lock:
+            counts = {family: dict(count) for family, count in self.__counts.items()}
+        for count in counts.values():
+            count['hedge_rate'] = round(count['hedged'] / count['requests'], 4) if count['requests'] else 0
+            count['win_rate'] = round(count['hedge_wins'] / count['hedged'], 4) if count['hedged'] else 0
+        return counts
+
+    def __timed(self, family, call):
+        start = time.perf_counter()
+        resp = call()
+        with self.__lock:
+            self.__latencies.setdefault(family, deque(maxlen=self.__window)).append(time.perf_counter() - start)
+        return resp
+
+    def __take_budget(self, family):
+        with self.__lock:
+            if self.__hedged + 1 > self.budget * self.__requests:
+                return False
+            self.__hedged += 1
+            self.__count(family, 'hedged')
+            return True
+
+    def __count(self, family, key):
+        count = self.__counts.setdefault(family, {'requests': 0, 'hedged': 0, 'hedge_wins': 0})
+        count[key] += 1
+
+    def __pool(self):
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                             thread_name_prefix='hedging')
+            return self.__executor
+
+    @staticmethod
+    def __discard(future):
+        if future.exception() is None:
+            future.result().close()
+
+
+__policy = HedgingPolicy()
+
+
+def hedging():
+    """ Returns the hedging policy shared by all the API calls of the process """
+    return __policy
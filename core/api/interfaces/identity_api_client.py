@@ -0,0 +1,21 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from abc import ABC, abstractmethod
+
+from core.utils.map import resources
+
+
+class IdentityApiClient(ABC):
+
+    def __init__(self):
+        self.__logger = resources.get('LOGGER')
+
+    @abstractmethod
+    def resolve(self, entity, aliases: list):
+        """
+        Resolves the given aliases (email, uniqueName or display name) in bulk and returns a map of each alias to
+        its identity {'id': ..., 'uniqueName': ..., 'displayName': ..., 'mail': ...} or None if it is not found.
+        Aliases that couldn't be searched (ex: failed API calls) should be left out of the map
+        """
+        raise NotImplementedError()
@@ -11,6 +11,12 @@ class PullRequestApiClientInterface(ABC):
     def __init__(self):
         self.__logger = resources.get('LOGGER')
 
+    def reset(self):
+        """
+        Drops the data cached for the run, when the same client serves the next run of a long-lived process
+        """
+        pass
+
     @abstractmethod
     def data(self, entity):
         """
@@ -46,6 +52,27 @@ class PullRequestApiClientInterface(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def create_thread(self, entity, thread):
+        """
+        Creates the given comment thread json in the PR and returns the created thread
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def update_comment(self, entity, thread_id, comment_id, content):
+        """
+        Replaces the content of the given comment and returns the updated comment
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def update_thread_status(self, entity, thread_id, status):
+        """
+        Updates the status (active, fixed, closed, ...) of the given comment thread and returns the updated thread
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def get_commits(self, entity):
         """
@@ -60,6 +87,13 @@ class PullRequestApiClientInterface(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def iter_diff_changes(self, entity):
+        """
+        Yields the changes of the diff returned by get_diff() one by one without holding the whole diff in memory
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def changes(self, entity, repo_id, commit_id):
         """
@@ -67,6 +101,13 @@ class PullRequestApiClientInterface(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def get_file_diff_blocks(self, entity, diff_parameters, repo_id):
+        """
+        Returns the blocks of the file diff with the added, modified and deleted line ranges
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def get_file_add_diff(self, entity, diff_parameters, repo_id):
         """
@@ -87,3 +128,18 @@ class PullRequestApiClientInterface(ABC):
         Adds the given reviewer to the PR. It will be made optional/required based on the is_required flag
         """
         raise NotImplementedError()
+
+    @abstractmethod
+    def add_reviewers(self, entity, reviewers: list, vote=0, is_required=True):
+        """
+        Adds all the given reviewers to the PR and returns the map of each reviewer to None if it is added or to
+        the error otherwise. Failure to add a reviewer shouldn't fail the others
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_reviewers(self, entity):
+        """
+        Returns the current list of reviewers of the PR
+        """
+        raise NotImplementedError()
@@ -26,6 +26,14 @@ class RepositoryApiClientInterface(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def get_file_content(self, entity, file_path, commit_id, spill_threshold=None):
+        """
+        Returns the raw content of the file on the given commit id.
+        Files larger than spill_threshold bytes should be returned as a memory-mapped temp file
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def get_commit_metadata(self, entity, commit_id):
         """
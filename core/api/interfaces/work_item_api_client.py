@@ -22,27 +22,58 @@ class FieldValueObject(ABC):
     def remove_field(self, field_path):
         raise NotImplementedError()
 
+    @abstractmethod
+    def add_relation(self, relation, url, attributes=None):
+        raise NotImplementedError()
+
+    def merge(self, field_value_obj):
+        """ Appends the updates of the given FieldValueObject to this one. Optional, the clients may not merge """
+        raise NotImplementedError()
+
     @abstractmethod
     def payload_str(self):
         raise NotImplementedError()
 
+    def load_payload_str(self, payload_str):
+        """
+        Restores the updates from a string returned by payload_str(). Optional, the updates of the clients which
+        can't restore them are not replayed by the next run when their flush fails
+        """
+        raise NotImplementedError()
+
 
 class WorkItemApiClient(ABC):
 
     def __init__(self):
         self.__logger = resources.get('LOGGER')
 
+    def reset(self):
+        """
+        Drops the data cached for the run, when the same client serves the next run of a long-lived process
+        """
+        pass
+
+    @abstractmethod
+    def new_field_value_object(self) -> FieldValueObject:
+        """
+        Returns an empty FieldValueObject of this client
+        """
+        raise NotImplementedError()
+
     @abstractmethod
-    def get_work_items(self, entity, items: list):
+    def get_work_items(self, entity, items: list, fields=None, cache=True):
         """
         Retrieves the work item metadata for all the work-items ids provided in the param
+        If fields are given, only those fields are retrieved. With cache False, the fetched work items are not
+        retained by the client
         """
         raise NotImplementedError()
 
     @abstractmethod
-    def get_work_item_by_id(self, entity, item_id):
+    def get_work_item_by_id(self, entity, item_id, fields=None):
         """
         Retrieves the work item metadata for the given work-item id provided in the param
+        If fields are given, only those fields are retrieved
         """
         raise NotImplementedError()
 
@@ -60,6 +91,13 @@ class WorkItemApiClient(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def iter_work_items_by_query_id(self, entity, query_id, fields=None, chunk_size=None):
+        """
+        Yields the work items resulting from the query, hydrated with the given fields
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def attach_work_item(self, item_id, pr_entity, artifact_id):
         """
@@ -67,6 +105,13 @@ class WorkItemApiClient(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def attach_work_item_payload(self, artifact_id) -> FieldValueObject:
+        """
+        Returns the FieldValueObject that attaches the artifact (ex: PR) to a work item when updated in it
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def create(self, entity, work_item_type, payload,
                query_string='{}',
@@ -83,9 +128,36 @@ class WorkItemApiClient(ABC):
         """
         raise NotImplementedError()
 
+    @abstractmethod
+    def work_item_graph(self, entity, work_item_ids: list, ancestors=True, descendants=False, max_depth=None):
+        """
+        Returns the WorkItemGraph of the given work items expanded to their ancestors and/or descendants
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def update_fields(self, pr_entity, work_item_id, field_value_obj: FieldValueObject):
         """
         Updates the key-values of the FieldValueObject in the given work item
         """
         raise NotImplementedError()
+
+    def update_fields_bulk(self, pr_entity, updates: list):
+        """
+        Updates many work items together. updates is a list of (work_item_id, FieldValueObject) and a work item can
+        appear more than once. Returns the map of each work item id to None if it is updated or to the error otherwise.
+        By default, the updates are made one by one with update_fields() and the later updates of a work item are
+        skipped once one of them fails
+        """
+        results = {}
+        for work_item_id, field_value_obj in updates:
+            if results.get(work_item_id) is not None:
+                continue
+            try:
+                self.update_fields(pr_entity, work_item_id, field_value_obj)
+                results[work_item_id] = None
+            except Exception as e:
+                resources.get('LOGGER').error('WorkItemApiClient', 'Failed to update the work item {}: {}'
+                                              .format(work_item_id, e))
+                results[work_item_id] = e
+        return results
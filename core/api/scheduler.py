@@ -0,0 +1,309 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from core.utils.helper import get_value
+from core.utils.map import resources
+
+
+def tenant_of(endpoint):
+    """
+    Returns the org that the endpoint belongs to
+    Ex:
+        https://dev.azure.com/{org}/{project}/_apis/... -> org
+        https://vssps.dev.azure.com/{org}/_apis/... -> org
+        https://{org}.visualstudio.com/... -> org
+    """
+    url = urlsplit(endpoint)
+    host = (url.hostname or '').lower()
+    if host.endswith('.visualstudio.com'):
+        return host.split('.')[0]
+    segments = [segment for segment in url.path.split('/') if segment]
+    if host.endswith('dev.azure.com') and segments:
+        return segments[0].lower()
+    return host
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose rate adapts to the throttling of the server.
+    The rate is halved whenever a request is throttled (429/503) and all the requests are held back for the
+    Retry-After duration. It grows back additively with every successful request up to max_rate
+    """
+
+    def __init__(self, rate=50.0, min_rate=1.0, max_rate=200.0, increase=1.0, decrease=0.5):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.__tokens = rate
+        self.__updated_at = time.monotonic()
+        self.__blocked_until = 0
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """ Blocks until a request can be sent. Returns the seconds waited """
+        waited = 0
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(max(self.rate, 1), self.__tokens + (now - self.__updated_at) * self.rate)
+                self.__updated_at = now
+                if now < self.__blocked_until:
+                    wait = self.__blocked_until - now
+                elif self.__tokens >= 1:
+                    self.__tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self.__tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(self):
+        with self.__lock:
+            self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def on_throttle(self, retry_after=None):
+        with self.__lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.__tokens = min(self.__tokens, 0)
+            if retry_after:
+                self.__blocked_until = max(self.__blocked_until, time.monotonic() + retry_after)
+
+
+class TenantMetrics:
+    """ Request, latency and throttle counters of a tenant """
+
+    def __init__(self, window=1000):
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.queue_wait = 0.0
+        self.__latencies = deque(maxlen=window)
+        self.__lock = threading.Lock()
+
+    def record(self, latency, waited, throttled=False, error=False):
+        with self.__lock:
+            self.requests += 1
+            self.throttled += int(throttled)
+            self.errors += int(error)
+            self.queue_wait += waited
+            self.__latencies.append(latency)
+
+    def snapshot(self):
+        with self.__lock:
+            latencies = sorted(self.__latencies)
+            requests, throttled, errors, queue_wait = self.requests, self.throttled, self.errors, self.queue_wait
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3) if latencies else 0
+
+        return {'requests': requests, 'throttled': throttled, 'errors': errors,
+                'queue_wait_ms': round(queue_wait * 1000, 3), 'latency_p50_ms': percentile(0.5),
+                'latency_p95_ms': percentile(0.95)}
+
+
+class Tenant:
+    """ Connection pool, concurrency cap, rate limiter and metrics of an org """
+
+    def __init__(self, name, max_concurrency, limiter):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self.metrics = TenantMetrics()
+        self.in_flight = 0
+        self.waiting = deque()
+        self.__session = None
+        self.__lock = threading.Lock()
+
+    def session(self):
+        with self.__lock:
+            if self.__session is None:
+                import requests
+
+                self.__session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.max_concurrency)
+                self.__session.mount('https://', adapter)
+                self.__session.mount('http://', adapter)
+            return self.__session
+
+    def close(self):
+        with self.__lock:
+            if self.__session is not None:
+                self.__session.close()
+                self.__session = None
+
+
+class TenantScheduler:
+    """
+    Sends the API requests of all the orgs, giving each org its own connection pool, concurrency cap and
+    adaptive rate limiter.
+
+    At most max_concurrency requests are in flight overall. When all the slots are taken, the waiting requests
+    are granted the freed slots round-robin across the orgs, so that a burst of requests to one org can not
+    starve the others
+    """
+    __logger = resources.get('LOGGER')
+    __name = 'TenantScheduler'
+
+    def __init__(self, max_concurrency=32, tenant_concurrency=8, rate=50.0, max_rate=200.0):
+        self.max_concurrency = max_concurrency
+        self.tenant_concurrency = tenant_concurrency
+        self.rate = rate
+        self.max_rate = max_rate
+        self.overrides = {}
+        self.__tenants = {}
+        self.__ready = deque()  # tenants with waiting requests, in the order of their turns
+        self.__in_flight = 0
+        self.__lock = threading.Lock()
+
+    def configure(self, config: dict):
+        """
+        Configures the scheduler from the 'scheduler' section of guardinel.json
+        Ex:
+            "scheduler": {
+                "max_concurrency": 32,
+                "tenant_concurrency": 8,
+                "rate_per_second": 50,
+                "max_rate_per_second": 200,
+                "tenants": {"my_org": {"concurrency": 4, "rate_per_second": 10}}
+            }
+        """
+        with self.__lock:
+            self.max_concurrency = get_value(config, ['max_concurrency'], self.max_concurrency)
+            self.tenant_concurrency = get_value(config, ['tenant_concurrency'], self.tenant_concurrency)
+            self.rate = get_value(config, ['rate_per_second'], self.rate)
+            self.max_rate = get_value(config, ['max_rate_per_second'], self.max_rate)
+            self.overrides = {name.lower(): value for name, value in get_value(config, ['tenants'], {}).items()}
+            for tenant in self.__tenants.values():
+                tenant.max_concurrency = self.__tenant_setting(tenant.name, 'concurrency', self.tenant_concurrency)
+            self.__dispatch()
+        return self
+
+    def request(self, method, endpoint, **kwargs):
+        """
+        Sends the request through the pool of the endpoint's org and returns the response.
+        The slot of a streamed request (stream=True) is held until its response is closed, so the download of
+        the body counts against the concurrency caps
+        """
+        tenant = self.tenant(tenant_of(endpoint))
+        start = time.monotonic()
+        tenant.limiter.acquire()
+        self.__acquire(tenant)
+        waited = time.monotonic() - start
+
+        sent = time.monotonic()
+        try:
+            resp = tenant.session().request(method, endpoint, **kwargs)
+        except Exception:
+            tenant.metrics.record(time.monotonic() - sent, waited, error=True)
+            self.__release(tenant)
+            raise
+
+        if kwargs.get('stream'):
+            self.__release_on_close(tenant, resp)
+        else:
+            self.__release(tenant)
+
+        throttled = resp.status_code in [429, 503]
+        if throttled:
+            tenant.limiter.on_throttle(self.__retry_after(resp))
+            self.__logger.warn(self.__name, '{} throttled the request {} {}. Rate is reduced to {:.2f}/s'
+                               .format(tenant.name, method, endpoint, tenant.limiter.rate))
+        else:
+            tenant.limiter.on_success()
+        tenant.metrics.record(time.monotonic() - sent, waited, throttled=throttled,
+                              error=resp.status_code >= 400 and not throttled)
+        return resp
+
+    def tenant(self, name):
+        with self.__lock:
+            if name not in self.__tenants:
+                limiter = AdaptiveRateLimiter(rate=self.__tenant_setting(name, 'rate_per_second', self.rate),
+                                              max_rate=self.__tenant_setting(name, 'max_rate_per_second',
+                                                                             self.max_rate))
+                self.__tenants[name] = Tenant(name, self.__tenant_setting(name, 'concurrency',
+                                                                          self.tenant_concurrency), limiter)
+            return self.__tenants[name]
+
+    def metrics(self):
+        """ Returns the metrics of each org: {org: {'requests': ..., 'throttled': ..., 'latency_p95_ms': ...}} """
+        with self.__lock:
+            tenants = list(self.__tenants.values())
+        return {tenant.name: dict(tenant.metrics.snapshot(), rate=round(tenant.limiter.rate, 3),
+                                  in_flight=tenant.in_flight, queued=len(tenant.waiting))
+                for tenant in tenants}
+
+    def close(self):
+        with self.__lock:
+            for tenant in self.__tenants.values():
+                tenant.close()
+
+    def __tenant_setting(self, name, key, default):
+        return get_value(self.overrides, [name, key], default)
+
+    def __acquire(self, tenant):
+        ticket = threading.Event()
+        with self.__lock:
+            tenant.waiting.append(ticket)
+            if tenant not in self.__ready:
+                self.__ready.append(tenant)
+            self.__dispatch()
+        ticket.wait()
+
+    def __release(self, tenant):
+        with self.__lock:
+            tenant.in_flight -= 1
+            self.__in_flight -= 1
+            self.__dispatch()
+
+    def __release_on_close(self, tenant, resp):
+        close = resp.close
+        once = threading.Lock()
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                # the slot is released by the first close only
+                if once.acquire(blocking=False):
+                    self.__release(tenant)
+
+        resp.close = close_and_release
+
+    def __dispatch(self):
+        """ Grants the free slots to the waiting requests, one tenant at a time """
+        skipped = 0
+        while self.__ready and self.__in_flight < self.max_concurrency and skipped < len(self.__ready):
+            tenant = self.__ready[0]
+            self.__ready.rotate(-1)
+            if tenant.in_flight >= tenant.max_concurrency:
+                skipped += 1
+                continue
+
+            skipped = 0
+            tenant.in_flight += 1
+            self.__in_flight += 1
+            tenant.waiting.popleft().set()
+            if not tenant.waiting:
+                self.__ready.remove(tenant)
+
+    @staticmethod
+    def __retry_after(resp):
+        try:
+            return float(resp.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+
+__scheduler = TenantScheduler()
+
+
+def scheduler():
+    """ Returns the scheduler shared by all the API calls of the process """
+    return __scheduler
@@ -0,0 +1,78 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from collections import deque
+
+from core.utils.helper import get_value
+
+
+class WorkItemGraph:
+    """
+    Compact adjacency structure of the work item hierarchy.
+    Holds the metadata of each fetched work item along with the ids of its parents and children.
+    Work items are keyed by their integer ids, string ids are accepted by the queries
+    Ex:
+        graph.ancestors(task_id) returns [story_id, feature_id, epic_id]
+        graph.ancestor_of_type(task_id, 'Epic') returns the epic's id
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.__parents = {}
+        self.__children = {}
+
+    def add(self, work_item_id, data, parents, children):
+        self.nodes[work_item_id] = data
+        self.__parents[work_item_id] = list(parents)
+        self.__children[work_item_id] = list(children)
+
+    def node(self, work_item_id):
+        return self.nodes.get(int(work_item_id))
+
+    def field(self, work_item_id, field_name, default=None):
+        return get_value(self.node(work_item_id), ['fields', field_name], default)
+
+    def parents(self, work_item_id):
+        return self.__parents.get(int(work_item_id), [])
+
+    def children(self, work_item_id):
+        return self.__children.get(int(work_item_id), [])
+
+    def ancestors(self, work_item_id):
+        """ Returns the fetched ancestors of the work item, nearest first """
+        return self.__walk(work_item_id, self.__parents)
+
+    def descendants(self, work_item_id):
+        """ Returns the fetched descendants of the work item, nearest first """
+        return self.__walk(work_item_id, self.__children)
+
+    def ancestor_of_type(self, work_item_id, work_item_type):
+        """ Returns the id of the nearest ancestor of the given type or None """
+        for ancestor in self.ancestors(work_item_id):
+            if self.field(ancestor, 'System.WorkItemType') == work_item_type:
+                return ancestor
+        return None
+
+    def roots(self, work_item_id):
+        """ Returns the fetched ancestors of the work item which have no parents """
+        return [ancestor for ancestor in [int(work_item_id)] + self.ancestors(work_item_id)
+                if ancestor in self.nodes and not self.parents(ancestor)]
+
+    def __walk(self, work_item_id, edges):
+        visited = {int(work_item_id)}
+        order = []
+        queue = deque(edges.get(int(work_item_id), []))
+        while queue:
+            current = queue.popleft()
+            if current in visited:
+                continue
+            visited.add(current)
+            order.append(current)
+            queue.extend(edges.get(current, []))
+        return order
+
+    def __contains__(self, work_item_id):
+        return int(work_item_id) in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
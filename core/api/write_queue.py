@@ -0,0 +1,245 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import os
+import threading
+import uuid
+from concurrent import futures
+
+from core.api.api_config_constants import APIConfigConstants
+from core.utils.map import resources
+
+
+class WriteResult:
+    """ Outcome of a flushed write operation. error is None if the operation succeeded """
+
+    def __init__(self, operation, target, error=None, response=None):
+        self.operation = operation
+        self.target = target
+        self.error = error
+        self.response = response
+
+    def succeeded(self):
+        return self.error is None
+
+    def __repr__(self):
+        return 'WriteResult({}, {}, error={})'.format(self.operation, self.target, self.error)
+
+
+class WriteBehindQueue:
+    """
+    Per-run queue of the mutating API operations of an input entity.
+
+    Operations are collected while the tasks run and sent together when flush() is invoked:
+    - field updates and work item attachments of all the work items are sent together through the bulk update api,
+      which can merge the updates targeting the same work item
+    - identical reviewer additions are sent once and all the reviewers are added together
+    - work item creations are sent as they are
+
+    Every queued update and reviewer addition is also appended to the spill file. Operations that are not flushed
+    successfully stay in it, so they are queued again by the queue of the next run for the same entity. Work item
+    creations are not spilled, since replaying a creation whose POST succeeded before a crash would duplicate the
+    work item
+    """
+    __logger = resources.get('LOGGER')
+    __name = 'WriteBehindQueue'
+
+    UPDATE_FIELDS = 'update_fields'
+    ADD_REVIEWER = 'add_reviewer'
+    CREATE = 'create'
+
+    def __init__(self, entity, api_client_mapper, spill_path=None, max_workers=8):
+        self.entity = entity
+        self.api_client_mapper = api_client_mapper
+        self.spill_path = spill_path
+        self.max_workers = max_workers
+        self.__lock = threading.Lock()
+        self.__updates = {}  # work item id -> FieldValueObjects in the order they were queued
+        self.__reviewers = {}  # (vote, is_required) -> reviewer ids
+        self.__creates = []
+        self.__load_spill()
+
+    def update_fields(self, work_item_id, field_value_obj):
+        self.__enqueue({'op': self.UPDATE_FIELDS, 'work_item_id': work_item_id,
+                        'payload': field_value_obj.payload_str()}, field_value_obj=field_value_obj)
+
+    def attach_work_item(self, work_item_id, artifact_id):
+        field_value_obj = self.__wi_client().attach_work_item_payload(artifact_id)
+        self.update_fields(work_item_id, field_value_obj)
+
+    def add_reviewer(self, reviewer, vote=0, is_required=True):
+        self.__enqueue({'op': self.ADD_REVIEWER, 'reviewer': reviewer, 'vote': vote, 'is_required': is_required})
+
+    def create(self, work_item_type, payload, query_string='{}', content_type='application/json-patch+json'):
+        self.__enqueue({'op': self.CREATE, 'id': uuid.uuid4().hex, 'work_item_type': work_item_type,
+                        'payload': payload, 'query_string': query_string, 'content_type': content_type})
+
+    def pending(self):
+        with self.__lock:
+            return len(self.__updates) + sum(len(r) for r in self.__reviewers.values()) + len(self.__creates)
+
+    def flush(self):
+        """
+        Sends all the queued operations concurrently and returns the list of WriteResult.
+        Failed operations are retained in the spill file to be retried by the next run
+        """
+        with self.__lock:
+            updates, self.__updates = self.__updates, {}
+            reviewers, self.__reviewers = self.__reviewers, {}
+            creates, self.__creates = self.__creates, []
+
+        calls = [lambda: self.__flush_updates(updates)] if updates else []
+        calls += [lambda key=key, ids=ids: self.__flush_reviewers(key, ids) for key, ids in reviewers.items()]
+        calls += [lambda record=record: self.__flush_create(record) for record in creates]
+        if not calls:
+            return []
+
+        self.__logger.info(self.__name, 'Flushing {} work item update(s), {} reviewer(s) and {} creation(s)...'
+                           .format(len(updates), sum(len(ids) for ids in reviewers.values()), len(creates)))
+        results = []
+        with futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls))) as ex:
+            for call_results in ex.map(lambda call: call(), calls):
+                results.extend(call_results)
+
+        self.__rewrite_spill(updates, reviewers, results)
+        return results
+
+    def __flush_updates(self, updates):
+        try:
+            outcomes = self.__wi_client().update_fields_bulk(
+                self.entity, [(work_item_id, obj) for work_item_id, objs in updates.items() for obj in objs])
+        except Exception as e:
+            return [WriteResult(self.UPDATE_FIELDS, work_item_id, error=e) for work_item_id in updates]
+        return [WriteResult(self.UPDATE_FIELDS, work_item_id, error=outcomes.get(work_item_id))
+                for work_item_id in updates]
+
+    def __flush_reviewers(self, key, reviewer_ids):
+        vote, is_required = key
+        try:
+            outcomes = self.api_client_mapper.get(APIConfigConstants.PULL_REQUEST_API_CLIENT) \
+                .add_reviewers(self.entity, list(reviewer_ids), vote=vote, is_required=is_required)
+        except Exception as e:
+            return [WriteResult(self.ADD_REVIEWER, reviewer, error=e) for reviewer in reviewer_ids]
+        return [WriteResult(self.ADD_REVIEWER, reviewer, error=outcomes.get(reviewer)) for reviewer in reviewer_ids]
+
+    def __flush_create(self, record):
+        try:
+            response = self.__wi_client().create(self.entity, record['work_item_type'], record['payload'],
+                                                 query_string=record['query_string'],
+                                                 content_type=record['content_type'])
+            return [WriteResult(self.CREATE, record['id'], response=response)]
+        except Exception as e:
+            return [WriteResult(self.CREATE, record['id'], error=e)]
+
+    def __enqueue(self, record, spill=True, field_value_obj=None):
+        with self.__lock:
+            if record['op'] == self.UPDATE_FIELDS:
+                self.__updates.setdefault(record['work_item_id'], []).append(field_value_obj)
+            elif record['op'] == self.ADD_REVIEWER:
+                reviewers = self.__reviewers.setdefault((record['vote'], record['is_required']), [])
+                if record['reviewer'] in reviewers:
+                    return
+                reviewers.append(record['reviewer'])
+            else:
+                self.__creates.append(record)
+
+            if spill and record['op'] != self.CREATE:
+                self.__append_spill([record])
+
+    def __records(self, updates, reviewers, include):
+        """ Returns the spill records of the given operations for which include(operation, target) is True """
+        records = []
+        for work_item_id, field_value_objs in updates.items():
+            if include(self.UPDATE_FIELDS, work_item_id):
+                records.extend({'op': self.UPDATE_FIELDS, 'work_item_id': work_item_id,
+                                'payload': field_value_obj.payload_str()} for field_value_obj in field_value_objs)
+        for (vote, is_required), reviewer_ids in reviewers.items():
+            for reviewer in reviewer_ids:
+                if include(self.ADD_REVIEWER, reviewer):
+                    records.append({'op': self.ADD_REVIEWER, 'reviewer': reviewer, 'vote': vote,
+                                    'is_required': is_required})
+        return records
+
+    def __spill_header(self):
+        return {'org': self.entity.org, 'project': self.entity.project, 'key': self.entity.key()}
+
+    def __load_spill(self):
+        if self.spill_path is None or not os.path.exists(self.spill_path):
+            return
+
+        lines = []
+        torn = False
+        with open(self.spill_path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    lines.append(json.loads(line))
+                except ValueError:
+                    # a line torn by a crash while it was being appended. Operations before it are still replayed
+                    self.__logger.warn(self.__name, 'Skipping the partial line {!r} of the spill file {}'
+                                       .format(line[:100], self.spill_path))
+                    torn = True
+        if not lines or lines[0] != self.__spill_header():
+            return
+
+        records = [record for record in lines[1:] if record.get('op') in [self.UPDATE_FIELDS, self.ADD_REVIEWER]]
+        if torn:
+            # the partial line is dropped, so that the next appends start on a line of their own
+            self.__write_spill(records)
+        self.__logger.info(self.__name, 'Re-queueing {} write operation(s) left by the previous run'
+                           .format(len(records)))
+        for record in records:
+            field_value_obj = None
+            if record['op'] == self.UPDATE_FIELDS:
+                try:
+                    field_value_obj = self.__wi_client().new_field_value_object().load_payload_str(record['payload'])
+                except NotImplementedError:
+                    self.__logger.warn(self.__name, 'Dropping the update of the work item {} left by the previous '
+                                                    'run, since it can\'t be restored'.format(record['work_item_id']))
+                    continue
+            self.__enqueue(record, spill=False, field_value_obj=field_value_obj)
+
+    def __append_spill(self, records):
+        if self.spill_path is None:
+            return
+
+        is_new = not os.path.exists(self.spill_path) or os.path.getsize(self.spill_path) == 0
+        with open(self.spill_path, 'a', encoding='utf-8') as f:
+            if is_new:
+                f.write(json.dumps(self.__spill_header()) + '\n')
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def __rewrite_spill(self, updates, reviewers, results):
+        """ Retains only the failed operations and the ones queued while flushing in the spill file """
+        if self.spill_path is None:
+            return
+
+        failed = {(result.operation, result.target) for result in results if not result.succeeded()}
+        with self.__lock:
+            records = self.__records(updates, reviewers, lambda op, target: (op, target) in failed)
+            records += self.__records(self.__updates, self.__reviewers, lambda op, target: True)
+
+            if not records:
+                if os.path.exists(self.spill_path):
+                    os.remove(self.spill_path)
+                return
+
+            self.__write_spill(records)
+
+    def __write_spill(self, records):
+        """ Replaces the spill file atomically so that a crash never loses the pending operations """
+        temp_path = '{}.{}.tmp'.format(self.spill_path, os.getpid())
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for line in [self.__spill_header()] + records:
+                f.write(json.dumps(line) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.spill_path)
+
+    def __wi_client(self):
+        return self.api_client_mapper.get(APIConfigConstants.WORK_ITEM_API_CLIENT)
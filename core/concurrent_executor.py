@@ -1,15 +1,31 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import heapq
+import multiprocessing
+import os
 import threading
+import time
 import traceback
 from concurrent import futures
 from datetime import datetime
 
+from core.adaptive_pool import AIMDController, AdaptivePool
+from core.api.caller import api_call_count
 from core.exceptions import GuardinelError, APICallFailedError
 from core.utils.constants import Constants
 from core.utils.helper import is_empty, get_values
 from core.utils.map import resources
+from core.utils.metrics import MetricsData
+from core.utils.task_result import TaskResult, with_callback_results
+
+
+def execute_in_process(task, snapshot):
+    """ Executes the task on the snapshot of the input entity in a worker process """
+    try:
+        return task.execute(snapshot), task.metrics
+    finally:
+        snapshot.close()
 
 
 class ConcurrentExecutor:
@@ -22,20 +38,52 @@ class ConcurrentExecutor:
     Steps:
     When started, the executor would
     - evaluate all the registered overrides
-    - invoke all the registered tasks
+    - invoke all the registered tasks, longest expected first
     - skip the tasks that are overridden
-    - return list of results for all the tasks
+    - send the writes queued by the tasks and their callbacks
+    - return list of results for all the tasks, followed by a 'write_operations' result if any write failed
+
+    Expected cost of a task is its decayed median runtime from the stats store, or its cost hint until it has
+    run once. If thread_count is None or 'auto', the pool is sized to the fewest threads that reach the shortest
+    predicted makespan (within 5%) when the tasks are scheduled longest expected first.
+    With adaptive set, the pool starts with that size and is resized between min_thread_count and
+    max_thread_count by an AIMD controller watching the latency and the throttling of the API calls.
+
+    Tasks that opt in with runs_in_process are executed in a pool of process_count worker processes on a
+    snapshot of the input entity. The data of all of them is prefetched first, and the snapshot is taken once
+    per run from the fetched data. Their results and metrics are merged back into the run
     """
 
     __logger = resources.get('LOGGER')
     __name = 'ConcurrentExecutor'
 
-    def __init__(self, config, input_entity, thread_count=3):
+    # expected cost in seconds of the tasks that have no statistics and no cost hint
+    default_task_cost = 1.0
+
+    # name of the result reporting the failed write operations
+    write_result_name = 'write_operations'
+
+    # thread_count that sizes the pool from the expected costs of the tasks
+    auto_thread_count = 'auto'
+
+    def __init__(self, config, input_entity, thread_count=3, stats_store=None, max_thread_count=16,
+                 adaptive=False, min_thread_count=2, process_count=None, results_writer=None):
         super().__init__()
         self.config = config
         self.input_entity = input_entity
-        self.thread_count = thread_count
+        self.thread_count = None if thread_count == self.auto_thread_count else thread_count
+        self.max_thread_count = max_thread_count
+        self.min_thread_count = min_thread_count
+        self.adaptive = adaptive
+        self.process_count = process_count
+        self.results_writer = results_writer
+        self.__process_pool = None
+        self.__process_pool_lock = threading.Lock()
+        self.__snapshot = None
+        self.__prefetch_errors = {}  # task name -> error raised by its prefetch
+        self.stats_store = stats_store
         self.overrides_map = {}
+        self.run_metrics = MetricsData('run')
 
     def evaluate_overrides(self, overrides_list):
         """
@@ -51,13 +99,54 @@ class ConcurrentExecutor:
         return result_map
 
     def exec_task_and_callbacks(self, task):
+        start, api_calls = time.perf_counter(), api_call_count()
         task.metrics.update_basic_fields(self.input_entity)
         task_result = self.exec_task(task)
         # callbacks tied to the task will be executed
-        self.exec_callback(task, task_result)
+        task_result = self.exec_callback(task, task_result)
         task.metrics.append(task_result)
+        if self.results_writer is not None:
+            self.results_writer.write(self.input_entity.key(), task_result)
+
+        if self.stats_store is not None and task_result.get('status') != Constants.OVERRIDDEN:
+            self.stats_store.record(task.name(), time.perf_counter() - start, api_call_count() - api_calls)
         return task_result
 
+    def expected_costs(self, tasks):
+        """ Returns the expected cost in seconds of each task """
+        costs = []
+        for task in tasks:
+            cost = self.stats_store.expected_seconds(task.name()) if self.stats_store is not None else None
+            costs.append(cost if cost is not None else task.cost_hint())
+
+        known = sorted(cost for cost in costs if cost is not None)
+        default = known[len(known) // 2] if known else self.default_task_cost
+        return [cost if cost is not None else default for cost in costs]
+
+    @staticmethod
+    def predict_makespan(costs, thread_count):
+        """ Returns the makespan of the costs, sorted longest first, scheduled on the given number of threads """
+        loads = [0.0] * max(1, thread_count)
+        for cost in sorted(costs, reverse=True):
+            heapq.heapreplace(loads, loads[0] + cost)
+        return max(loads)
+
+    def plan(self, tasks):
+        """
+        Returns the positions of the tasks in the order of their execution, the thread count and the predicted
+        makespan
+        """
+        costs = self.expected_costs(tasks)
+        order = sorted(range(len(tasks)), key=lambda i: costs[i], reverse=True)
+
+        thread_count = self.thread_count
+        if thread_count is None:
+            ceiling = max(1, min(self.max_thread_count, len(tasks)))
+            best = self.predict_makespan(costs, ceiling)
+            thread_count = next(count for count in range(1, ceiling + 1)
+                                if self.predict_makespan(costs, count) <= best * 1.05)
+        return order, thread_count, self.predict_makespan(costs, thread_count)
+
     def exec_task(self, task):
         """
         Method that thread would invoke on a task.
@@ -81,7 +170,7 @@ class ConcurrentExecutor:
             task.__class__.__name__, self.input_entity.key()))
 
         try:
-            result = task.execute(self.input_entity)
+            result = self.execute(task)
 
         except APICallFailedError as e:
             self.__logger.error(self.__name, "API call error while executing the action {}: {}"
@@ -104,19 +193,65 @@ class ConcurrentExecutor:
 
         return result
 
+    def execute(self, task):
+        """ Executes the task in this process or, if the task opts in, in a worker process """
+        if not task.runs_in_process():
+            return task.execute(self.input_entity)
+
+        if task.name() in self.__prefetch_errors:
+            raise self.__prefetch_errors[task.name()]
+        if self.__snapshot is None:
+            self.__logger.warn(self.__name, '{} can not be snapshotted. Executing {} in this process'
+                               .format(self.input_entity.name(), task.name()))
+            return task.execute(self.input_entity)
+
+        result, metrics = self.process_pool().submit(execute_in_process, task, self.__snapshot).result()
+        for task_metrics in metrics.value().values():
+            task.metrics.add_metrics(task_metrics)
+        return result
+
+    def prepare_snapshot(self, tasks, thread_count):
+        """
+        Prefetches the data of the tasks that run in the worker processes, concurrently, and takes the snapshot
+        of the input entity once they are all done. Errors of a prefetch are raised when its task is executed
+        """
+        tasks = [task for task in tasks if task.runs_in_process() and not task.get_overriders(self.overrides_map)]
+        if not tasks:
+            return
+
+        def prefetch(task):
+            try:
+                task.prefetch(self.input_entity)
+            except Exception as e:
+                self.__prefetch_errors[task.name()] = e
+
+        with futures.ThreadPoolExecutor(max_workers=thread_count) as ex:
+            list(ex.map(prefetch, tasks))
+        self.__snapshot = self.input_entity.snapshot()
+
+    def process_pool(self):
+        with self.__process_pool_lock:
+            if self.__process_pool is None:
+                # worker processes are not forked from this multi-threaded process
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self.__process_pool = futures.ProcessPoolExecutor(
+                    max_workers=self.process_count or os.cpu_count(), mp_context=multiprocessing.get_context(method))
+            return self.__process_pool
+
     def exec_callback(self, task, task_result):
+        """ Executes the callbacks of the task and returns the task result with the results of the callbacks """
         if is_empty(task.callbacks()):
-            return
+            return task_result
 
         # if the task is overridden, don't execute callbacks as well
         __o_riders = task.get_overriders(self.overrides_map)
         if len(__o_riders) > 0:
             self.__logger.info(self.__name, "Also, skipped the execution of the callbacks of '{}' for the "
                                             "overrides '{}'".format(task.name(), __o_riders))
-            return
+            return task_result
 
         callback_results = {}
-        for callback in get_values(self.config.instance_map, task.callbacks()):
+        for callback in get_values(self.config.instances_map, task.callbacks()):
             self.__logger.info(self.__name, '[{}] Executing the action {} on result {}'
                                .format(task.name(), callback.name(), task_result))
             try:
@@ -130,7 +265,7 @@ class ConcurrentExecutor:
                 callback.metrics.add('status', Constants.UNEXPECTED_ERROR)
                 callback.metrics.add('exception', e.__class__.__name__)
                 callback.metrics.add('error', traceback.format_exc())
-        task_result['callback_results'] = callback_results
+        return with_callback_results(task_result, callback_results)
 
     def start(self):
         """
@@ -152,18 +287,72 @@ class ConcurrentExecutor:
 
         self.__logger.info(self.__name, "Initializing ConcurrentExecutor...")
         self.evaluate_overrides(self.config.get_task_overrides())
-        ex = futures.ThreadPoolExecutor(max_workers=self.thread_count)
-        results = ex.map(self.exec_task_and_callbacks, self.config.get_tasks())
-        self.__logger.info(self.__name, "Exiting ConcurrentExecutor...")
-        ex.shutdown()
-        normalised_results = list(results)
 
+        tasks = self.config.get_tasks()
+        order, thread_count, predicted = self.plan(tasks)
+        ordered_tasks = [tasks[i] for i in order]
+        self.__logger.info(self.__name, 'Executing {} tasks on {} threads in the order {}. Predicted makespan: {:.3f}s'
+                           .format(len(tasks), thread_count, [task.name() for task in ordered_tasks], predicted))
+        start = time.perf_counter()
+        self.prepare_snapshot(ordered_tasks, thread_count)
+        if self.adaptive:
+            controller = AIMDController(floor=self.min_thread_count, ceiling=self.max_thread_count,
+                                        initial=thread_count)
+            ordered_results = AdaptivePool(controller).map(self.exec_task_and_callbacks, ordered_tasks)
+            self.run_metrics.add('pool_decisions', controller.decisions)
+        else:
+            ex = futures.ThreadPoolExecutor(max_workers=thread_count)
+            ordered_results = list(ex.map(self.exec_task_and_callbacks, ordered_tasks))
+            ex.shutdown()
+        if self.__process_pool is not None:
+            self.__process_pool.shutdown()
+            self.__process_pool = None
+        self.__snapshot = None
+        self.__prefetch_errors = {}
+        self.input_entity.release_snapshots()
+        self.__logger.info(self.__name, "Exiting ConcurrentExecutor...")
+        # results are returned in the order of the config
+        normalised_results = [None] * len(tasks)
+        for position, result in zip(order, ordered_results):
+            normalised_results[position] = result
+
+        self.run_metrics.append({'thread_count': thread_count, 'task_order': [task.name() for task in ordered_tasks],
+                                 'predicted_makespan_ms': int(predicted * 1000),
+                                 'actual_makespan_ms': int((time.perf_counter() - start) * 1000)})
+        if self.stats_store is not None:
+            self.stats_store.save()
+
+        # writes queued by the tasks and callbacks are sent together before notifying
+        write_result = self.flush_writes()
+        if write_result is not None:
+            normalised_results.append(write_result)
         self.notify(normalised_results)
 
         if self.config.telemetry_enabled:
             self.send_metrics()
         return normalised_results
 
+    def flush_writes(self):
+        """
+        Sends the writes queued on the input entity and records them in the run metrics.
+        Returns a NOTIFY result listing the failed writes, None if all of them succeeded. The failed writes don't
+        block the PR since the policies were already evaluated; failed updates are replayed by the next run
+        """
+        write_results = self.input_entity.flush_writes()
+        self.run_metrics.add('writes', [{'operation': result.operation, 'target': result.target,
+                                         'succeeded': result.succeeded(),
+                                         'error': str(result.error) if result.error is not None else None}
+                                        for result in write_results])
+        failed = [result for result in write_results if not result.succeeded()]
+        if not failed:
+            return None
+
+        message = 'Failed to send {} write operation(s): {}'.format(
+            len(failed), ', '.join('{} {}'.format(result.operation, result.target) for result in failed))
+        self.__logger.error(self.__name, message)
+        return TaskResult(self.write_result_name, Constants.NOTIFY, message=message,
+                          error=APICallFailedError(message))
+
     def notify(self, results):
         """
         Notify the results with the registered notifiers
@@ -44,3 +44,37 @@ class DependencyInjectionError(GuardinelError):
         super().__init__()
         self.message = 'No dependency is injected for the key : {}'.format(key)
         self.suggestion = 'Please update the dependency mapping for {} in DependencyInjector'.format(key)
+
+
+class ConfigValidationError(GuardinelError):
+    """
+    Error that is thrown when the config is invalid. Holds all the errors found in the config
+    """
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = list(errors)
+        self.message = 'Config is invalid:\n  - {}'.format('\n  - '.join(self.errors))
+        self.suggestion = 'Please fix the above errors in the config'
+
+    def __str__(self):
+        return self.message
+
+
+class SnapshotDataMissingError(GuardinelError):
+    """
+    Error that is thrown when a task running in a worker process reads data that is not in the snapshot of the
+    input entity
+    """
+    def __init__(self, data):
+        super().__init__()
+        self.message = '{} is not available in the snapshot of the input entity'.format(data)
+        self.suggestion = 'Please fetch it in the prefetch method of the task'
+
+
+class CircuitOpenError(APICallFailedError):
+    """
+    Exception thrown without calling the endpoint when the circuit breaker of its endpoint family is open
+    """
+    def __init__(self, family):
+        super().__init__('Calls to the {} APIs are failing. Skipped the call to fail fast'.format(family))
+        self.family = family
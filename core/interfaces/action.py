@@ -9,6 +9,7 @@ from core.exceptions import GuardinelError
 from core.interfaces.task import Task
 from core.utils.helper import get_value
 from core.utils.map import resources
+from core.utils.task_result import with_status
 
 
 class Action(Task, ABC):
@@ -41,7 +42,7 @@ class Action(Task, ABC):
             if status not in self.accepted_statuses():
                 self.__logger.warn(self.__tag, 'Updating status of {} from {} to {} to post comments in the PR!!'
                                    .format(self.name(), status, Constants.NOTIFY))
-                action_result['status'] = Constants.NOTIFY
+                action_result = with_status(action_result, Constants.NOTIFY)
 
         except GuardinelError as e:
             self.logger().error(self.__tag, traceback.format_exc())
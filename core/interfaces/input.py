@@ -25,5 +25,27 @@ class InputEntity(ABC):
     def key(self):
         raise NotImplementedError()
 
+    def flush_writes(self):
+        """
+        Sends the write operations queued by the tasks during the run. Invoked by the executor once all the tasks
+        and their callbacks are executed. Returns the list of results of the write operations
+        """
+        return []
+
+    def snapshot(self):
+        """
+        Returns a serializable, read-only snapshot of the data of the entity fetched so far, which is sent to the
+        tasks running in the worker processes. None if the entity can not be snapshotted
+        """
+        return None
+
+    def release_snapshots(self):
+        """ Releases the resources shared with the snapshots. Invoked by the executor at the end of the run """
+        pass
+
+    def close(self):
+        """ Releases the resources held by the entity. Invoked on the snapshots once a worker process is done """
+        pass
+
     def logger(self):
         return self.__logger
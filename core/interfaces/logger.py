@@ -30,5 +30,8 @@ class AbstractLogger(ABC):
     def enable_debug(self):
         self.__debug = True
 
+    def disable_debug(self):
+        self.__debug = False
+
     def debug_enabled(self):
         return self.__debug
@@ -1,8 +1,15 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import hashlib
+import json
 from abc import abstractmethod, ABC
+from concurrent import futures
 
+from core.api.api_config_constants import APIConfigConstants
+from core.api.write_queue import WriteResult
+from core.utils.comment_marker import parse_marker, with_marker
+from core.utils.helper import get_value
 from core.utils.map import resources
 
 
@@ -23,3 +30,159 @@ class Notifier(ABC):
 
     def logger(self):
         return self.__logger
+
+
+class DiffAwareCommentNotifier(Notifier):
+    """
+    Notifier which keeps a set of PR comment threads in sync with the results, with the fewest writes.
+
+    Implementations return the desired comments from comments(). Each comment is posted with a hidden marker
+    holding its key and the digest of its content. On every run, the desired comments are compared with the
+    marked threads of the PR comment thread index:
+    - a comment with no thread is created
+    - a comment whose thread context (file and lines) changed is posted in a new thread and its old thread is
+      resolved, since the context of a thread can not be changed
+    - a comment whose digest changed is updated
+    - a comment whose thread was resolved by the notifier (fixed) is reactivated. Threads closed by the reviewers
+      with any other status (wontFix, byDesign, closed, ...) are left as they are
+    - an active thread whose comment is no longer desired is resolved
+    Unchanged comments cost no API calls. The writes are sent in parallel and their responses are upserted into
+    the index
+    """
+
+    CREATE = 'create_thread'
+    UPDATE = 'update_comment'
+    SET_STATUS = 'update_thread_status'
+
+    # thread statuses set by the notifier
+    ACTIVE = 'active'
+    RESOLVED = 'fixed'
+    UNRESOLVED_STATUSES = ('active', 'pending')
+
+    max_workers = 8
+    digest_size = 12
+
+    @abstractmethod
+    def comments(self, entity, results):
+        """
+        Returns the map of the key of each desired comment to its content, or to
+        {'content': ..., 'thread_context': {...}} for a comment on a file. thread_context is the ADO threadContext
+        of the thread. Keys must be unique within the notifier and must not contain whitespaces, ':' or '/'
+        """
+        raise NotImplementedError()
+
+    def notify(self, entity, result):
+        index = entity.comment_thread_index()
+        operations = self.plan(index, self.comments(entity, result))
+        return self.apply(entity, index, operations)
+
+    def plan(self, index, comments: dict):
+        """ Returns the list of (operation, key, args) needed to bring the threads of the index to the comments """
+        operations = []
+        for key, comment in comments.items():
+            marker_key = self.marker_key(key)
+            content, thread_context = self.__content(comment)
+            digest = self.digest(content, thread_context)
+            thread = index.by_marker(marker_key)
+            if thread is None:
+                operations.append((self.CREATE, key, [self.__new_thread(content, thread_context, marker_key,
+                                                                        digest)]))
+                continue
+
+            status = get_value(thread, ['status'])
+            if self.anchor(get_value(thread, ['threadContext'])) != self.anchor(thread_context):
+                # the comment moved to another file or lines. Its old thread is resolved and a new one is posted
+                if status in self.UNRESOLVED_STATUSES:
+                    operations.append((self.SET_STATUS, key, [thread['id'], self.RESOLVED]))
+                operations.append((self.CREATE, key, [self.__new_thread(content, thread_context, marker_key,
+                                                                        digest)]))
+                continue
+
+            comment_id, current = self.__marked_comment(thread)
+            if current[1] != digest:
+                operations.append((self.UPDATE, key, [thread['id'], comment_id,
+                                                      with_marker(content, marker_key, digest)]))
+            if status == self.RESOLVED:
+                operations.append((self.SET_STATUS, key, [thread['id'], self.ACTIVE]))
+
+        for marker_key in index.markers():
+            owner, key = self.owner(marker_key)
+            if owner != self.name() or key in comments:
+                continue
+            for thread in index.marked(marker_key):
+                if get_value(thread, ['status']) in self.UNRESOLVED_STATUSES:
+                    operations.append((self.SET_STATUS, key, [thread['id'], self.RESOLVED]))
+        return operations
+
+    def apply(self, entity, index, operations):
+        """ Sends the operations in parallel and returns their list of WriteResult """
+        if not operations:
+            self.logger().info(self.name(), 'PR comments are up to date')
+            return []
+
+        client = entity.api_client_mapper.get(APIConfigConstants.PULL_REQUEST_API_CLIENT)
+
+        def send(operation):
+            name, key, args = operation
+            try:
+                response = getattr(client, name)(entity, *args)
+            except Exception as e:
+                self.logger().error(self.name(), 'Failed to {} of {}: {}'.format(name, key, e))
+                return WriteResult(name, key, error=e)
+            if name == self.UPDATE:
+                index.upsert_comment(args[0], response)
+            else:
+                index.upsert(response)
+            return WriteResult(name, key, response=response)
+
+        self.logger().info(self.name(), 'Sending {} PR comment operation(s): {}'
+                           .format(len(operations), [(name, key) for name, key, _ in operations]))
+        with futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(operations))) as ex:
+            return list(ex.map(send, operations))
+
+    def marker_key(self, key):
+        """ Returns the key of the marker of the comment, scoped to the notifier """
+        return '{}/{}'.format(self.name(), key)
+
+    @staticmethod
+    def owner(marker_key):
+        """ Returns the (notifier name, comment key) of the marker key """
+        name, _, key = marker_key.rpartition('/')
+        return name, key
+
+    @staticmethod
+    def anchor(thread_context):
+        """ Returns the file and the line ranges that the thread context places the thread at """
+        if not thread_context:
+            return None
+        lines = tuple(get_value(thread_context, [side, 'line']) for side in
+                      ['rightFileStart', 'rightFileEnd', 'leftFileStart', 'leftFileEnd'])
+        file_path = get_value(thread_context, ['filePath'])
+        return '/' + file_path.lstrip('/') if file_path else file_path, lines
+
+    def digest(self, content, thread_context=None):
+        payload = json.dumps([content, thread_context], sort_keys=True).encode('utf-8')
+        return hashlib.sha1(payload).hexdigest()[:self.digest_size]
+
+    def __new_thread(self, content, thread_context, marker_key, digest):
+        thread = {'comments': [{'parentCommentId': 0, 'commentType': 'text',
+                                'content': with_marker(content, marker_key, digest)}],
+                  'status': self.ACTIVE}
+        if thread_context:
+            thread['threadContext'] = thread_context
+        return thread
+
+    @staticmethod
+    def __content(comment):
+        if isinstance(comment, dict):
+            return comment.get('content', ''), comment.get('thread_context')
+        return comment, None
+
+    @staticmethod
+    def __marked_comment(thread):
+        """ Returns the id and the (key, digest) of the marker of the first marked comment of the thread """
+        for comment in get_value(thread, ['comments'], []):
+            marker = parse_marker(get_value(comment, ['content']))
+            if marker is not None:
+                return comment['id'], marker
+        return None, (None, None)
@@ -6,6 +6,7 @@ from abc import abstractmethod, ABC
 from core.utils.constants import Constants
 from core.utils.map import resources
 from core.utils.metrics import MetricsData
+from core.utils.task_result import TaskResult
 
 
 class Task(ABC):
@@ -33,6 +34,44 @@ class Task(ABC):
         """
         return []
 
+    def work_item_fields(self):
+        """
+        List of work item fields that the task reads from the work items linked to the input entity.
+        Only the registered fields are fetched from the work items
+        """
+        return []
+
+    def scan_rules(self):
+        """
+        Map of the rule names to the regex patterns that the task looks for in the contents of the input entity.
+        Rules of all the tasks are validated and registered on the input entity, under the name of the task, when
+        the config is built, so that every content is scanned once for all of them. The task reads the matches of
+        its rules with entity.content_matches(file_paths, self.name())
+        Ex:
+            {'todo_markers': ['(?i:todo|fixme)']}
+        """
+        return {}
+
+    def runs_in_process(self):
+        """
+        True to execute the task in a worker process instead of a thread, for the CPU-bound tasks.
+        Such a task is executed on a read-only snapshot of the input entity, so it must be picklable and it can
+        only read the data fetched before the snapshot is taken (see prefetch). Its callbacks still run in the
+        executor's process on the live input entity
+        """
+        return False
+
+    def prefetch(self, input_entity):
+        """ Fetches the data that the task reads, before the snapshot of the input entity is taken """
+        pass
+
+    def cost_hint(self):
+        """
+        Expected execution time of the task in seconds, used to schedule the task until its runtime statistics
+        are recorded. None if unknown
+        """
+        return None
+
     @abstractmethod
     def name(self):
         raise NotImplementedError()
@@ -49,6 +88,10 @@ class Task(ABC):
     def logger(self):
         return self.__logger
 
+    def reset(self):
+        """ Drops the state of the last run, when the same instance serves the next run of a long-lived process """
+        self.metrics = MetricsData(self.name())
+
     def set_metrics(self, metrics):
         self.metrics = metrics
 
@@ -62,21 +105,14 @@ class Task(ABC):
             message: provides error message in case the task fails
             error: PolicyError object with fail info in case of fail status
 
-        Returns: standard json format for the result
+        Returns: TaskResult, which reads like the standard json format of the result
 
         """
         if status == Constants.OVERRIDDEN:
             message += ' Overridden by {}'.format(overridden_by)
 
-        return {
-            'name': self.name(),
-            'overrides': self.overrides(),
-            'overridden_by': overridden_by,
-            'status': status,
-            'message': message,
-            'exception': error.__class__.__name__ if error else '',
-            'error': error.__dict__ if error else ''
-        }
+        return TaskResult(self.name(), status, overrides=self.overrides(), overridden_by=overridden_by,
+                          message=message, error=error)
 
 
 class TaskTemplate(Task, ABC):
@@ -0,0 +1,38 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+# Hidden markers that identify the PR comments posted by Guardinel.
+# A marker is an html comment, so it is not rendered in the PR:
+#   <!-- guardinel:{key} -->
+#   <!-- guardinel:{key}:{digest} -->
+# key identifies what the comment is about (ex: the task name) and the optional digest identifies its content
+
+import re
+
+__pattern = re.compile(r'<!--\s*guardinel:([^\s:>]+)(?::([0-9a-fA-F]+))?\s*-->')
+
+
+def marker(key, digest=None):
+    """ Returns the marker of the given key """
+    if digest is None:
+        return '<!-- guardinel:{} -->'.format(key)
+    return '<!-- guardinel:{}:{} -->'.format(key, digest)
+
+
+def parse_marker(content):
+    """ Returns (key, digest) of the first marker in the content, None if the content has no marker """
+    match = __pattern.search(content or '')
+    if match is None:
+        return None
+    return match.group(1), match.group(2)
+
+
+def with_marker(content, key, digest=None):
+    """ Returns the content with its marker replaced by, or appended with, the marker of the given key """
+    content = strip_marker(content)
+    return '{}\n\n{}'.format(content, marker(key, digest)) if content else marker(key, digest)
+
+
+def strip_marker(content):
+    """ Returns the content without its markers """
+    return __pattern.sub('', content or '').rstrip()
@@ -0,0 +1,39 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Fast json encoding of the results. orjson is used when it is installed, the standard json module otherwise
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_jsonable(value):
+    """ Converts the values that are not json types: mappings like TaskResult, sets, metrics and exceptions """
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    if hasattr(value, 'keys') and hasattr(value, '__getitem__'):
+        return {key: value[key] for key in value.keys()}
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, 'value') and hasattr(value, 'name'):
+        return value.value()
+    return str(value)
+
+
+def dumps(value):
+    """ Returns the json of the value as utf-8 bytes """
+    if orjson is not None:
+        return orjson.dumps(value, default=to_jsonable, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=to_jsonable, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,127 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import codecs
+import json
+import re
+
+# returned for an empty array slot, since None is the value of a json null element
+_NO_ELEMENT = object()
+
+
+class JsonArrayStream:
+    """
+    Incremental parser that yields the elements of a json array without materializing the full document.
+    The array is identified by the hierarchy of object keys leading to it from the root.
+    Ex:
+        For the document {"count": 2, "changes": [{...}, {...}]}, JsonArrayStream(['changes']) yields both the
+        change objects one by one as the chunks of the document are fed to it
+
+    Only the element being parsed is held in memory along with the unconsumed tail of the last chunk.
+    close() raises ValueError if the document ended without the array being found or completed
+    """
+
+    # strings (complete or only the opening quote of an incomplete one) and the structural characters
+    __token = re.compile(r'"(?:[^"\\]|\\.)*"|"|[\[\]{},:]')
+
+    def __init__(self, path: list):
+        self.path = list(path)
+        self.__decoder = codecs.getincrementaldecoder('utf-8')()
+        self.__buffer = ''
+        self.__scan_from = 0
+        self.__stack = []  # open containers, '{' or '['
+        self.__keys = []  # last key seen at each open container, None for arrays
+        self.__expect_key = False
+        self.__target_depth = None
+        self.__element_start = None
+        self.done = False
+
+    def feed(self, chunk):
+        """ Consumes the given chunk of bytes and yields the array elements completed by it """
+        if self.done:
+            return
+
+        self.__buffer += self.__decoder.decode(chunk)
+        consumed = self.__scan_from
+        for match in self.__token.finditer(self.__buffer, consumed):
+            token = match.group()
+            if token == '"':
+                # incomplete string, wait for the next chunk
+                break
+            consumed = match.end()
+
+            if token[0] == '"':
+                if self.__expect_key:
+                    self.__keys[-1] = json.loads(token)
+                    self.__expect_key = False
+            elif token in '{[':
+                self.__open(token, match.end())
+            elif token in '}]':
+                element = self.__close(match.start())
+                if element is not _NO_ELEMENT:
+                    yield element
+                if self.done:
+                    break
+            elif token == ',':
+                element = self.__next(match.start(), match.end())
+                if element is not _NO_ELEMENT:
+                    yield element
+
+        self.__discard(consumed)
+
+    def close(self):
+        """ Verifies that the whole array was parsed, once all the chunks are fed """
+        if self.__target_depth is None:
+            raise ValueError('No json array found at {}'.format(self.path))
+        if not self.done:
+            raise ValueError('Json document ended inside the array at {}'.format(self.path))
+
+    def __open(self, token, end):
+        self.__stack.append(token)
+        self.__keys.append(None)
+        self.__expect_key = token == '{'
+        if token == '[' and self.__target_depth is None and self.__at_path():
+            self.__target_depth = len(self.__stack)
+            self.__element_start = end
+
+    def __close(self, start):
+        element = _NO_ELEMENT
+        if self.__target_depth == len(self.__stack):
+            element = self.__element(start)
+            self.__element_start = None
+            self.done = True
+        elif len(self.__stack) == 1:
+            # root is closed without reaching the array. close() reports it
+            self.done = True
+
+        self.__stack.pop()
+        self.__keys.pop()
+        self.__expect_key = False
+        return element
+
+    def __next(self, start, end):
+        if self.__stack and self.__stack[-1] == '{':
+            self.__expect_key = True
+        if self.__target_depth != len(self.__stack):
+            return _NO_ELEMENT
+
+        element = self.__element(start)
+        self.__element_start = end
+        return element
+
+    def __element(self, end):
+        text = self.__buffer[self.__element_start:end].strip()
+        return json.loads(text) if text else _NO_ELEMENT
+
+    def __at_path(self):
+        """ Returns True if the array being opened is reached through the configured hierarchy of keys """
+        parents = self.__stack[:-1]
+        return parents == ['{'] * len(self.path) and self.__keys[:-1] == self.path
+
+    def __discard(self, consumed):
+        """ Drops the parsed part of the buffer, retaining the element that is being parsed """
+        keep_from = consumed if self.__element_start is None else min(consumed, self.__element_start)
+        self.__buffer = self.__buffer[keep_from:]
+        self.__scan_from = consumed - keep_from
+        if self.__element_start is not None:
+            self.__element_start -= keep_from
@@ -0,0 +1,77 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+from collections import OrderedDict
+
+
+class SizedLRUCache:
+    """
+    Thread safe cache bounded by the total size of its values.
+    When the size crosses max_size, least recently used values are evicted.
+    Values larger than max_size are never cached.
+    on_evict(key, value), if given, is invoked with every value evicted, removed or replaced by another value,
+    ex: to close the values holding files or mappings
+    """
+
+    def __init__(self, max_size, on_evict=None):
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self.size = 0
+        self.__entries = OrderedDict()  # key -> (value, size)
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return default
+            self.__entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size):
+        evicted = []
+        with self.__lock:
+            replaced = self.__remove(key)
+            if replaced is not None and replaced is not value:
+                evicted.append((key, replaced))
+            if size <= self.max_size:
+                self.__entries[key] = (value, size)
+                self.size += size
+                while self.size > self.max_size:
+                    evicted_key, (evicted_value, evicted_size) = self.__entries.popitem(last=False)
+                    self.size -= evicted_size
+                    evicted.append((evicted_key, evicted_value))
+        self.__evicted(evicted)
+
+    def remove(self, key):
+        with self.__lock:
+            removed = self.__remove(key)
+        self.__evicted([(key, removed)] if removed is not None else [])
+
+    def items(self):
+        """ Returns the list of the cached (key, value) pairs, least recently used first """
+        with self.__lock:
+            return [(key, value) for key, (value, _) in self.__entries.items()]
+
+    def __contains__(self, key):
+        with self.__lock:
+            return key in self.__entries
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __remove(self, key):
+        """ Removes the entry of the key and returns its value, None if the key is not cached """
+        entry = self.__entries.pop(key, None)
+        if entry is None:
+            return None
+        self.size -= entry[1]
+        return entry[0]
+
+    def __evicted(self, entries):
+        # invoked out of the lock, so that the callback can use the cache
+        if self.on_evict is None:
+            return
+        for key, value in entries:
+            self.on_evict(key, value)
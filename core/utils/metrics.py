@@ -1,6 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+from collections.abc import Mapping
+
 from core.exceptions import UnknownMetricTypeError
 from core.interfaces.metrics import Metrics
 
@@ -76,7 +78,7 @@ class MetricsData(Metrics):
         Adds the given key value pairs to the metrics data. Based on the type of the value, an appropriate metrics
         object will be created and inserted into the value
         """
-        if not isinstance(kwargs, dict):
+        if not isinstance(kwargs, Mapping):
             raise TypeError('Expecting dict in append operation but got {}'.format(kwargs))
         if len(kwargs) == 0:
             return
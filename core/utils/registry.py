@@ -0,0 +1,116 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import importlib
+import threading
+import time
+from collections.abc import Mapping
+
+
+class LazyRegistry(Mapping):
+    """
+    Read-only map of names to instances, where each instance is created only when its name is first looked up.
+
+    Instances are registered with a spec 'package.module:ClassName' (or any zero-argument callable). The module
+    is imported and the class is constructed on the first lookup, so the components that are not referenced by
+    the config cost nothing at startup. Time taken to import and construct every loaded component is recorded
+    and reported by import_report()
+    Ex:
+        registry = LazyRegistry({'my_policy': 'my_package.policies:MyPolicy'})
+        registry.get('my_policy')
+    """
+
+    def __init__(self, specs=None):
+        self.__specs = dict(specs or {})
+        self.__instances = {}
+        self.__timings = {}
+        self.__lock = threading.RLock()
+
+    def register(self, name, spec):
+        with self.__lock:
+            self.__specs[name] = spec
+            self.__instances.pop(name, None)
+
+    def discover(self, group):
+        """
+        Registers the components published by the installed packages as entry points of the given group
+        Ex: in the setup.py of a component package
+            entry_points={'guardinel.components': ['my_policy = my_package.policies:MyPolicy']}
+        """
+        from importlib.metadata import entry_points
+
+        eps = entry_points()
+        eps = eps.select(group=group) if hasattr(eps, 'select') else eps.get(group, [])
+        for ep in eps:
+            self.register(ep.name, ep.value)
+        return self
+
+    def get(self, name, default=None):
+        if name not in self.__specs:
+            return default
+
+        with self.__lock:
+            if name not in self.__instances:
+                self.__instances[name] = self.__load(name, self.__specs[name])
+            return self.__instances[name]
+
+    def create(self, name):
+        """ Returns a new instance of the given name, which is not retained by the registry """
+        if name not in self.__specs:
+            return None
+        return self.__load(name, self.__specs[name])
+
+    def __load(self, name, spec):
+        start = time.perf_counter()
+        if callable(spec):
+            factory = spec
+        else:
+            module_name, _, attr = spec.partition(':')
+            factory = importlib.import_module(module_name)
+            for part in attr.split('.'):
+                factory = getattr(factory, part)
+
+        imported = time.perf_counter()
+        instance = factory()
+        self.__timings[name] = (spec if not callable(spec) else repr(spec), imported - start,
+                                time.perf_counter() - imported)
+        return instance
+
+    def specs(self):
+        """ Returns the map of the registered names to their specs """
+        with self.__lock:
+            return dict(self.__specs)
+
+    def loaded(self):
+        """ Returns the names of the instances created so far """
+        return list(self.__instances.keys())
+
+    def reset(self):
+        """ Drops all the created instances. Imported modules are retained, so re-creating them is cheap """
+        with self.__lock:
+            self.__instances.clear()
+
+    def import_report(self):
+        """
+        Returns the time taken by each loaded component, slowest first:
+        [{'name': ..., 'spec': ..., 'import_ms': ..., 'init_ms': ...}]
+        Modules shared by many components are accounted to the component that imported them first
+        """
+        report = [{'name': name, 'spec': spec, 'import_ms': round(import_time * 1000, 3),
+                   'init_ms': round(init_time * 1000, 3)}
+                  for name, (spec, import_time, init_time) in self.__timings.items()]
+        return sorted(report, key=lambda r: r['import_ms'] + r['init_ms'], reverse=True)
+
+    def __getitem__(self, name):
+        if name not in self.__specs:
+            raise KeyError(name)
+        return self.get(name)
+
+    def __contains__(self, name):
+        return name in self.__specs
+
+    def __iter__(self):
+        return iter(list(self.__specs.keys()))
+
+    def __len__(self):
+        return len(self.__specs)
@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import re
+import threading
+from multiprocessing import shared_memory
+
+
+class SharedContent:
+    """
+    Read-only content placed in shared memory, to be read by the worker processes without being copied.
+    Supports len(), indexing, slicing and find() like bytes and mmap. Only the name and the size of the
+    shared memory block are pickled
+    """
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.__block = None
+
+    def __view(self):
+        if self.__block is None:
+            self.__block = shared_memory.SharedMemory(name=self.name)
+        return self.__block.buf[:self.size]
+
+    def find(self, sub, start=0, end=None):
+        match = re.compile(re.escape(sub)).search(self.__view(), start, self.size if end is None else end)
+        return match.start() if match else -1
+
+    def close(self):
+        if self.__block is not None:
+            self.__block.close()
+            self.__block = None
+
+    def __getitem__(self, key):
+        value = self.__view()[key]
+        return value.tobytes() if isinstance(key, slice) else value
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        return {'name': self.name, 'size': self.size}
+
+    def __setstate__(self, state):
+        self.__init__(state['name'], state['size'])
+
+
+class SharedContentStore:
+    """
+    Places the contents in shared memory blocks owned by the current process.
+    Contents are copied in chunks of copy_chunk_size, so a memory-mapped content is never read into memory at
+    once. Contents shared once are not copied again. Blocks are released by close()
+    """
+
+    copy_chunk_size = 1024 * 1024
+
+    def __init__(self):
+        self.__blocks = {}  # key -> SharedMemory
+        self.__lock = threading.Lock()
+
+    def share(self, key, content):
+        """ Returns the SharedContent of the given bytes-like content """
+        with self.__lock:
+            block = self.__blocks.get(key)
+            if block is None:
+                block = shared_memory.SharedMemory(create=True, size=max(1, len(content)))
+                for start in range(0, len(content), self.copy_chunk_size):
+                    end = min(start + self.copy_chunk_size, len(content))
+                    block.buf[start:end] = content[start:end]
+                self.__blocks[key] = block
+            return SharedContent(block.name, len(content))
+
+    def close(self):
+        with self.__lock:
+            for block in self.__blocks.values():
+                block.close()
+                block.unlink()
+            self.__blocks.clear()
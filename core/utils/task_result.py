@@ -0,0 +1,122 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+from collections.abc import Mapping
+
+from core.utils import json_codec
+
+
+class TaskResult(Mapping):
+    """
+    Immutable result of a task execution.
+
+    Reads like the result dict of the earlier versions: result['status'], result.get('message'), dict(result).
+    'exception' and 'error' are derived from the error only when they are read, and the traceback of the error is
+    dropped so that the results of a long batch do not retain the frames of the failures.
+    Changes return a new result
+    Ex:
+        result = result.replace(status=Constants.NOTIFY)
+    """
+    __slots__ = ('name', 'overrides', 'overridden_by', 'status', 'message', 'error_obj', 'callback_results')
+
+    fields = ('name', 'overrides', 'overridden_by', 'status', 'message', 'exception', 'error', 'callback_results')
+
+    def __init__(self, name, status, overrides=None, overridden_by=None, message='', error=None,
+                 callback_results=None):
+        if error is not None:
+            error.__traceback__ = None
+        for slot, value in [('name', name), ('overrides', overrides), ('overridden_by', overridden_by),
+                            ('status', status), ('message', message), ('error_obj', error),
+                            ('callback_results', callback_results)]:
+            object.__setattr__(self, slot, value)
+
+    def exception(self):
+        return self.error_obj.__class__.__name__ if self.error_obj is not None else ''
+
+    def error(self):
+        return dict(self.error_obj.__dict__) if self.error_obj is not None else ''
+
+    def replace(self, **changes):
+        """ Returns a copy of the result with the given fields changed """
+        values = {'name': self.name, 'status': self.status, 'overrides': self.overrides,
+                  'overridden_by': self.overridden_by, 'message': self.message, 'error': self.error_obj,
+                  'callback_results': self.callback_results}
+        values.update(changes)
+        return TaskResult(**values)
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+    def to_json(self):
+        """ Returns the json of the result as utf-8 bytes """
+        return json_codec.dumps(self.to_dict())
+
+    def __getitem__(self, key):
+        if key == 'exception':
+            return self.exception()
+        if key == 'error':
+            return self.error()
+        if key in self.fields and (key != 'callback_results' or self.callback_results is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.fields if self.callback_results is not None else self.fields[:-1])
+
+    def __len__(self):
+        return len(self.fields) - (self.callback_results is None)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('TaskResult is immutable. Use replace() to change {}'.format(key))
+
+    def __reduce__(self):
+        return TaskResult, (self.name, self.status, self.overrides, self.overridden_by, self.message, self.error_obj,
+                            self.callback_results)
+
+    def __repr__(self):
+        return 'TaskResult(name={!r}, status={!r}, message={!r}, exception={!r})'.format(
+            self.name, self.status, self.message, self.exception())
+
+
+def with_callback_results(result, callback_results):
+    """ Returns the result with the callback results. Results of the custom tasks returning dicts are updated """
+    if isinstance(result, TaskResult):
+        return result.replace(callback_results=callback_results)
+    result['callback_results'] = callback_results
+    return result
+
+
+def with_status(result, status):
+    """ Returns the result with the given status. Results of the custom tasks returning dicts are updated """
+    if isinstance(result, TaskResult):
+        return result.replace(status=status)
+    result['status'] = status
+    return result
+
+
+class ResultsWriter:
+    """
+    Appends the results to a JSONL file as they are produced, one line per result with the key of the input entity
+    Ex:
+        {"key": "449093", "name": "hello_world_policy", "status": "SUCCESS", ...}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.__file = None
+        self.__lock = threading.Lock()
+
+    def write(self, key, result):
+        line = json_codec.dumps(dict({'key': key}, **json_codec.to_jsonable(result))) + b'\n'
+        with self.__lock:
+            if self.__file is None:
+                self.__file = open(self.path, 'ab')
+            self.__file.write(line)
+            self.__file.flush()
+
+    def close(self):
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
@@ -0,0 +1,127 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the server does not pre-fork workers
+    fcntl = None
+
+from core.utils.map import resources
+
+
+class TaskStats:
+    """
+    Exponentially decayed runtime history of a task.
+    Each run is recorded as a sample whose weight decays by the decay factor with every newer run, so the
+    percentiles follow the recent behaviour of the task. Only the latest max_samples samples are kept
+    """
+
+    def __init__(self, samples=None, decay=0.8, max_samples=50):
+        self.samples = [list(sample) for sample in samples or []]  # [seconds, api calls, weight]
+        self.decay = decay
+        self.max_samples = max_samples
+
+    def record(self, seconds, api_calls):
+        for sample in self.samples:
+            sample[2] *= self.decay
+        self.samples.append([seconds, api_calls, 1.0])
+        self.samples = self.samples[-self.max_samples:]
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        target = p * sum(sample[2] for sample in ordered)
+        cumulative = 0
+        for seconds, _, weight in ordered:
+            cumulative += weight
+            if cumulative >= target:
+                return seconds
+        return ordered[-1][0]
+
+    def p50(self):
+        return self.percentile(0.5)
+
+    def p95(self):
+        return self.percentile(0.95)
+
+    def api_calls(self):
+        if not self.samples:
+            return None
+        return sum(calls * weight for _, calls, weight in self.samples) / sum(weight for *_, weight in self.samples)
+
+    def summary(self):
+        return {'p50': self.p50(), 'p95': self.p95(), 'api_calls': self.api_calls(), 'runs': len(self.samples)}
+
+
+class TaskStatsStore:
+    """
+    Local json store of the runtime statistics of the tasks, keyed by the task names.
+    Used by the executor to predict the cost of the tasks of a run
+    """
+    __logger = resources.get('LOGGER')
+    __name = 'TaskStatsStore'
+
+    default_path = os.path.join(os.path.expanduser('~'), '.guardinel', 'task_stats.json')
+
+    def __init__(self, path=None, decay=0.8):
+        self.path = path or self.default_path
+        self.decay = decay
+        self.__stats = None
+        self.__recorded = []  # (task name, seconds, api calls) of the runs recorded since the last save
+        self.__lock = threading.Lock()
+
+    def get(self, task_name):
+        """ Returns the TaskStats of the task or None if the task has never run """
+        with self.__lock:
+            return self.__load().get(task_name)
+
+    def expected_seconds(self, task_name):
+        stats = self.get(task_name)
+        return stats.p50() if stats is not None else None
+
+    def record(self, task_name, seconds, api_calls):
+        with self.__lock:
+            stats = self.__load().setdefault(task_name, TaskStats(decay=self.decay))
+            stats.record(seconds, api_calls)
+            self.__recorded.append((task_name, seconds, api_calls))
+
+    def save(self):
+        """
+        Adds the runs recorded since the last save to the statistics of the store. The store is re-read under a lock
+        shared by all the processes, so the runs saved meanwhile by the other workers of the server are retained
+        """
+        with self.__lock:
+            if not self.__recorded:
+                return
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path + '.lock', 'a') as lock_file:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                    self.__stats = None
+                    for task_name, seconds, api_calls in self.__recorded:
+                        self.__load().setdefault(task_name, TaskStats(decay=self.decay)).record(seconds, api_calls)
+                    temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+                    with open(temp_path, 'w', encoding='utf-8') as f:
+                        json.dump({name: stats.samples for name, stats in self.__load().items()}, f)
+                    os.replace(temp_path, self.path)
+                self.__recorded = []
+            except OSError as e:
+                self.__logger.warn(self.__name, 'Could not save the task statistics to {}: {}'.format(self.path, e))
+
+    def __load(self):
+        if self.__stats is None:
+            self.__stats = {}
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self.__stats = {name: TaskStats(samples, self.decay) for name, samples in json.load(f).items()}
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as e:
+                self.__logger.warn(self.__name, 'Ignoring the unreadable task statistics {}: {}'.format(self.path, e))
+        return self.__stats
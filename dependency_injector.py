@@ -1,24 +1,26 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-from api_client.ado.ado_client_mapper import ADOClientMapper
-from components.config_builder import PoliciesConfigBuilder
 from core.exceptions import DependencyInjectionError
+from core.utils.registry import LazyRegistry
 
 
 class DependencyInjector:
     """
     Provides the instances of the dependencies
+    Dependencies are imported and instantiated on their first use
     """
 
     class Constants:
         API_CLIENT_MAPPER = 'api_client_mapper'
         CONFIG_BUILDER = 'config_builder'
+        IDENTITY_RESOLVER = 'identity_resolver'
 
-    mapper = {
-        Constants.API_CLIENT_MAPPER: ADOClientMapper(),
-        Constants.CONFIG_BUILDER: PoliciesConfigBuilder()
-    }
+    mapper = LazyRegistry({
+        Constants.API_CLIENT_MAPPER: 'api_client.ado.ado_client_mapper:ADOClientMapper',
+        Constants.CONFIG_BUILDER: 'components.config_builder:PoliciesConfigBuilder',
+        Constants.IDENTITY_RESOLVER: 'components.utils.identity_resolver:IdentityResolver'
+    })
 
     @staticmethod
     def get(key):
@@ -26,3 +28,11 @@ class DependencyInjector:
         if instance is None:
             raise DependencyInjectionError(key)
         return instance
+
+    @staticmethod
+    def create(key):
+        """ Returns a new instance of the dependency instead of the shared one """
+        instance = DependencyInjector.mapper.create(key)
+        if instance is None:
+            raise DependencyInjectionError(key)
+        return instance
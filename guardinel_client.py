@@ -0,0 +1,47 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Thin client of the Guardinel worker pool (guardinel_server.py). Takes the same arguments as guardinel_v1.0.py,
+runs the gate on a warm worker and exits with the same exit code
+
+Usage:
+    python guardinel_client.py -c guardinel.json -t <PAT>
+"""
+
+import json
+import os
+import socket
+import sys
+
+from cmdline import default_socket_path, parse_args
+
+
+def submit(cmdline_input, socket_path=None, out=sys.stdout):
+    """ Runs the gate on the worker pool, writing its logs to out. Returns (results, exit_code) """
+    request = {
+        'config_path': os.path.abspath(cmdline_input.config_path),
+        'access_token': cmdline_input.access_token,
+        'cwd': os.getcwd()
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path or default_socket_path())
+        conn.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        with conn.makefile('r', encoding='utf-8') as f:
+            for line in f:
+                message = json.loads(line)
+                if message['type'] == 'log':
+                    out.write(message['line'] + '\n')
+                elif message['type'] == 'result':
+                    return message['results'], message['exit_code']
+                else:
+                    out.write(message['message'])
+                    return None, message['exit_code']
+
+    raise ConnectionError('Worker exited without completing the run')
+
+
+if __name__ == '__main__':
+    cmdline_input = parse_args(sys.argv[1:], default='guardinel.json')
+    _, exit_code = submit(cmdline_input)
+    exit(exit_code)
@@ -0,0 +1,275 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Pool of pre-forked Guardinel workers serving the gate invocations over a Unix socket.
+
+The server imports Guardinel, builds the api clients and the components of the warm-up config once and forks
+the workers from the warmed process. The workers keep the components, the clients and their HTTP sessions across
+the jobs and only drop the state of each run, so a job only pays for its own API calls. guardinel_client.py submits the
+command line input of a run and streams back its logs, results and exit code.
+
+Protocol: the client sends one json line {"config_path": ..., "access_token": ..., "cwd": ...} and the worker
+replies with json lines {"type": "log", "line": ...}, ending with {"type": "result", "results": [...],
+"exit_code": ...} or {"type": "error", "message": ..., "exit_code": 1}
+
+Usage:
+    python guardinel_server.py [-s/--socket <path>] [-w/--workers <count>] [-j/--max-jobs <count>]
+                               [-m/--max-memory-mb <mb>] [-c/--config <warm-up config>]
+"""
+
+import contextlib
+import getopt
+import importlib.util
+import json
+import os
+import resource
+import signal
+import socket
+import sys
+import threading
+import traceback
+
+from cmdline import CmdlineInput, default_socket_path
+from core.utils import json_codec
+from core.utils.map import resources
+
+
+def load_guardinel():
+    """ Imports guardinel_v1.0.py, which can not be imported by its name """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'guardinel_v1.0.py')
+    spec = importlib.util.spec_from_file_location('guardinel_v1', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def memory_mb():
+    """ Returns the resident memory of the current process """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        # peak resident memory, reported in kilobytes on linux and in bytes on mac
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+class _LogStream:
+    """ stdout of a job. Every printed line is sent to the client as a log message """
+
+    def __init__(self, send):
+        self.__send = send
+        self.__buffer = ''
+        self.__lock = threading.Lock()
+
+    def write(self, text):
+        with self.__lock:
+            self.__buffer += text
+            *lines, self.__buffer = self.__buffer.split('\n')
+        for line in lines:
+            self.__send({'type': 'log', 'line': line})
+        return len(text)
+
+    def flush(self):
+        with self.__lock:
+            line, self.__buffer = self.__buffer, ''
+        if line:
+            self.__send({'type': 'log', 'line': line})
+
+
+class Worker:
+    """ Forked worker that serves the jobs until it has served max_jobs or its memory crosses max_memory_mb """
+
+    def __init__(self, server_socket, guardinel, max_jobs, max_memory_mb):
+        self.server_socket = server_socket
+        self.guardinel = guardinel
+        self.max_jobs = max_jobs
+        self.max_memory_mb = max_memory_mb
+        self.jobs = 0
+        self.cwd = os.getcwd()
+
+    def run(self):
+        while self.jobs < self.max_jobs:
+            conn, _ = self.server_socket.accept()
+            with conn:
+                self.serve(conn)
+            self.jobs += 1
+            if memory_mb() > self.max_memory_mb:
+                break
+
+    def serve(self, conn):
+        lock = threading.Lock()
+
+        def send(message):
+            with lock:
+                conn.sendall(json_codec.dumps(message) + b'\n')
+
+        try:
+            with conn.makefile('r', encoding='utf-8') as f:
+                request = json.loads(f.readline())
+
+            cmdline_input = CmdlineInput()
+            cmdline_input.config_path = request.get('config_path') or self.guardinel.Guardinel.default_config
+            cmdline_input.access_token = request.get('access_token')
+
+            stream = _LogStream(send)
+            with contextlib.redirect_stdout(stream):
+                try:
+                    os.chdir(request.get('cwd') or self.cwd)
+                    results = self.guardinel.Guardinel.start(cmdline_input)
+                    exit_code = 1 if self.guardinel.pr_needs_block(results) else 0
+                    message = {'type': 'result', 'results': results, 'exit_code': exit_code}
+                except Exception:
+                    message = {'type': 'error', 'message': traceback.format_exc(), 'exit_code': 1}
+                finally:
+                    stream.flush()
+            send(message)
+        except (OSError, ValueError):
+            # client went away or sent an invalid request, nothing to reply to
+            pass
+        finally:
+            self.reset()
+
+    def reset(self):
+        """
+        Drops the state of the job, like the metrics of the components and the data cached by the api clients.
+        Components, clients and their HTTP sessions are retained for the next job
+        """
+        from api_client.ado.ado_client_mapper import ADOClientMapper
+        from core.interfaces.input import InputEntity
+
+        for registry in [self.guardinel.instances_map, ADOClientMapper.client_mapper]:
+            for name in registry.loaded():
+                instance = registry.get(name)
+                if hasattr(instance, 'reset'):
+                    instance.reset()
+        InputEntity.custom_data.clear()
+        resources.get('LOGGER').disable_debug()
+        os.chdir(self.cwd)
+
+
+class WorkerPool:
+    """ Forks the workers from the warmed server process and replaces each worker that exits """
+    __logger = resources.get('LOGGER')
+    __name = 'WorkerPool'
+
+    def __init__(self, socket_path=None, workers=4, max_jobs=100, max_memory_mb=1024, warm_config=None):
+        self.socket_path = socket_path or default_socket_path()
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.max_memory_mb = max_memory_mb
+        self.warm_config = warm_config
+        self.guardinel = None
+        self.__socket = None
+        self.__pids = set()
+        self.__stopping = False
+
+    def serve(self):
+        self.warm()
+        self.__bind()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        self.__logger.info(self.__name, 'Serving on {} with {} workers'.format(self.socket_path, self.workers))
+        for _ in range(self.workers):
+            self.__spawn()
+
+        try:
+            while self.__pids:
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    break
+                except InterruptedError:
+                    continue
+                self.__pids.discard(pid)
+                if not self.__stopping:
+                    self.__logger.debug(self.__name, 'Worker {} exited, forking a new one'.format(pid))
+                    self.__spawn()
+        finally:
+            self.__socket.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def warm(self):
+        """
+        Builds the api clients and the components of the warm-up config, and the HTTP session of its org, before
+        forking. No connection is opened, since the forked workers must not share them
+        """
+        from api_client.ado.ado_client_mapper import ADOClientMapper
+        from core.api.caller import http
+        from core.api.scheduler import scheduler
+        from core.utils.helper import get_value
+
+        self.guardinel = load_guardinel()
+        http()
+        for key in ADOClientMapper.client_mapper:
+            ADOClientMapper.client_mapper.get(key)
+
+        if self.warm_config:
+            from components.config_compiler import ConfigCompiler
+            compiled = ConfigCompiler(self.guardinel.instances_map).load(self.warm_config)
+            org = get_value(compiled['config'], ['input', 'org'])
+            if org:
+                scheduler().tenant(org.lower()).session()
+
+        Worker(None, self.guardinel, 0, 0).reset()
+
+    def stop(self, *_):
+        self.__stopping = True
+        for pid in list(self.__pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.__pids.discard(pid)
+
+    def __bind(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # the socket is created accessible to the current user only, without a window in which others can connect
+        umask = os.umask(0o177)
+        try:
+            self.__socket.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        self.__socket.listen(128)
+
+    def __spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                Worker(self.__socket, self.guardinel, self.max_jobs, self.max_memory_mb).run()
+            except Exception:
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(exit_code)
+        self.__pids.add(pid)
+
+
+def parse_server_args(args_list):
+    options = {'socket_path': None, 'workers': 4, 'max_jobs': 100, 'max_memory_mb': 1024, 'warm_config': None}
+    arguments, _ = getopt.getopt(args_list, 's:w:j:m:c:',
+                                 ['socket=', 'workers=', 'max-jobs=', 'max-memory-mb=', 'config='])
+    for argument, value in arguments:
+        if argument in ('-s', '--socket'):
+            options['socket_path'] = value
+        elif argument in ('-w', '--workers'):
+            options['workers'] = int(value)
+        elif argument in ('-j', '--max-jobs'):
+            options['max_jobs'] = int(value)
+        elif argument in ('-m', '--max-memory-mb'):
+            options['max_memory_mb'] = float(value)
+        elif argument in ('-c', '--config'):
+            options['warm_config'] = value
+    return options
+
+
+if __name__ == '__main__':
+    WorkerPool(**parse_server_args(sys.argv[1:])).serve()
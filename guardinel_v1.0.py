@@ -1,47 +1,119 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
-import getopt
-import json
 import sys
 
+from cmdline import help_info, parse_args
 from components.classes import instances_map
+from components.config_compiler import ConfigCompiler
 from components.pr_input_entity import PullRequestEntity
 from components.utils.helper import pr_needs_block
+from core.api.circuit_breaker import breakers
+from core.api.hedging import hedging
+from core.api.scheduler import scheduler
 from core.concurrent_executor import ConcurrentExecutor
 from core.utils.helper import is_empty, get_value
 from core.utils.map import resources
+from core.utils.task_result import ResultsWriter
+from core.utils.task_stats import TaskStatsStore
 from dependency_injector import DependencyInjector
 
 __logger = resources.get('LOGGER')
 __tag = 'Guardinel'
 
 
-class CmdlineInput:
-    def __init__(self):
-        self.config_path = None
-        self.access_token = None
-
-
 class Guardinel:
 
     default_config = 'guardinel.json'
 
     @staticmethod
     def start(_cmdline_input):
-        with open(_cmdline_input.config_path, encoding='utf-8') as f:
-            config_json = json.load(f)
-            if get_value(config_json, ["log_level"], "").lower() == 'debug':
-                resources.get('LOGGER').enable_debug()
+        # the config is validated and compiled once, later runs load the compiled snapshot
+        compiled = ConfigCompiler(instances_map).load(_cmdline_input.config_path)
+        config_json = compiled['config']
+        if get_value(config_json, ["log_level"], "").lower() == 'debug':
+            resources.get('LOGGER').enable_debug()
+
+        DependencyInjector.get(DependencyInjector.Constants.IDENTITY_RESOLVER)\
+            .configure(get_value(config_json, ["identity"], {}))
+        scheduler().configure(get_value(config_json, ["scheduler"], {}))
+        breakers().configure(get_value(config_json, ["circuit_breaker"], {}))
+        hedging().configure(get_value(config_json, ["hedging"], {}))
+
+        config, entity = Guardinel.build_config_entity(config_json, _cmdline_input.access_token, compiled)
+        executor = Guardinel.build_executor(config, entity, get_value(config_json, ["executor"], {}))
+        try:
+            results = executor.start()
+        finally:
+            if executor.results_writer is not None:
+                executor.results_writer.close()
+        resources.get('LOGGER').debug('Guardinel', 'Run metrics: {}'.format(
+            {name: metrics.value() for name, metrics in executor.run_metrics.value().items()}))
+
+        Guardinel.log_import_report()
+        Guardinel.log_api_metrics()
+        return results
+
+    @staticmethod
+    def build_executor(config, entity, executor_config):
+        """
+        Builds the executor from the 'executor' section of guardinel.json
+        Ex:
+            "executor": {
+                "thread_count": "auto",
+                "adaptive": true,
+                "min_thread_count": 2,
+                "max_thread_count": 16,
+                "process_count": 4,
+                "stats_path": "/tmp/guardinel/task_stats.json",
+                "results_path": "/tmp/guardinel/results.jsonl"
+            }
+        thread_count is 3 by default. null or "auto" sizes the pool from the runtime statistics of the tasks.
+        adaptive resizes the pool between min_thread_count and max_thread_count while the tasks run, based on the API
+        latency and throttling.
+        process_count is the number of worker processes of the tasks that run in process (cpu count by default).
+        Results of the tasks are appended to the JSONL file results_path, if set, as the tasks complete
+        """
+        stats_store = TaskStatsStore(get_value(executor_config, ["stats_path"]))
+        results_path = get_value(executor_config, ["results_path"])
+        return ConcurrentExecutor(config, entity, thread_count=get_value(executor_config, ["thread_count"], 3),
+                                  stats_store=stats_store,
+                                  max_thread_count=get_value(executor_config, ["max_thread_count"], 16),
+                                  adaptive=get_value(executor_config, ["adaptive"], False),
+                                  min_thread_count=get_value(executor_config, ["min_thread_count"], 2),
+                                  process_count=get_value(executor_config, ["process_count"]),
+                                  results_writer=ResultsWriter(results_path) if results_path else None)
 
-            config, entity = Guardinel.build_config_entity(config_json, _cmdline_input.access_token)
-            executor = ConcurrentExecutor(config, entity)
-            return executor.start()
+    @staticmethod
+    def log_import_report():
+        """ Logs the time taken to import and construct each component and dependency used by the run """
+        logger = resources.get('LOGGER')
+        for registry in [instances_map, DependencyInjector.mapper]:
+            for report in registry.import_report():
+                logger.debug('Guardinel', 'Loaded {name} ({spec}): import {import_ms} ms, init {init_ms} ms'
+                             .format(**report))
+
+    @staticmethod
+    def log_api_metrics():
+        """ Logs the API metrics of each org and the circuit breaker and the hedging metrics of each API family """
+        for org, metrics in scheduler().metrics().items():
+            resources.get('LOGGER').info('Guardinel', 'API calls to {}: {}'.format(org, metrics))
+        for family, metrics in breakers().metrics().items():
+            resources.get('LOGGER').info('Guardinel', 'Circuit breaker of {} APIs: {}'.format(family, metrics))
+        for family, metrics in hedging().metrics().items():
+            resources.get('LOGGER').info('Guardinel', 'Hedged GETs of {} APIs: {}'.format(family, metrics))
 
     @staticmethod
-    def build_config_entity(config_file, access_token):
-        config = Guardinel.build_config(config_file)
+    def build_config_entity(config_file, access_token, compiled=None):
+        compiled = compiled or ConfigCompiler(instances_map).compile(config_file)
+        config = Guardinel.build_config(config_file, compiled)
         entity = Guardinel.build_entity(get_value(config_file, ["input"]), access_token)
+
+        # fetch only the work item fields that are configured or needed by the registered tasks
+        entity.register_work_item_fields(compiled['work_item_fields'])
+        # contents are scanned once for the scan rules of all the registered tasks
+        for task in config.get_tasks():
+            entity.register_scan_rules(task.scan_rules(), task.name())
         return config, entity
 
     @staticmethod
@@ -52,30 +124,17 @@ class Guardinel:
         input_entity.project = get_value(input_config, ["project"])
         input_entity.pat = access_token
         input_entity.ado_version = get_value(input_config, ["api", "version"])
+        input_entity.write_spill_dir = get_value(input_config, ["write_spill_dir"], input_entity.write_spill_dir)
 
         Guardinel.validate_entity(input_entity)
         return input_entity
 
     @staticmethod
-    def build_config(config):
-        __config_builder = DependencyInjector.get(DependencyInjector.Constants.CONFIG_BUILDER)
-        __config_builder.with_instances_map(instances_map)
-
-        for task in get_value(config, ["tasks"]):
-            __config_builder.add_task(task)
-
-        for task in get_value(config, ["notifiers"]):
-            __config_builder.add_notifier(task)
-
-        for override in get_value(config, ["global_overrides"]):
-            __config_builder.add_global_override(override)
-
-        for telemetry in get_value(config, ["telemetry"]):
-            __config_builder.add_telemetry(telemetry)
-
-        __config_builder.telemetry_enabled = get_value(config, ["telemetry_enabled"])
-
-        return __config_builder.build()
+    def build_config(config, compiled=None):
+        """ Builds the config with a new builder, so that any number of configs can be built in a process """
+        compiled = compiled or ConfigCompiler(instances_map).compile(config)
+        __config_builder = DependencyInjector.create(DependencyInjector.Constants.CONFIG_BUILDER)
+        return __config_builder.with_instances_map(instances_map).with_compiled(compiled).build()
 
     @staticmethod
     def validate_entity(input_entity):
@@ -101,41 +160,6 @@ class Guardinel:
             raise ValueError("project is missing in the config")
 
 
-def help_info():
-    __logger.info(__tag,
-                  "Please follow the below format for arguments:\n"
-                  "arguments: -f/--config : path to config file\n"
-                  "           -h/--help : print help\n"
-                  "Refer this wiki for the config file format")
-
-
-def parse_args(args_list, default):
-    cmdline_in = CmdlineInput()
-    cmdline_in.config_path = default
-    cmdline_in.access_token = None
-
-    # Options
-    options = "hc:t:"
-
-    # Long options
-    long_options = ["help", "config=", "token="]
-
-    # Parsing argument
-    arguments, values = getopt.getopt(args_list, options, long_options)
-    # checking each argument
-    for currentArgument, currentValue in arguments:
-        if currentArgument in ("-h", "--help"):
-            help_info()
-
-        elif currentArgument in ("-c", "--config"):
-            cmdline_in.config_path = currentValue
-
-        elif currentArgument in ("-t", "--token"):
-            cmdline_in.access_token = currentValue
-
-    return cmdline_in
-
-
 if __name__ == '__main__':
     # Remove 1st argument from the list of command line arguments
     argumentList = sys.argv[1:]
@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+import unittest
+
+from core.adaptive_pool import AIMDController, AdaptivePool
+from core.api import caller
+
+
+def respond(controller, status_code=200, seconds=0.1, count=10):
+    for _ in range(count):
+        controller.on_response('GET', 'https://dev.azure.com/org', status_code, seconds)
+
+
+class AIMDControllerTest(unittest.TestCase):
+
+    def test_healthy_windows_increase_the_limit_up_to_the_ceiling(self):
+        controller = AIMDController(floor=2, ceiling=4, interval=0)
+        limits = []
+        for _ in range(4):
+            respond(controller)
+            limits.append(controller.evaluate())
+        self.assertEqual(limits, [3, 4, 4, 4])
+        self.assertEqual([(d['from'], d['to'], d['reason']) for d in controller.decisions],
+                         [(2, 3, 'healthy'), (3, 4, 'healthy')])
+
+    def test_throttling_decreases_the_limit_down_to_the_floor(self):
+        controller = AIMDController(floor=2, ceiling=16, initial=12, interval=0)
+        respond(controller, count=9)
+        respond(controller, status_code=429, count=1)
+        self.assertEqual(controller.evaluate(), 6)
+        respond(controller, status_code=503)
+        controller.evaluate()
+        respond(controller, status_code=503)
+        self.assertEqual(controller.evaluate(), 2)
+        self.assertEqual(controller.decisions[0]['reason'], '1 throttled request(s)')
+
+    def test_latency_spike_over_the_baseline_decreases_the_limit(self):
+        controller = AIMDController(floor=1, ceiling=16, initial=8, spike_factor=2.0, interval=0)
+        respond(controller, seconds=0.1)
+        self.assertEqual(controller.evaluate(), 9)
+        respond(controller, seconds=0.5)
+        self.assertEqual(controller.evaluate(), 4)
+
+    def test_limit_is_kept_without_responses_or_before_the_interval(self):
+        controller = AIMDController(floor=2, ceiling=8, interval=0)
+        self.assertEqual(controller.evaluate(), 2)
+        controller.interval = 60
+        respond(controller)
+        self.assertEqual(controller.evaluate(), 2)
+        self.assertEqual(controller.decisions, [])
+
+
+class AdaptivePoolTest(unittest.TestCase):
+
+    def test_runs_up_to_the_limit_and_keeps_the_order(self):
+        controller = AIMDController(floor=2, ceiling=8, interval=60)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def task(item):
+            with lock:
+                running.append(item)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(item)
+            return item * 2
+
+        self.assertEqual(AdaptivePool(controller).map(task, range(6)), [0, 2, 4, 6, 8, 10])
+        self.assertLessEqual(max(peak), 2)
+        self.assertNotIn(controller.on_response, caller.response_listeners)
+
+    def test_task_error_is_raised(self):
+        def task(item):
+            raise ValueError(item)
+
+        with self.assertRaises(ValueError):
+            AdaptivePool(AIMDController(interval=0.01)).map(task, [1])
+        self.assertEqual(caller.response_listeners, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+from components.utils.changed_lines import FileChangedLines, LineRanges
+
+
+class LineRangesTest(unittest.TestCase):
+
+    def test_sorts_and_merges_overlapping_and_adjacent_ranges(self):
+        ranges = LineRanges([(10, 12), (5, 6), (13, 20), (15, 16), (30, 30)])
+        self.assertEqual(ranges.ranges(), [(5, 6), (10, 20), (30, 30)])
+        self.assertEqual((len(ranges), ranges.line_count()), (3, 14))
+
+    def test_point_queries(self):
+        ranges = LineRanges([(5, 6), (10, 20)])
+        self.assertEqual([line for line in range(1, 23) if ranges.contains(line)],
+                         [5, 6] + list(range(10, 21)))
+
+    def test_range_queries(self):
+        ranges = LineRanges([(5, 6), (10, 20)])
+        self.assertTrue(ranges.overlaps(1, 5))
+        self.assertTrue(ranges.overlaps(7, 10))
+        self.assertTrue(ranges.overlaps(12, 13))
+        self.assertTrue(ranges.overlaps(1, 100))
+        self.assertFalse(ranges.overlaps(7, 9))
+        self.assertFalse(ranges.overlaps(21, 30))
+        self.assertFalse(LineRanges().overlaps(1, 100))
+
+
+class FileChangedLinesTest(unittest.TestCase):
+
+    def test_from_diff_blocks(self):
+        changed = FileChangedLines.from_diff_blocks('/a.py', [
+            {'changeType': 0, 'mLine': 1, 'mLinesCount': 4, 'oLine': 1, 'oLinesCount': 4},
+            {'changeType': 1, 'mLine': 5, 'mLinesCount': 2, 'oLine': 5, 'oLinesCount': 0},
+            {'changeType': 3, 'mLine': 10, 'mLinesCount': 3, 'oLine': 8, 'oLinesCount': 1},
+            {'changeType': 2, 'mLine': 20, 'mLinesCount': 0, 'oLine': 17, 'oLinesCount': 2},
+        ])
+        self.assertEqual(changed.added.ranges(), [(5, 6)])
+        self.assertEqual(changed.modified.ranges(), [(10, 12)])
+        self.assertEqual(changed.deleted.ranges(), [(8, 8), (17, 18)])
+        self.assertTrue(changed.is_changed(6))
+        self.assertFalse(changed.is_changed(7))
+        self.assertTrue(changed.is_changed_between(7, 10))
+        self.assertTrue(changed.is_deleted(17))
+        self.assertFalse(changed.is_deleted(5))
+
+    def test_no_blocks(self):
+        changed = FileChangedLines.from_diff_blocks('/a.py', None)
+        self.assertFalse(changed.is_changed_between(1, 1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+from unittest import mock
+
+from core.api import caller, circuit_breaker
+from core.api.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, endpoint_family
+from core.exceptions import CircuitOpenError
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(circuit_breaker, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker('git', window_seconds=60, min_requests=4, error_rate=0.5, open_seconds=30)
+
+    def record(self, *outcomes, seconds=0.1):
+        for succeeded in outcomes:
+            self.breaker.record(succeeded, seconds)
+
+    def test_opens_once_the_error_rate_is_reached_over_min_requests(self):
+        self.record(False, False, True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.record(True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.metrics()['rejected'], 1)
+
+    def test_calls_out_of_the_window_are_forgotten(self):
+        self.record(False, False)
+        self.clock.now += 61
+        self.record(True, True, False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_slow_calls_open_the_circuit(self):
+        self.breaker.latency_seconds = 1
+        self.record(True, True, seconds=2)
+        self.record(True, True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_probe_closes_or_reopens_the_circuit(self):
+        self.record(False, False, False, False)
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.record(False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.opened, 2)
+
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.record(True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_statuses(self):
+        self.assertTrue(self.breaker.is_failure(None))
+        self.assertTrue(self.breaker.is_failure(503))
+        self.assertTrue(self.breaker.is_failure(429))
+        self.assertFalse(self.breaker.is_failure(404))
+        self.breaker.failure_statuses = []
+        self.assertFalse(self.breaker.is_failure(429))
+
+
+class CircuitBreakerRegistryTest(unittest.TestCase):
+
+    def test_family_settings_override_the_defaults(self):
+        registry = CircuitBreakerRegistry()
+        git = registry.breaker('git')
+        registry.configure({'min_requests': 5, 'failure_statuses': [429, 409],
+                            'families': {'wit': {'min_requests': 2, 'unknown': 1}}})
+        self.assertEqual((git.min_requests, git.failure_statuses), (5, [429, 409]))
+        self.assertEqual(registry.breaker('wit').min_requests, 2)
+        self.assertIs(registry.breaker('git'), git)
+
+    def test_endpoint_families(self):
+        self.assertEqual(endpoint_family('https://dev.azure.com/org/project/_apis/git/pullrequests/1'), 'git')
+        self.assertEqual(endpoint_family('https://vssps.dev.azure.com/org/_apis/identities'), 'identities')
+        self.assertEqual(endpoint_family('https://dev.azure.com/org/project'), 'other')
+
+
+class SendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = CircuitBreakerRegistry().configure({'min_requests': 2})
+        self.scheduler = mock.Mock()
+        patchers = [mock.patch.object(caller, 'breakers', lambda: self.registry),
+                    mock.patch.object(caller, 'scheduler', lambda: self.scheduler)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_throttled_calls_open_the_circuit(self):
+        endpoint = 'https://dev.azure.com/org/_apis/wit/workitems'
+        self.scheduler.request.return_value = mock.Mock(status_code=429)
+        caller.send('GET', endpoint)
+        caller.send('GET', endpoint)
+        with self.assertRaises(CircuitOpenError):
+            caller.send('GET', endpoint)
+        self.assertEqual(self.scheduler.request.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+from components.utils.comment_threads import CommentThreadIndex
+from core.interfaces.notifier import DiffAwareCommentNotifier
+from core.utils.comment_marker import with_marker, strip_marker
+
+
+class Notifier(DiffAwareCommentNotifier):
+
+    def __init__(self, name='n'):
+        self.__name = name
+
+    def comments(self, entity, results):
+        return {}
+
+    def name(self):
+        return self.__name
+
+
+class DiffAwareCommentNotifierPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.notifier = Notifier()
+
+    def posted(self, thread_id, key, comment, status='active'):
+        """ Returns the thread the notifier would have posted for the comment """
+        content, thread_context = (comment['content'], comment.get('thread_context')) \
+            if isinstance(comment, dict) else (comment, None)
+        marker_key = self.notifier.marker_key(key)
+        value = {'id': thread_id, 'status': status,
+                 'comments': [{'id': 1, 'content': with_marker(content, marker_key,
+                                                               self.notifier.digest(content, thread_context))}]}
+        if thread_context:
+            value['threadContext'] = thread_context
+        return value
+
+    def plan(self, threads, comments):
+        return [(name, key) for name, key, _ in self.notifier.plan(CommentThreadIndex(threads), comments)]
+
+    def test_creates_missing_and_skips_unchanged_comments(self):
+        threads = [self.posted(1, 'same', 'text')]
+        self.assertEqual(self.plan(threads, {'same': 'text', 'new': 'text'}),
+                         [(DiffAwareCommentNotifier.CREATE, 'new')])
+
+    def test_updates_changed_comments(self):
+        operations = self.notifier.plan(CommentThreadIndex([self.posted(1, 'k', 'old')]), {'k': 'new'})
+        self.assertEqual(len(operations), 1)
+        name, _, (thread_id, comment_id, content) = operations[0]
+        self.assertEqual((name, thread_id, comment_id), (DiffAwareCommentNotifier.UPDATE, 1, 1))
+        self.assertEqual(strip_marker(content), 'new')
+
+    def test_moved_comment_resolves_the_old_thread_and_creates_a_new_one(self):
+        before = {'content': 'c', 'thread_context': {'filePath': '/a.py', 'rightFileStart': {'line': 1}}}
+        after = {'content': 'c', 'thread_context': {'filePath': '/a.py', 'rightFileStart': {'line': 5}}}
+        self.assertEqual(self.plan([self.posted(1, 'k', before)], {'k': after}),
+                         [(DiffAwareCommentNotifier.SET_STATUS, 'k'), (DiffAwareCommentNotifier.CREATE, 'k')])
+
+    def test_reactivates_only_the_threads_it_resolved(self):
+        self.assertEqual(self.plan([self.posted(1, 'k', 'c', status='fixed')], {'k': 'c'}),
+                         [(DiffAwareCommentNotifier.SET_STATUS, 'k')])
+        for status in ['wontFix', 'byDesign', 'closed']:
+            self.assertEqual(self.plan([self.posted(1, 'k', 'c', status=status)], {'k': 'c'}), [])
+
+    def test_resolves_only_its_own_comments_that_are_no_longer_desired(self):
+        other = Notifier('n.b')
+        threads = [self.posted(1, 'gone', 'c'),
+                   dict(self.posted(2, 'gone', 'c'), status='fixed'),
+                   {'id': 3, 'status': 'active',
+                    'comments': [{'id': 1, 'content': with_marker('c', other.marker_key('gone'))}]}]
+        operations = self.notifier.plan(CommentThreadIndex(threads), {})
+        self.assertEqual([(name, args) for name, _, args in operations],
+                         [(DiffAwareCommentNotifier.SET_STATUS, [1, DiffAwareCommentNotifier.RESOLVED])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+from components.utils.comment_threads import CommentThreadIndex
+from core.utils.comment_marker import with_marker, parse_marker, strip_marker
+
+
+def thread(thread_id, content, status='active', file_path=None, line=None, author='a@x.com'):
+    value = {'id': thread_id, 'status': status,
+             'comments': [{'id': 1, 'content': content, 'author': {'uniqueName': author}}]}
+    if file_path is not None:
+        value['threadContext'] = {'filePath': file_path, 'rightFileStart': {'line': line, 'offset': 1},
+                                  'rightFileEnd': {'line': line + 2, 'offset': 1}}
+    return value
+
+
+class CommentMarkerTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        content = with_marker('Hello', 'n/k', 'abc123')
+        self.assertEqual(parse_marker(content), ('n/k', 'abc123'))
+        self.assertEqual(strip_marker(content), 'Hello')
+        self.assertEqual(parse_marker(with_marker(content, 'n/k')), ('n/k', None))
+        self.assertIsNone(parse_marker('no marker'))
+
+
+class CommentThreadIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CommentThreadIndex({'value': [
+            thread(1, 'plain', file_path='src/a.py', line=10),
+            thread(2, with_marker('x', 'n/k'), status='fixed', author='b@x.com'),
+            thread(3, 'deleted', status='active'),
+        ]})
+        self.index.upsert(dict(thread(3, 'deleted'), isDeleted=True))
+
+    def test_lookups(self):
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual([t['id'] for t in self.index.by_file('/src/a.py', line=11)], [1])
+        self.assertEqual(self.index.by_file('/src/a.py', line=20), [])
+        self.assertEqual([t['id'] for t in self.index.unresolved()], [1])
+        self.assertEqual([t['id'] for t in self.index.by_author('B@X.com')], [2])
+        self.assertEqual(self.index.by_marker('n/k')['id'], 2)
+        self.assertEqual(self.index.markers(), ['n/k'])
+
+    def test_upserts_keep_the_indexes_in_sync(self):
+        self.index.upsert(thread(1, 'plain', status='fixed', file_path='/src/b.py', line=1))
+        self.assertEqual(self.index.by_file('/src/a.py'), [])
+        self.assertEqual([t['id'] for t in self.index.by_status('fixed')], [1, 2])
+
+        self.index.upsert_comment(1, {'id': 2, 'content': with_marker('reply', 'n/other')})
+        self.assertEqual(self.index.by_marker('n/other')['id'], 1)
+        self.index.upsert_comment(1, {'id': 2, 'isDeleted': True})
+        self.assertIsNone(self.index.by_marker('n/other'))
+
+
+if __name__ == '__main__':
+    unittest.main()
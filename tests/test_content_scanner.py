@@ -0,0 +1,101 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import mmap
+import tempfile
+import unittest
+from unittest import mock
+
+from components.utils import content_scanner
+from components.utils.content_scanner import ContentMatches, ContentScanner, compile_scanner, literal, \
+    scan_pull_request, scoped, validate_rules
+
+
+class FakeEntity:
+
+    def __init__(self, files, deleted=()):
+        self.files = files
+        self.deleted = list(deleted)
+        self.fetched = []
+
+    def metadata(self):
+        return {'description': 'Fixes a TODO'}
+
+    def get_commits(self):
+        return [{'commitId': 'c1', 'comment': 'fixme later'}]
+
+    def deleted_files(self):
+        return self.deleted
+
+    def fetch_files_from_pr(self, file_paths):
+        self.fetched.append(list(file_paths))
+        return {path: self.files[path] for path in file_paths}
+
+
+class ContentScannerTest(unittest.TestCase):
+
+    def test_reports_every_match_of_every_rule_with_its_position(self):
+        scanner = ContentScanner({'todo': ['(?i:todo)'], 'key': [literal('Key=')]})
+        matches = scanner.scan('f', 'a todo and TODO\r\nKey=1 todo\nnothing')
+        self.assertEqual([(m.rule, m.line, m.column, m.text) for m in matches],
+                         [('todo', 1, 2, 'todo'), ('todo', 1, 11, 'TODO'),
+                          ('todo', 2, 6, 'todo'), ('key', 2, 0, 'Key=')])
+
+    def test_scans_bytes_and_mmaps(self):
+        scanner = ContentScanner({'todo': ['todo']})
+        self.assertEqual([m.line for m in scanner.scan('f', b'x\ntodo\n')], [2])
+        with tempfile.TemporaryFile() as f:
+            f.write(b'one\ntwo todo\n')
+            f.flush()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                self.assertEqual([m.line for m in scanner.scan('f', content)], [2])
+
+    def test_no_rules(self):
+        self.assertEqual(ContentScanner({}).scan('f', 'todo'), [])
+
+    def test_same_rules_are_compiled_once(self):
+        self.assertIs(compile_scanner({'a': ['x']}), compile_scanner({'a': ['x']}))
+
+    def test_validate_rules(self):
+        self.assertEqual(validate_rules({'a': ['x', literal('(')]}), [])
+        self.assertEqual(len(validate_rules({'a': ['(x'], 'b': ['(?P<n>x)'], 'c': [r'(x)\1'], 'd/e': ['x'],
+                                             'f': 'x'})), 5)
+
+    def test_validate_rules_rejects_global_flags(self):
+        errors = validate_rules({'todo': ['(?i)todo'], 'spaced': ['a(?x) b']})
+        self.assertEqual(len(errors), 2)
+        self.assertIn('global flags', errors[0])
+
+        rules = {'todo': ['(?i:todo)', literal('(?i)'), 'x(?s:.)']}
+        self.assertEqual(validate_rules(rules), [])
+        self.assertEqual([m.text for m in ContentScanner(rules).scan('f', 'TODO (?i) xy')], ['TODO', '(?i)', 'xy'])
+
+    def test_least_recently_used_scanners_are_dropped(self):
+        with mock.patch.object(content_scanner, 'max_compiled_scanners', 2):
+            first = compile_scanner({'lru': ['1']})
+            second = compile_scanner({'lru': ['2']})
+            self.assertIs(compile_scanner({'lru': ['1']}), first)
+            compile_scanner({'lru': ['3']})
+            self.assertIs(compile_scanner({'lru': ['1']}), first)
+            self.assertIsNot(compile_scanner({'lru': ['2']}), second)
+
+    def test_scoped_matches(self):
+        rules = dict(scoped('T1', {'todo': ['todo']}), **scoped('T2', {'todo': ['fixme']}))
+        scanner = compile_scanner(rules)
+        matches = ContentMatches(scanner.rules, scanner.scan('f', 'todo fixme'))
+        self.assertEqual([m.text for m in matches.scoped('T1').matches('todo')], ['todo'])
+        self.assertEqual([m.text for m in matches.scoped('T2').matches('todo')], ['fixme'])
+        self.assertEqual(matches.scoped('T3').matched_rules(), [])
+
+    def test_scan_pull_request_scans_every_source_once_and_skips_deleted_files(self):
+        entity = FakeEntity({'/a.py': b'# todo', '/b.py': 'clean'}, deleted=['/gone.py'])
+        scanner = compile_scanner({'todo': ['(?i:todo|fixme)']})
+        scanned = {}
+        matches = scan_pull_request(entity, scanner, scanned, ['/a.py', '/b.py', '/gone.py'])
+        self.assertEqual(matches.sources('todo'), ['description', 'commit:c1', '/a.py'])
+        scan_pull_request(entity, scanner, scanned, ['/a.py'])
+        self.assertEqual(entity.fetched, [['/a.py', '/b.py']])
+
+
+if __name__ == '__main__':
+    unittest.main()
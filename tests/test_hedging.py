@@ -0,0 +1,92 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+import unittest
+
+from core.api.hedging import HedgingPolicy
+
+
+class FakeResponse:
+
+    def __init__(self, sender):
+        self.sender = sender
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+class SlowPrimary:
+    """ Call whose first invocation responds after the given seconds, the later ones (hedges) right away """
+
+    def __init__(self, seconds=0.2, primary_error=None, hedge_error=None):
+        self.seconds = seconds
+        self.primary_error = primary_error
+        self.hedge_error = hedge_error
+        self.responses = []
+        self.__lock = threading.Lock()
+
+    def __call__(self):
+        with self.__lock:
+            primary = not self.responses
+            self.responses.append(FakeResponse('primary' if primary else 'hedge'))
+            resp = self.responses[-1]
+        if primary:
+            time.sleep(self.seconds)
+        error = self.primary_error if primary else self.hedge_error
+        if error is not None:
+            raise error
+        return resp
+
+
+class HedgingPolicyTest(unittest.TestCase):
+
+    def policy(self, warmup=2, **kwargs):
+        policy = HedgingPolicy(enabled=True, min_samples=2, **kwargs)
+        for _ in range(warmup):
+            policy.execute('git', lambda: FakeResponse('warmup'))
+        return policy
+
+    def test_slow_call_is_hedged_and_the_losing_response_closed(self):
+        policy = self.policy(budget=1)
+        call = SlowPrimary()
+        self.assertEqual(policy.execute('git', call).sender, 'hedge')
+        self.assertTrue(call.responses[0].closed.wait(5))
+        self.assertEqual(policy.metrics()['git'], {'requests': 3, 'hedged': 1, 'hedge_wins': 1,
+                                                   'hedge_rate': 0.3333, 'win_rate': 1.0})
+
+    def test_hedges_are_limited_to_the_budget_share_of_the_calls(self):
+        policy = self.policy(budget=0.25, percentile=0.5, warmup=10)
+        senders = [policy.execute('git', SlowPrimary(seconds=0.05)).sender for _ in range(6)]
+        # 11 to 13 calls allow up to 3 hedges, 14 and 15 calls still 3 and 16 calls 4
+        self.assertEqual(senders, ['hedge', 'hedge', 'hedge', 'primary', 'primary', 'hedge'])
+        self.assertEqual(policy.metrics()['git']['hedged'], 4)
+
+    def test_calls_are_not_hedged_until_min_samples_are_seen(self):
+        policy = HedgingPolicy(enabled=True, min_samples=2, budget=1)
+        self.assertIsNone(policy.delay('git'))
+        self.assertEqual(policy.execute('git', SlowPrimary(seconds=0.01)).sender, 'primary')
+        self.assertEqual(policy.metrics()['git']['hedged'], 0)
+
+    def test_only_the_enabled_families_are_hedged(self):
+        policy = self.policy(budget=1, families=['wit'])
+        self.assertEqual(policy.execute('git', SlowPrimary(seconds=0.05)).sender, 'primary')
+        policy.enabled = False
+        policy.families = None
+        self.assertEqual(policy.execute('git', SlowPrimary(seconds=0.05)).sender, 'primary')
+
+    def test_first_successful_response_wins(self):
+        policy = self.policy(budget=1)
+        call = SlowPrimary(seconds=0.05, hedge_error=ValueError('hedge'))
+        self.assertEqual(policy.execute('git', call).sender, 'primary')
+        self.assertEqual(policy.metrics()['git']['hedge_wins'], 0)
+
+        with self.assertRaises(ValueError):
+            policy.execute('git', SlowPrimary(seconds=0.05, primary_error=ValueError('primary'),
+                                              hedge_error=ValueError('hedge')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from api_client.local.local_identity_api_client import LocalIdentityClient
+from components.utils import identity_resolver
+from components.utils.identity_resolver import IdentityResolver
+from core.api.api_config_constants import APIConfigConstants
+
+ANN = {'id': 'u1', 'uniqueName': 'ann@contoso.com', 'displayName': 'Ann', 'mail': 'ann@contoso.com'}
+BOB = {'id': 'u2', 'uniqueName': 'bob@contoso.com', 'displayName': 'Bob', 'mail': 'bob@contoso.com'}
+
+
+class CountingClient(LocalIdentityClient):
+
+    def __init__(self, identities):
+        super().__init__(identities)
+        self.calls = []
+
+    def resolve(self, entity, aliases):
+        self.calls.append(list(aliases))
+        return super().resolve(entity, aliases)
+
+
+class FakeEntity:
+
+    def __init__(self, client):
+        self.api_client_mapper = {APIConfigConstants.IDENTITY_API_CLIENT: client}
+
+
+class IdentityResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.dir, 'identities')
+        self.client = CountingClient([ANN, BOB])
+        self.entity = FakeEntity(self.client)
+        self.now = 1000.0
+        patcher = mock.patch.object(identity_resolver.time, 'time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def resolver(self, **kwargs):
+        return IdentityResolver(self.cache_path, ttl=100, negative_ttl=10, **kwargs)
+
+    def test_resolves_the_pending_aliases_in_one_client_call(self):
+        resolver = self.resolver()
+        resolved = resolver.resolve(self.entity, ['ann@contoso.com', 'Bob', 'nobody', 'Bob'])
+        self.assertEqual(resolved, {'ann@contoso.com': ANN, 'Bob': BOB, 'nobody': None})
+        self.assertEqual(self.client.calls, [['ann@contoso.com', 'Bob', 'nobody']])
+
+        # any key of a resolved identity is served from memory, and the miss from the disk cache
+        self.assertEqual(resolver.resolve(self.entity, ['u1', 'ANN', 'nobody']),
+                         {'u1': ANN, 'ANN': ANN, 'nobody': None})
+        self.assertEqual(len(self.client.calls), 1)
+
+    def test_disk_cache_is_shared_by_the_resolvers(self):
+        self.resolver().resolve(self.entity, ['ann@contoso.com'])
+        self.assertEqual(self.resolver().resolve(self.entity, ['u1']), {'u1': ANN})
+        self.assertEqual(len(self.client.calls), 1)
+
+    def test_negative_entries_expire_after_negative_ttl(self):
+        resolver = self.resolver()
+        resolver.resolve(self.entity, ['nobody'])
+        self.now += 9
+        resolver.resolve(self.entity, ['nobody'])
+        self.assertEqual(len(self.client.calls), 1)
+        self.now += 2
+        resolver.resolve(self.entity, ['nobody'])
+        self.assertEqual(len(self.client.calls), 2)
+
+    def test_identities_expire_after_ttl_in_memory_and_on_disk(self):
+        resolver = self.resolver()
+        resolver.resolve(self.entity, ['ann@contoso.com'])
+        self.now += 99
+        resolver.resolve(self.entity, ['ann@contoso.com'])
+        self.assertEqual(len(self.client.calls), 1)
+        self.now += 2
+        resolver.resolve(self.entity, ['ann@contoso.com'])
+        self.assertEqual(len(self.client.calls), 2)
+
+    def test_added_identities_never_expire(self):
+        resolver = self.resolver()
+        resolver.add_identities([ANN])
+        self.now += 10 ** 6
+        self.assertEqual(resolver.resolve(self.entity, ['Ann']), {'Ann': ANN})
+        self.assertEqual(self.client.calls, [])
+
+    def test_misses_of_a_local_client_are_not_cached(self):
+        source = os.path.join(self.dir, 'identities.json')
+        with open(source, 'w', encoding='utf-8') as f:
+            json.dump([ANN], f)
+        resolver = self.resolver().configure({'client': 'local', 'source': source})
+        self.assertEqual(resolver.resolve(self.entity, ['u1', 'bob@contoso.com']), {'u1': ANN, 'bob@contoso.com': None})
+
+        resolver.configure({})
+        self.assertEqual(resolver.resolve(self.entity, ['bob@contoso.com']), {'bob@contoso.com': BOB})
+        self.assertEqual(self.client.calls, [['bob@contoso.com']])
+
+
+if __name__ == '__main__':
+    unittest.main()
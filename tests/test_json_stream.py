@@ -0,0 +1,49 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+from core.utils.json_stream import JsonArrayStream
+
+
+def parse(document, path, chunk_size=3):
+    """ Feeds the document to a JsonArrayStream in chunks and returns the elements it yields """
+    stream = JsonArrayStream(path)
+    data = document.encode('utf-8')
+    elements = []
+    for start in range(0, len(data), chunk_size):
+        elements.extend(stream.feed(data[start:start + chunk_size]))
+    stream.close()
+    return elements
+
+
+class JsonArrayStreamTest(unittest.TestCase):
+
+    def test_yields_the_elements_of_the_array_at_the_path(self):
+        document = '{"count": 2, "value": [{"id": 1, "tags": ["a", "b"]}, {"id": 2, "text": "x, ] }"}]}'
+        self.assertEqual(parse(document, ['value']), [{'id': 1, 'tags': ['a', 'b']}, {'id': 2, 'text': 'x, ] }'}])
+
+    def test_keeps_null_elements(self):
+        self.assertEqual(parse('{"value": [1, null, {"a": null}, null]}', ['value']), [1, None, {'a': None}, None])
+
+    def test_empty_array(self):
+        self.assertEqual(parse('{"value": []}', ['value']), [])
+
+    def test_nested_path(self):
+        document = '{"value": [9], "data": {"value": ["x", "y"]}}'
+        self.assertEqual(parse(document, ['data', 'value']), ['x', 'y'])
+
+    def test_multi_byte_characters_split_across_chunks(self):
+        self.assertEqual(parse('{"value": ["héllo", "✓"]}', ['value'], chunk_size=1), ['héllo', '✓'])
+
+    def test_missing_array_raises_on_close(self):
+        with self.assertRaises(ValueError):
+            parse('{"count": 0, "items": [1]}', ['value'])
+
+    def test_truncated_array_raises_on_close(self):
+        with self.assertRaises(ValueError):
+            parse('{"value": [1, 2', ['value'])
+
+
+if __name__ == '__main__':
+    unittest.main()
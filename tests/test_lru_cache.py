@@ -0,0 +1,40 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+from core.utils.lru_cache import SizedLRUCache
+
+
+class SizedLRUCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.evicted = []
+        self.cache = SizedLRUCache(10, on_evict=lambda key, value: self.evicted.append(key))
+
+    def test_evicts_the_least_recently_used_values_over_the_size(self):
+        self.cache.put('a', 'A', 4)
+        self.cache.put('b', 'B', 4)
+        self.cache.get('a')
+        self.cache.put('c', 'C', 4)
+        self.assertEqual([key for key, _ in self.cache.items()], ['a', 'c'])
+        self.assertEqual((self.cache.size, self.evicted), (8, ['b']))
+
+    def test_values_larger_than_the_cache_are_not_cached(self):
+        self.cache.put('a', 'A', 11)
+        self.assertNotIn('a', self.cache)
+        self.assertEqual((self.cache.size, self.evicted), (0, []))
+
+    def test_replaced_and_removed_values_are_evicted(self):
+        value = ['A']
+        self.cache.put('a', value, 2)
+        self.cache.put('a', value, 3)
+        self.assertEqual(self.evicted, [])
+        self.cache.put('a', ['other'], 3)
+        self.cache.remove('a')
+        self.cache.remove('a')
+        self.assertEqual((self.cache.size, self.evicted), (0, ['a', 'a']))
+
+
+if __name__ == '__main__':
+    unittest.main()
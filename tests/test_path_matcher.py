@@ -0,0 +1,74 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import re
+import unittest
+from unittest import mock
+
+from components.utils import path_matcher
+from components.utils.path_matcher import CompiledRules, compile_rules, glob_to_regex, rule_set_key
+
+
+class GlobToRegexTest(unittest.TestCase):
+
+    def assertGlob(self, glob, matching, not_matching):
+        regex = re.compile(glob_to_regex(glob) + r'\Z')
+        for path in matching:
+            self.assertTrue(regex.match(path), '{} should match {}'.format(glob, path))
+        for path in not_matching:
+            self.assertFalse(regex.match(path), '{} should not match {}'.format(glob, path))
+
+    def test_globs(self):
+        self.assertGlob('src/*.py', ['src/a.py'], ['src/a/b.py', 'src/a.pyc'])
+        self.assertGlob('**/*.css', ['a.css', 'x/y/a.css'], ['a.cssx'])
+        self.assertGlob('src/**', ['src/a', 'src/a/b'], ['lib/a'])
+        self.assertGlob('a?.txt', ['ab.txt'], ['a/.txt', 'abc.txt'])
+        self.assertGlob('[ab].txt', ['a.txt', 'b.txt'], ['c.txt'])
+        self.assertGlob('[!ab].txt', ['c.txt'], ['a.txt'])
+
+
+class CompiledRulesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = CompiledRules({
+            'ui': ['/src/ui', '**/*.css'],
+            'build': ['/build/*.yml', '/pipelines/'],
+            'root': ['/'],
+        })
+
+    def test_prefix_patterns_match_the_path_and_everything_under_it(self):
+        self.assertEqual(self.rules.rules_of('/src/ui'), ['root', 'ui'])
+        self.assertEqual(self.rules.rules_of('/src/ui/app/main.ts'), ['root', 'ui'])
+        self.assertEqual(self.rules.rules_of('/src/uikit/main.ts'), ['root'])
+        self.assertEqual(self.rules.rules_of('/pipelines/ci.yml'), ['root', 'build'])
+
+    def test_glob_patterns(self):
+        self.assertEqual(self.rules.rules_of('/build/ci.yml'), ['root', 'build'])
+        self.assertEqual(self.rules.rules_of('/build/x/ci.yml'), ['root'])
+        self.assertEqual(self.rules.rules_of('/src/ui/a.css'), ['root', 'ui'])
+
+    def test_match(self):
+        matches = self.rules.match(['/src/ui/a.ts', '/build/ci.yml', '/docs/readme.md'])
+        self.assertEqual(matches.files('ui'), ['/src/ui/a.ts'])
+        self.assertEqual(matches.rules('/build/ci.yml'), ['root', 'build'])
+        self.assertEqual(matches.matched_rules(), ['ui', 'build', 'root'])
+        self.assertEqual(matches.files('unknown'), [])
+
+
+class CompileRulesTest(unittest.TestCase):
+
+    def test_compiled_rule_sets_are_reused_and_bounded(self):
+        with mock.patch.object(path_matcher, 'max_compiled_rules', 2):
+            first = compile_rules({'a': ['/x']})
+            self.assertIs(compile_rules({'a': ['/x']}), first)
+            second = compile_rules({'b': ['/y']})
+            compile_rules({'a': ['/x']})
+            compile_rules({'c': ['/z']})
+            # the least recently used rule set is dropped
+            self.assertIs(compile_rules({'a': ['/x']}), first)
+            self.assertIsNot(compile_rules({'b': ['/y']}), second)
+            self.assertEqual(first.key, rule_set_key({'a': ['/x']}))
+
+
+if __name__ == '__main__':
+    unittest.main()
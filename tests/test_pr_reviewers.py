@@ -0,0 +1,87 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import threading
+import unittest
+from unittest import mock
+
+from api_client.ado import ado_pr_api_client
+from api_client.ado.ado_pr_api_client import AdoPullRequestClient
+from api_client.exceptions import FailedToAddReviewerError
+
+
+class FakeEntity:
+
+    def __init__(self):
+        self.org = 'org'
+        self.project = 'project'
+        self.pr_num = 7
+        self.pat = 'pat'
+        self.ado_version = '7.0'
+
+    def repo(self):
+        return 'repo'
+
+
+class FakeReviewersApi:
+    """ Records the reviewer calls; the bulk POST fails if post_fails and PUTs fail for the reviewers in failing """
+
+    def __init__(self, post_fails=False, failing=()):
+        self.post_fails = post_fails
+        self.failing = set(failing)
+        self.posts = []
+        self.puts = []
+        self.lock = threading.Lock()
+
+    def post(self, url, pat, params=None, payload=None):
+        self.posts.append(json.loads(payload))
+        if self.post_fails:
+            raise Exception('bulk add failed')
+        return {}
+
+    def put(self, url, pat, params=None, payload=None):
+        reviewer = url.split('/')[-1]
+        with self.lock:
+            self.puts.append((reviewer, json.loads(payload)))
+        if reviewer in self.failing:
+            raise Exception('add failed')
+        return {}
+
+
+class AddReviewersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.entity = FakeEntity()
+        self.client = AdoPullRequestClient()
+
+    def add_reviewers(self, api, reviewers, **kwargs):
+        with mock.patch.object(ado_pr_api_client, 'post', api.post), \
+                mock.patch.object(ado_pr_api_client, 'put', api.put):
+            return self.client.add_reviewers(self.entity, reviewers, **kwargs)
+
+    def test_adds_all_reviewers_with_a_single_post(self):
+        api = FakeReviewersApi()
+        result = self.add_reviewers(api, ['a', 'b', 'a'], vote=10, is_required=False)
+        self.assertEqual(result, {'a': None, 'b': None})
+        self.assertEqual(api.posts, [[{'id': 'a', 'vote': 10, 'isRequired': False},
+                                      {'id': 'b', 'vote': 10, 'isRequired': False}]])
+        self.assertEqual(api.puts, [])
+
+    def test_no_reviewers_makes_no_calls(self):
+        api = FakeReviewersApi()
+        self.assertEqual(self.add_reviewers(api, []), {})
+        self.assertEqual(api.posts, [])
+
+    def test_falls_back_to_one_put_per_reviewer(self):
+        api = FakeReviewersApi(post_fails=True)
+        result = self.add_reviewers(api, ['a', 'b', 'c'])
+        self.assertEqual(result, {'a': None, 'b': None, 'c': None})
+        self.assertEqual(sorted(reviewer for reviewer, _ in api.puts), ['a', 'b', 'c'])
+        self.assertTrue(all(body == {'vote': 0, 'isRequired': True} for _, body in api.puts))
+
+    def test_fallback_reports_the_reviewers_that_failed(self):
+        api = FakeReviewersApi(post_fails=True, failing=['b'])
+        result = self.add_reviewers(api, ['a', 'b'])
+        self.assertIsNone(result['a'])
+        self.assertIsInstance(result['b'], FailedToAddReviewerError)
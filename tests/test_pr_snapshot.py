@@ -0,0 +1,81 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import pickle
+import unittest
+
+from components.pr_snapshot import PullRequestSnapshot
+from core.exceptions import SnapshotDataMissingError
+from core.utils.shared_content import SharedContentStore
+
+
+class SharedContentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SharedContentStore()
+        self.addCleanup(self.store.close)
+
+    def test_content_is_copied_in_chunks_and_read_like_bytes(self):
+        self.store.copy_chunk_size = 4
+        content = self.store.share('a.txt', b'hello shared world')
+        self.assertEqual(len(content), 18)
+        self.assertEqual(content[:], b'hello shared world')
+        self.assertEqual(content[6:12], b'shared')
+        self.assertEqual(content[0], ord('h'))
+        self.assertEqual(content.find(b'world'), 13)
+        self.assertEqual(content.find(b'world', 0, 10), -1)
+        content.close()
+
+    def test_pickled_content_attaches_to_the_same_block(self):
+        content = self.store.share('a.txt', b'abc')
+        copy = pickle.loads(pickle.dumps(content))
+        self.assertEqual(copy[:], b'abc')
+        self.assertEqual(self.store.share('a.txt', b'ignored').name, content.name)
+        copy.close()
+
+    def test_empty_content(self):
+        content = self.store.share('empty', b'')
+        self.assertEqual(len(content), 0)
+        self.assertEqual(content[:], b'')
+        content.close()
+
+
+class PullRequestSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SharedContentStore()
+        self.addCleanup(self.store.close)
+        metadata = {'title': 'Fix', 'createdBy': {'displayName': 'Dev', 'uniqueName': 'dev@example.com'},
+                    'repository': {'name': 'repo', 'id': 'r1'}, 'description': 'Cherry-picked from commit 1',
+                    'reviewers': [{'uniqueName': 'lead@example.com', 'vote': 10, 'votedFor': None}]}
+        self.snapshot = PullRequestSnapshot(7, 'org', 'project', '7.0', {
+            'metadata': metadata,
+            'changed_files': ['/a.json', '/b.py'],
+            'changed_lines': {'/a.json': [[1, 2]]},
+            'files': {'/a.json': self.store.share('/a.json', b'\xef\xbb\xbf{"key": 1}')},
+        })
+
+    def test_reads_the_fetched_data(self):
+        self.assertEqual(self.snapshot.author_alias(), 'dev@example.com')
+        self.assertEqual(self.snapshot.repo(), 'repo')
+        self.assertTrue(self.snapshot.is_cherry_pick())
+        self.assertTrue(self.snapshot.is_approved_by(['lead@example.com']))
+        self.assertEqual(self.snapshot.pr_link(), 'https://org.visualstudio.com/project/_git/repo/pullrequest/7')
+
+    def test_data_not_fetched_raises(self):
+        with self.assertRaises(SnapshotDataMissingError):
+            self.snapshot.get_commits()
+        with self.assertRaises(SnapshotDataMissingError):
+            self.snapshot.changed_lines()
+        with self.assertRaises(SnapshotDataMissingError):
+            self.snapshot.fetch_files_from_pr(['/b.py'])
+
+    def test_pickled_snapshot_reads_the_shared_files(self):
+        copy = pickle.loads(pickle.dumps(self.snapshot))
+        self.assertEqual(copy.fetch_file_from_pr('/a.json'), {'key': 1})
+        self.assertEqual(copy.changed_lines(['/a.json']), {'/a.json': [[1, 2]]})
+        copy.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
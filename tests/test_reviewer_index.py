@@ -0,0 +1,57 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+
+from components.utils.reviewer_index import ReviewerIndex
+
+
+def reviewer(reviewer_id, unique_name, display_name, vote=0, voted_for=None, is_container=False):
+    return {'id': reviewer_id, 'uniqueName': unique_name, 'displayName': display_name, 'vote': vote,
+            'votedFor': voted_for, 'isContainer': is_container}
+
+
+class ReviewerIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.group = reviewer('g1', 'vstfs:///Classic/team', '[Project]\\Team', vote=10, is_container=True)
+        self.index = ReviewerIndex([
+            reviewer('u1', 'joann@contoso.com', 'JoAnn Smith', vote=10, voted_for=[{'id': 'g1'}]),
+            reviewer('u2', 'bob@contoso.com', 'Bob', vote=-10),
+            reviewer('u3', 'eve@contoso.com', 'Eve', vote=5),
+            self.group,
+        ])
+
+    def test_lookups_by_id_unique_name_and_display_name_ignore_case(self):
+        for identity in ['u1', 'JOANN@contoso.com', 'joann smith']:
+            self.assertEqual(self.index.vote(identity), 10)
+        self.assertIsNone(self.index.get(None))
+        self.assertEqual(len(self.index), 4)
+
+    def test_only_exact_identities_match(self):
+        # these matched before, as substrings of the json of the reviewers
+        for identity in ['ann@contoso.com', 'joann', 'Smith', 'contoso.com', 'u']:
+            self.assertFalse(self.index.contains(identity), identity)
+            self.assertFalse(self.index.has_voted(identity), identity)
+
+    def test_votes(self):
+        self.assertEqual(self.index.voted(['u1', 'bob@contoso.com', 'Eve', 'unknown']), ['u1', 'Eve'])
+        self.assertTrue(self.index.has_voted('bob', [ReviewerIndex.REJECTED]))
+        self.assertEqual([r['id'] for r in self.index.approvers()], ['u1', 'u3', 'g1'])
+
+    def test_groups_and_their_voters(self):
+        self.assertTrue(self.index.is_group('[project]\\team'))
+        self.assertFalse(self.index.is_group('u1'))
+        self.assertEqual([r['id'] for r in self.index.voted_for('g1')], ['u1'])
+        self.assertEqual(self.index.voted_for('u2'), [])
+        self.assertEqual(self.index.voted_for('unknown'), [])
+
+    def test_null_and_missing_fields(self):
+        index = ReviewerIndex([{'id': 'u1', 'votedFor': None}, {'uniqueName': 'a@b.com'}, {}])
+        self.assertTrue(index.contains('a@b.com'))
+        self.assertEqual(index.voted_for('u1'), [])
+        self.assertEqual(len(ReviewerIndex(None)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
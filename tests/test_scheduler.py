@@ -0,0 +1,187 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+from api_client.ado.ado_pr_api_client import AdoPullRequestClient
+from core.api import caller, scheduler as scheduler_module
+from core.api.scheduler import AdaptiveRateLimiter, TenantScheduler, tenant_of
+
+
+class FakeResponse:
+
+    def __init__(self, url, body=None, status_code=200):
+        self.status_code = status_code
+        self.headers = {}
+        self.reason = 'OK'
+        self.request = mock.Mock(url=url)
+        self.content = json.dumps(body or {}).encode('utf-8')
+        self.closed = False
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """ Records the requests sent and answers them with the responses built by respond(url) """
+
+    def __init__(self, respond=None):
+        self.respond = respond or (lambda url: {})
+        self.sent = []
+
+    def request(self, method, url, **kwargs):
+        self.sent.append(url)
+        return FakeResponse(url, self.respond(url))
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TenantOfTest(unittest.TestCase):
+
+    def test_org_of_the_endpoints(self):
+        self.assertEqual(tenant_of('https://dev.azure.com/MyOrg/project/_apis/git'), 'myorg')
+        self.assertEqual(tenant_of('https://vssps.dev.azure.com/myorg/_apis/identities'), 'myorg')
+        self.assertEqual(tenant_of('https://myorg.visualstudio.com/_apis/wit'), 'myorg')
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(scheduler_module, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_waits_for_a_token_once_the_burst_is_spent(self):
+        limiter = AdaptiveRateLimiter(rate=2)
+        self.assertEqual([limiter.acquire(), limiter.acquire()], [0, 0])
+        self.assertAlmostEqual(limiter.acquire(), 0.5)
+
+    def test_throttle_halves_the_rate_and_holds_back_for_retry_after(self):
+        limiter = AdaptiveRateLimiter(rate=10, min_rate=1)
+        limiter.on_throttle(retry_after=3)
+        self.assertEqual(limiter.rate, 5)
+        self.assertGreaterEqual(limiter.acquire(), 3)
+
+        for _ in range(5):
+            limiter.on_throttle()
+        self.assertEqual(limiter.rate, 1)
+
+    def test_success_grows_the_rate_up_to_max_rate(self):
+        limiter = AdaptiveRateLimiter(rate=2, max_rate=3)
+        limiter.on_success()
+        self.assertEqual(limiter.rate, 2.5)
+        for _ in range(10):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 3)
+
+
+class TenantSchedulerTest(unittest.TestCase):
+
+    def scheduler(self, **kwargs):
+        scheduler = TenantScheduler(rate=1000, max_rate=1000, **kwargs)
+        session = FakeSession()
+        for name in ['a', 'b', 'c']:
+            scheduler.tenant(name).session = lambda: session
+        return scheduler, session
+
+    @staticmethod
+    def url(org):
+        return 'https://dev.azure.com/{}/project/_apis/git'.format(org)
+
+    def wait_queued(self, scheduler, org, count):
+        deadline = time.monotonic() + 5
+        while len(scheduler.tenant(org).waiting) < count:
+            self.assertLess(time.monotonic(), deadline, 'requests were not queued')
+            time.sleep(0.001)
+
+    def test_freed_slots_are_granted_round_robin_across_the_orgs(self):
+        scheduler, session = self.scheduler(max_concurrency=1)
+        held = scheduler.request('GET', self.url('c'), stream=True)
+
+        threads = []
+        for org, queued in [('a', 1), ('a', 2), ('a', 3), ('b', 1)]:
+            threads.append(threading.Thread(target=scheduler.request, args=('GET', self.url(org))))
+            threads[-1].start()
+            self.wait_queued(scheduler, org, queued)
+
+        held.close()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual([tenant_of(url) for url in session.sent], ['c', 'a', 'b', 'a', 'a'])
+        self.assertEqual(scheduler.metrics()['a']['requests'], 3)
+
+    def test_streamed_request_holds_its_slot_until_closed(self):
+        scheduler, _ = self.scheduler(tenant_concurrency=1)
+        resp = scheduler.request('GET', self.url('a'), stream=True)
+        self.assertEqual(scheduler.tenant('a').in_flight, 1)
+        resp.close()
+        resp.close()
+        self.assertEqual(scheduler.tenant('a').in_flight, 0)
+
+
+class FakeEntity:
+    org = 'org'
+    project = 'project'
+    pat = 'pat'
+    pr_num = 7
+    ado_version = '7.0'
+
+    def repo(self):
+        return 'repo'
+
+
+class NestedStreamsTest(unittest.TestCase):
+    """ Reads of the changed files of PRs running together on all the slots of their org must not deadlock """
+
+    def test_changed_files_of_concurrent_prs(self):
+        both_streaming = threading.Barrier(2, timeout=5)
+
+        def respond(url):
+            if '/pullRequests/' in url:
+                both_streaming.wait()
+                return {'value': [{'commitId': 'c1'}, {'commitId': 'c2'}]}
+            commit_id = url.split('/commits/')[1].split('/')[0]
+            return {'changes': [{'item': {'gitObjectType': 'blob', 'path': '/{}.py'.format(commit_id)}}]}
+
+        scheduler = TenantScheduler(tenant_concurrency=2, rate=1000, max_rate=1000)
+        session = FakeSession(respond)
+        scheduler.tenant('org').session = lambda: session
+
+        results = []
+        with mock.patch.object(caller, 'scheduler', lambda: scheduler), \
+                mock.patch.object(caller, 'auth', lambda pat: None), \
+                mock.patch.object(caller, 'requote_uri', lambda endpoint: endpoint):
+            threads = [threading.Thread(target=lambda: results.append(
+                AdoPullRequestClient().changed_files_info(FakeEntity())), daemon=True) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads), 'changed_files_info deadlocked')
+        self.assertEqual([[change['item']['path'] for change in result] for result in results],
+                         [['/c1.py', '/c2.py']] * 2)
+        self.assertEqual(scheduler.tenant('org').in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
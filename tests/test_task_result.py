@@ -0,0 +1,53 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import pickle
+import unittest
+
+from core.exceptions import APICallFailedError
+from core.utils.constants import Constants
+from core.utils.task_result import TaskResult, with_callback_results, with_status
+
+
+class TaskResultTest(unittest.TestCase):
+
+    def test_reads_like_a_dict(self):
+        result = TaskResult('task', Constants.SUCCESS, message='ok')
+        self.assertEqual(result['status'], Constants.SUCCESS)
+        self.assertEqual(result.get('message'), 'ok')
+        self.assertEqual(result['exception'], '')
+        self.assertNotIn('callback_results', result)
+        self.assertEqual(set(dict(result)), set(TaskResult.fields) - {'callback_results'})
+        with self.assertRaises(KeyError):
+            _ = result['missing']
+
+    def test_is_immutable(self):
+        result = TaskResult('task', Constants.SUCCESS)
+        with self.assertRaises(AttributeError):
+            result.status = Constants.FAIL
+        changed = with_status(result, Constants.FAIL)
+        self.assertEqual((result['status'], changed['status']), (Constants.SUCCESS, Constants.FAIL))
+        self.assertEqual(with_callback_results(result, {'cb': 'done'})['callback_results'], {'cb': 'done'})
+
+    def test_error_is_derived_and_its_traceback_dropped(self):
+        try:
+            raise APICallFailedError('boom')
+        except APICallFailedError as e:
+            result = TaskResult('task', Constants.API_CALL_ERROR, error=e)
+        self.assertEqual(result['exception'], 'APICallFailedError')
+        self.assertEqual(result['error']['message'], 'boom')
+        self.assertIsNone(result.error_obj.__traceback__)
+
+    def test_serializes(self):
+        result = TaskResult('task', Constants.FAIL, overrides=['o'], message='m', callback_results={'cb': 1})
+        self.assertEqual(json.loads(result.to_json().decode('utf-8')), result.to_dict())
+        self.assertEqual(pickle.loads(pickle.dumps(result)).to_dict(), result.to_dict())
+
+    def test_dict_results_of_custom_tasks_are_updated(self):
+        result = {'name': 'task', 'status': Constants.SUCCESS}
+        self.assertEqual(with_status(result, Constants.FAIL)['status'], Constants.FAIL)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.utils.task_stats import TaskStats, TaskStatsStore
+
+
+class TaskStatsTest(unittest.TestCase):
+
+    def test_recent_runs_weigh_more(self):
+        stats = TaskStats(decay=0.5)
+        for seconds in [10, 10, 1, 1]:
+            stats.record(seconds, 2)
+        self.assertEqual(stats.p50(), 1)
+        self.assertEqual(stats.p95(), 10)
+        self.assertEqual(stats.api_calls(), 2)
+
+    def test_keeps_the_latest_max_samples(self):
+        stats = TaskStats(max_samples=3)
+        for seconds in range(5):
+            stats.record(seconds, 0)
+        self.assertEqual([sample[0] for sample in stats.samples], [2, 3, 4])
+        self.assertIsNone(TaskStats().p50())
+
+
+class TaskStatsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'task_stats.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def saved(self):
+        with open(self.path, encoding='utf-8') as f:
+            return {name: [sample[0] for sample in samples] for name, samples in json.load(f).items()}
+
+    def test_saves_the_recorded_runs(self):
+        store = TaskStatsStore(self.path)
+        store.record('policy', 2.0, 3)
+        store.save()
+        self.assertEqual(self.saved(), {'policy': [2.0]})
+        self.assertEqual(TaskStatsStore(self.path).expected_seconds('policy'), 2.0)
+
+    def test_runs_saved_by_the_other_workers_are_retained(self):
+        first, second = TaskStatsStore(self.path), TaskStatsStore(self.path)
+        first.get('policy')
+        second.get('policy')
+        first.record('policy', 1.0, 0)
+        first.record('action', 5.0, 0)
+        second.record('policy', 2.0, 0)
+        first.save()
+        second.save()
+        self.assertEqual(self.saved(), {'policy': [1.0, 2.0], 'action': [5.0]})
+        self.assertEqual(len(second.get('action').samples), 1)
+
+    def test_runs_are_saved_once(self):
+        store = TaskStatsStore(self.path)
+        store.record('policy', 1.0, 0)
+        store.save()
+        store.save()
+        store.record('policy', 2.0, 0)
+        store.save()
+        self.assertEqual(self.saved(), {'policy': [1.0, 2.0]})
+
+    def test_nothing_is_written_without_recorded_runs(self):
+        store = TaskStatsStore(self.path)
+        store.get('policy')
+        store.save()
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import threading
+import unittest
+from unittest import mock
+
+from api_client.ado import ado_work_item_api_client
+from api_client.ado.ado_work_item_api_client import AdoFieldValueObject, AdoWorkItemClient
+from api_client.exceptions import FailedToUpdateFieldsError
+
+
+class FakeEntity:
+    org = 'org'
+    project = 'project'
+    pat = 'pat'
+    ado_version = '7.0'
+
+
+class FakeResponse:
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeBatchApi:
+    """ Answers the $batch calls with the code given for each work item, 200 by default """
+
+    def __init__(self, codes=None, truncate=None, fails=False):
+        self.codes = codes or {}
+        self.truncate = truncate
+        self.fails = fails
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def post(self, endpoint, pat, params=None, payload=None):
+        batch = json.loads(payload)
+        with self.lock:
+            self.batches.append(batch)
+        if self.fails:
+            raise Exception('batch failed')
+        ids = [int(request['uri'].split('/')[-1].split('?')[0]) for request in batch]
+        value = [{'code': self.codes.get(wi, 200), 'body': '{}'} for wi in ids]
+        return FakeResponse({'value': value[:self.truncate]})
+
+
+def field_update(path, value):
+    field_value_obj = AdoFieldValueObject()
+    field_value_obj.update_field(path, value)
+    return field_value_obj
+
+
+class UpdateFieldsBulkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = AdoWorkItemClient()
+        self.entity = FakeEntity()
+
+    def update(self, api, updates):
+        with mock.patch.object(ado_work_item_api_client, 'post', api.post):
+            return self.client.update_fields_bulk(self.entity, updates)
+
+    def test_merges_the_updates_of_a_work_item_into_one_request(self):
+        api = FakeBatchApi()
+        results = self.update(api, [(1, field_update('/fields/A', 'a')), (2, field_update('/fields/A', 'b')),
+                                    (1, field_update('/fields/B', 'c'))])
+        self.assertEqual(results, {1: None, 2: None})
+        self.assertEqual(len(api.batches), 1)
+        requests = {request['uri'].split('?')[0]: request for request in api.batches[0]}
+        self.assertEqual([op['path'] for op in requests['/_apis/wit/workitems/1']['body']], ['/fields/A', '/fields/B'])
+        self.assertEqual(requests['/_apis/wit/workitems/1']['method'], 'PATCH')
+
+    def test_reports_the_outcome_of_each_work_item(self):
+        results = self.update(FakeBatchApi(codes={2: 412}), [(1, field_update('/fields/A', 'a')),
+                                                             (2, field_update('/fields/A', 'b'))])
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], FailedToUpdateFieldsError)
+
+    def test_work_items_without_a_response_are_failed(self):
+        results = self.update(FakeBatchApi(truncate=1), [(1, field_update('/fields/A', 'a')),
+                                                         (2, field_update('/fields/A', 'b'))])
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], FailedToUpdateFieldsError)
+
+    def test_failed_call_fails_all_its_work_items(self):
+        results = self.update(FakeBatchApi(fails=True), [(1, field_update('/fields/A', 'a')),
+                                                         (2, field_update('/fields/A', 'b'))])
+        self.assertTrue(all(isinstance(error, FailedToUpdateFieldsError) for error in results.values()))
+
+    def test_work_items_are_sent_batch_size_per_call(self):
+        self.client.batch_size = 2
+        api = FakeBatchApi()
+        results = self.update(api, [(wi, field_update('/fields/A', wi)) for wi in range(5)])
+        self.assertEqual(results, {wi: None for wi in range(5)})
+        self.assertEqual(sorted(len(batch) for batch in api.batches), [1, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+from unittest import mock
+
+from api_client.ado import ado_work_item_api_client
+from api_client.ado.ado_work_item_api_client import AdoFieldValueObject, AdoWorkItemClient
+
+
+class FakeEntity:
+
+    def __init__(self, pat='pat'):
+        self.org = 'org'
+        self.project = 'project'
+        self.pat = pat
+        self.ado_version = '7.0'
+
+
+class FakeWorkItemsApi:
+    """ Serves the work items by ids api with the requested fields of the work items and records the calls """
+
+    def __init__(self, work_items):
+        self.work_items = work_items
+        self.calls = []
+
+    def get(self, endpoint, pat, params=None):
+        self.calls.append(dict(params or {}))
+        fields = params['fields'].split(',') if params and 'fields' in params else None
+        value = []
+        for wi in params['ids'].split(','):
+            all_fields = self.work_items.get(int(wi))
+            if all_fields is None:
+                value.append(None)
+                continue
+            value.append({'id': int(wi), 'fields': {name: v for name, v in all_fields.items()
+                                                    if fields is None or name in fields}})
+        return {'value': value}
+
+
+class WorkItemProjectionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeWorkItemsApi({1: {'System.AreaPath': 'A', 'System.State': 'New', 'System.Title': 'T'},
+                                     2: {'System.AreaPath': 'B', 'System.State': 'Done', 'System.Title': 'U'}})
+        patcher = mock.patch.object(ado_work_item_api_client, 'get', self.api.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = AdoWorkItemClient()
+        self.entity = FakeEntity()
+
+    def test_fetches_only_the_requested_fields(self):
+        work_items = self.client.get_work_items(self.entity, [1, 2], fields=['System.AreaPath'])
+        self.assertEqual([wi['fields'] for wi in work_items], [{'System.AreaPath': 'A'}, {'System.AreaPath': 'B'}])
+        self.assertEqual(self.api.calls[0]['fields'], 'System.AreaPath')
+
+    def test_superset_fetch_serves_subset_requests(self):
+        self.client.get_work_items(self.entity, [1], fields=['System.AreaPath', 'System.State'])
+        self.client.get_work_items(self.entity, [1], fields=['System.State'])
+        self.client.get_work_item_by_id(self.entity, 1, fields=['System.AreaPath'])
+        self.assertEqual(len(self.api.calls), 1)
+
+    def test_wider_request_refetches_with_the_cached_fields(self):
+        self.client.get_work_items(self.entity, [1], fields=['System.AreaPath'])
+        work_item = self.client.get_work_items(self.entity, [1], fields=['System.State'])[0]
+        self.assertEqual(self.api.calls[1]['fields'], 'System.AreaPath,System.State')
+        self.assertEqual(work_item['fields'], {'System.AreaPath': 'A', 'System.State': 'New'})
+        self.client.get_work_items(self.entity, [1], fields=['System.AreaPath'])
+        self.assertEqual(len(self.api.calls), 2)
+
+    def test_full_fetch_serves_every_projection(self):
+        self.client.get_work_items(self.entity, [1, 2])
+        self.client.get_work_items(self.entity, [2, 1], fields=['System.Title'])
+        self.assertEqual(len(self.api.calls), 1)
+        self.assertNotIn('fields', self.api.calls[0])
+
+    def test_missing_work_items_are_returned_as_none_in_order(self):
+        work_items = self.client.get_work_items(self.entity, [3, 1], fields=['System.AreaPath'])
+        self.assertEqual([wi['id'] if wi else None for wi in work_items], [None, 1])
+
+    def test_uncached_reads_are_not_cached(self):
+        self.client.get_work_items(self.entity, [1], fields=['System.AreaPath'], cache=False)
+        self.client.get_work_items(self.entity, [1], fields=['System.AreaPath'])
+        self.assertEqual(len(self.api.calls), 2)
+
+    def test_work_items_are_cached_per_token(self):
+        self.client.get_work_items(self.entity, [1], fields=['System.AreaPath'])
+        self.client.get_work_items(FakeEntity('other'), [1], fields=['System.AreaPath'])
+        self.assertEqual(len(self.api.calls), 2)
+
+    def test_written_work_items_are_evicted(self):
+        self.client.get_work_items(self.entity, [1, 2], fields=['System.State'])
+        self.client.get_work_items(FakeEntity('other'), [1], fields=['System.State'])
+        field_value_obj = AdoFieldValueObject()
+        field_value_obj.update_field('/fields/System.State', 'Done')
+        response = mock.Mock()
+        response.json.return_value = {'value': [{'code': 200}]}
+        with mock.patch.object(ado_work_item_api_client, 'post', return_value=response):
+            self.assertEqual(self.client.update_fields_bulk(self.entity, [(1, field_value_obj)]), {1: None})
+
+        self.client.get_work_items(self.entity, [1, 2], fields=['System.State'])
+        self.client.get_work_items(FakeEntity('other'), [1], fields=['System.State'])
+        self.assertEqual([call['ids'] for call in self.api.calls[2:]], ['1', '1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+from unittest import mock
+
+from api_client.ado import ado_work_item_api_client
+from api_client.ado.ado_work_item_api_client import AdoWorkItemClient
+from core.api.work_item_graph import WorkItemGraph
+
+PARENT = 'System.LinkTypes.Hierarchy-Reverse'
+CHILD = 'System.LinkTypes.Hierarchy-Forward'
+
+
+class FakeEntity:
+    org = 'org'
+    project = 'project'
+    pat = 'pat'
+    ado_version = '7.0'
+
+
+class FakeHierarchyApi:
+    """ Serves the work items with relations of the hierarchy given as child id -> parent id """
+
+    def __init__(self, parent_of, types):
+        self.parent_of = parent_of
+        self.types = types
+        self.calls = []
+
+    def get(self, endpoint, pat, params=None):
+        ids = [int(wi) for wi in params['ids'].split(',')]
+        self.calls.append(sorted(ids))
+        return {'value': [self.work_item(wi) for wi in ids]}
+
+    def work_item(self, work_item_id):
+        relations = [{'rel': CHILD, 'url': 'https://dev.azure.com/org/_apis/wit/workItems/{}'.format(child)}
+                     for child, parent in self.parent_of.items() if parent == work_item_id]
+        if work_item_id in self.parent_of:
+            relations.append({'rel': PARENT, 'url': 'https://dev.azure.com/org/_apis/wit/workItems/{}'
+                             .format(self.parent_of[work_item_id])})
+        return {'id': work_item_id, 'fields': {'System.WorkItemType': self.types[work_item_id]},
+                'relations': relations}
+
+
+class WorkItemGraphFetchTest(unittest.TestCase):
+
+    def setUp(self):
+        # epic 1 <- feature 2 <- stories 3, 4 <- task 5 under story 3
+        self.api = FakeHierarchyApi({2: 1, 3: 2, 4: 2, 5: 3},
+                                    {1: 'Epic', 2: 'Feature', 3: 'User Story', 4: 'User Story', 5: 'Task'})
+        patcher = mock.patch.object(ado_work_item_api_client, 'get', self.api.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = AdoWorkItemClient()
+        self.entity = FakeEntity()
+
+    def test_expands_the_ancestors_one_level_per_call(self):
+        graph = self.client.work_item_graph(self.entity, [5])
+        self.assertEqual(graph.ancestors(5), [3, 2, 1])
+        self.assertEqual(graph.ancestor_of_type(5, 'Feature'), 2)
+        self.assertEqual(graph.roots('5'), [1])
+        self.assertEqual(self.api.calls, [[5], [3], [2], [1]])
+
+    def test_expands_the_descendants_up_to_max_depth(self):
+        graph = self.client.work_item_graph(self.entity, [2], ancestors=False, descendants=True, max_depth=1)
+        self.assertEqual(sorted(graph.nodes), [2, 3, 4])
+        self.assertEqual(sorted(graph.children(2)), [3, 4])
+
+    def test_relations_are_reused_until_a_work_item_is_written(self):
+        self.client.work_item_graph(self.entity, [5])
+        self.client.work_item_graph(self.entity, [3])
+        self.assertEqual(self.api.calls, [[5], [3], [2], [1]])
+
+        self.api.parent_of[3] = 4
+        self.client.evict(self.entity, [3])
+        graph = self.client.work_item_graph(self.entity, [5])
+        self.assertEqual(graph.ancestors(5), [3, 4, 2, 1])
+
+    def test_least_recently_used_relations_are_dropped(self):
+        self.client.max_relations = 2
+        self.client.work_item_graph(self.entity, [5])
+        self.api.calls.clear()
+        self.client.work_item_graph(self.entity, [2])
+        self.assertEqual(self.api.calls, [])
+        self.client.work_item_graph(self.entity, [3])
+        self.assertEqual(self.api.calls, [[3], [2], [1]])
+
+
+class WorkItemGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = WorkItemGraph()
+        self.graph.add(1, {'fields': {'System.WorkItemType': 'Epic'}}, [], [2])
+        self.graph.add(2, {'fields': {'System.WorkItemType': 'Feature'}}, [1], [3])
+        self.graph.add(3, {'fields': {'System.WorkItemType': 'Task'}}, [2], [])
+
+    def test_walks_nearest_first(self):
+        self.assertEqual(self.graph.ancestors('3'), [2, 1])
+        self.assertEqual(self.graph.descendants(1), [2, 3])
+
+    def test_queries_of_unknown_work_items(self):
+        self.assertNotIn(4, self.graph)
+        self.assertIsNone(self.graph.field(4, 'System.WorkItemType'))
+        self.assertIsNone(self.graph.ancestor_of_type(3, 'Bug'))
+        self.assertEqual(self.graph.parents(4), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
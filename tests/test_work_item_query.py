@@ -0,0 +1,80 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import unittest
+from unittest import mock
+
+from api_client.ado import ado_work_item_api_client
+from api_client.ado.ado_work_item_api_client import AdoWorkItemClient
+
+
+class FakeEntity:
+    org = 'org'
+    project = 'project'
+    pat = 'pat'
+    ado_version = '7.0'
+
+
+class FakeQueryApi:
+    """ Serves a query resulting in the given work items along with the work items by ids api """
+
+    wiql_url = 'https://dev.azure.com/org/project/_apis/wit/wiql/q1'
+
+    def __init__(self, work_item_ids):
+        self.work_item_ids = work_item_ids
+        self.calls = []
+
+    def get(self, endpoint, pat, params=None):
+        if '/_apis/wit/queries/' in endpoint:
+            self.calls.append('query')
+            return {'name': 'Open bugs', '_links': {'wiql': {'href': self.wiql_url}}}
+        if endpoint == self.wiql_url:
+            self.calls.append('wiql')
+            return {'workItems': [{'id': wi} for wi in self.work_item_ids]}
+        ids = [int(wi) for wi in params['ids'].split(',')]
+        self.calls.append(ids)
+        return {'value': [{'id': wi, 'fields': {'System.State': 'New'}} for wi in ids]}
+
+
+class QueryWorkItemsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeQueryApi([1, 2, 3, 4, 5])
+        self.now = 1000.0
+        patchers = [mock.patch.object(ado_work_item_api_client, 'get', self.api.get),
+                    mock.patch.object(ado_work_item_api_client, 'time')]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        ado_work_item_api_client.time.time.side_effect = lambda: self.now
+        self.client = AdoWorkItemClient()
+        self.entity = FakeEntity()
+
+    def test_iterates_the_work_items_in_chunks(self):
+        work_items = list(self.client.iter_work_items_by_query_id(self.entity, 'q1', ['System.State'], chunk_size=2))
+        self.assertEqual([wi['id'] for wi in work_items], [1, 2, 3, 4, 5])
+        self.assertEqual([call for call in self.api.calls if isinstance(call, list)], [[1, 2], [3, 4], [5]])
+
+    def test_iterated_work_items_are_not_cached(self):
+        list(self.client.iter_work_items_by_query_id(self.entity, 'q1', chunk_size=5))
+        self.client.get_work_items(self.entity, [1])
+        self.assertEqual([call for call in self.api.calls if isinstance(call, list)], [[1, 2, 3, 4, 5], [1]])
+
+    def test_empty_query_yields_nothing(self):
+        self.api.work_item_ids = []
+        self.assertEqual(list(self.client.iter_work_items_by_query_id(self.entity, 'q1')), [])
+
+    def test_query_results_are_reused_within_the_ttl(self):
+        self.client.get_work_items_by_query_id(self.entity, 'q1')
+        self.now += self.client.query_result_ttl - 1
+        self.client.get_work_items_by_query_id(self.entity, 'q1')
+        self.assertEqual(self.api.calls, ['query', 'wiql'])
+
+        self.now += 2
+        self.api.work_item_ids = [6]
+        self.assertEqual(self.client.get_work_items_by_query_id(self.entity, 'q1'), [{'id': 6}])
+        self.assertEqual(self.api.calls, ['query', 'wiql', 'wiql'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from api_client.ado.ado_work_item_api_client import AdoFieldValueObject
+from components.utils.helper import pr_needs_block
+from core.api.api_config_constants import APIConfigConstants
+from core.api.interfaces.work_item_api_client import FieldValueObject, WorkItemApiClient
+from core.api.write_queue import WriteBehindQueue, WriteResult
+from core.concurrent_executor import ConcurrentExecutor
+from core.utils.constants import Constants
+
+
+class FakeEntity:
+    org = 'org'
+    project = 'project'
+
+    def key(self):
+        return 42
+
+
+class FakeWorkItemClient:
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.updates = []
+        self.creates = []
+
+    def new_field_value_object(self):
+        return AdoFieldValueObject()
+
+    def update_fields_bulk(self, entity, updates):
+        sent = {}
+        for work_item_id, obj in updates:
+            sent.setdefault(work_item_id, []).extend(json.loads(obj.payload_str()))
+        self.updates.append(sent)
+        return {work_item_id: (Exception('failed') if work_item_id in self.failing else None)
+                for work_item_id, _ in updates}
+
+    def create(self, entity, work_item_type, payload, query_string='{}', content_type=None):
+        self.creates.append(work_item_type)
+        return {'id': len(self.creates)}
+
+
+class FakePullRequestClient:
+
+    def __init__(self):
+        self.added = []
+
+    def add_reviewers(self, entity, reviewers, vote=0, is_required=True):
+        self.added.append(list(reviewers))
+        return {reviewer: None for reviewer in reviewers}
+
+
+class FakeMapper(dict):
+
+    def get(self, key, default=None):
+        return self[key]
+
+
+def field_update(path, value):
+    field_value_obj = AdoFieldValueObject()
+    field_value_obj.update_field(path, value)
+    return field_value_obj
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.spill_path = os.path.join(self.dir, 'writes.jsonl')
+        self.wi_client = FakeWorkItemClient()
+        self.pr_client = FakePullRequestClient()
+        self.mapper = FakeMapper({APIConfigConstants.WORK_ITEM_API_CLIENT: self.wi_client,
+                                  APIConfigConstants.PULL_REQUEST_API_CLIENT: self.pr_client})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def queue(self):
+        return WriteBehindQueue(FakeEntity(), self.mapper, self.spill_path)
+
+    def test_sends_the_updates_of_a_work_item_together_and_dedupes_reviewers(self):
+        queue = self.queue()
+        queue.update_fields(1, field_update('/fields/A', 'a'))
+        queue.update_fields(1, field_update('/fields/B', 'b'))
+        queue.add_reviewer('r1')
+        queue.add_reviewer('r1')
+        self.assertEqual(queue.pending(), 2)
+
+        results = queue.flush()
+        self.assertTrue(all(result.succeeded() for result in results))
+        self.assertEqual([[op['path'] for op in self.wi_client.updates[0][1]]], [['/fields/A', '/fields/B']])
+        self.assertEqual(self.pr_client.added, [['r1']])
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_failed_operations_are_replayed_by_the_next_queue(self):
+        self.wi_client.failing = {2}
+        queue = self.queue()
+        queue.update_fields(1, field_update('/fields/A', 'a'))
+        queue.update_fields(2, field_update('/fields/A', 'b'))
+        results = {result.target: result for result in queue.flush()}
+        self.assertTrue(results[1].succeeded())
+        self.assertFalse(results[2].succeeded())
+
+        self.wi_client.failing = set()
+        replayed = self.queue()
+        self.assertEqual(replayed.pending(), 1)
+        self.assertEqual([result.target for result in replayed.flush()], [2])
+        self.assertFalse(os.path.exists(self.spill_path))
+
+    def test_creates_are_not_spilled(self):
+        queue = self.queue()
+        queue.create('Bug', '[]')
+        self.assertFalse(os.path.exists(self.spill_path))
+        self.assertEqual(self.queue().pending(), 0)
+        self.assertEqual([result.operation for result in queue.flush()], [WriteBehindQueue.CREATE])
+
+    def test_torn_line_is_skipped_and_dropped_from_the_spill(self):
+        queue = self.queue()
+        queue.add_reviewer('r1')
+        with open(self.spill_path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "add_rev')
+
+        replayed = self.queue()
+        self.assertEqual(replayed.pending(), 1)
+        replayed.add_reviewer('r2')
+        self.assertEqual(self.queue().pending(), 2)
+
+    def test_spill_of_another_entity_is_ignored(self):
+        with open(self.spill_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'org': 'org', 'project': 'project', 'key': 7}) + '\n')
+            f.write(json.dumps({'op': 'add_reviewer', 'reviewer': 'r1', 'vote': 0, 'is_required': True}) + '\n')
+        self.assertEqual(self.queue().pending(), 0)
+
+    def test_updates_which_cant_be_restored_are_not_replayed(self):
+        self.wi_client.failing = {1}
+        self.wi_client.new_field_value_object = PlainFieldValueObject
+        queue = self.queue()
+        queue.update_fields(1, PlainFieldValueObject())
+        queue.add_reviewer('r1')
+        self.pr_client.add_reviewers = lambda entity, reviewers, **kwargs: {r: Exception('failed') for r in reviewers}
+        queue.flush()
+
+        replayed = self.queue()
+        self.assertEqual(replayed.pending(), 1)
+
+
+class PlainFieldValueObject(FieldValueObject):
+    """ FieldValueObject of a client which implements only the abstract methods """
+
+    def update_field(self, field_path, field_value):
+        pass
+
+    def remove_field(self, field_path):
+        pass
+
+    def add_relation(self, relation, url, attributes=None):
+        pass
+
+    def payload_str(self):
+        return '[]'
+
+
+class DefaultBulkUpdateTest(unittest.TestCase):
+
+    def test_updates_the_work_items_one_by_one(self):
+        updated = []
+
+        def update_fields(entity, work_item_id, field_value_obj):
+            if work_item_id == 2:
+                raise Exception('failed')
+            updated.append(work_item_id)
+
+        client = mock.Mock(update_fields=update_fields)
+        results = WorkItemApiClient.update_fields_bulk(client, FakeEntity(), [(1, field_update('/fields/A', 'a')),
+                                                                              (2, field_update('/fields/A', 'b')),
+                                                                              (2, field_update('/fields/B', 'b')),
+                                                                              (1, field_update('/fields/B', 'a'))])
+        self.assertEqual(updated, [1, 1])
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], Exception)
+
+
+class FlushWritesTest(unittest.TestCase):
+
+    def test_failed_writes_dont_block_the_pr(self):
+        entity = mock.Mock()
+        entity.flush_writes.return_value = [WriteResult(WriteBehindQueue.UPDATE_FIELDS, 1),
+                                            WriteResult(WriteBehindQueue.ADD_REVIEWER, 'r1', error=Exception('x'))]
+        result = ConcurrentExecutor(None, entity).flush_writes()
+        self.assertEqual(result['status'], Constants.NOTIFY)
+        self.assertIn('add_reviewer r1', result['message'])
+        self.assertFalse(pr_needs_block([result]))
+
+
+if __name__ == '__main__':
+    unittest.main()